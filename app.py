@@ -2,13 +2,36 @@ import os
 import time
 import uuid
 import math
+import threading
 import streamlit as st
-from dotenv import load_dotenv
-from backend.engine import chat_with_aias
-
-# LOAD ENV VARIABLES
-load_dotenv()
-
+from backend import metrics, startup
+from backend.config import (
+    CHAT_RENDER_WINDOW,
+    GEMINI_WARMUP,
+    GENERATION_WORKERS,
+    MEMORY_LIMIT_MB,
+    MEMORY_MIN_IDLE_SECONDS,
+    MEMORY_SPILL_DIR,
+    MESSAGE_PAGE_SIZE,
+    METRICS_PORT,
+    PREWARM_SUGGESTIONS,
+    SESSION_DB_PATH,
+    SIDEBAR_PAGE_SIZE,
+)
+from backend.export import (
+    EXPORT_FORMATS,
+    export_filename,
+    iter_transcript,
+    iter_zip_archive,
+    spool,
+)
+from backend.identity import USER_COOKIE, cookie_script, new_user_token, valid_user_token
+from backend.memory import MemoryGovernor
+from backend.resilience import CircuitOpenError
+from backend.session_index import SessionIndex
+from backend.storage import open_session_store
+from backend.suggestions import suggestions_for_level
+from backend.worker import GenerationPool
 
 # PAGE CONFIG + CSS STYLES
 st.set_page_config(page_title="LegitAI - AI assistance, at the right level.", page_icon="assets/icon.ico", layout="wide")
@@ -42,18 +65,94 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# SESSION STATE DEFAULTS
+# BACKEND (built once per server process, shared by every user)
 
-if "sessions" not in st.session_state:
-    st.session_state.sessions = {}     # session_id → {"title": "", "messages": [], "level": None}
+@st.cache_resource(show_spinner=False)
+def get_engine():
+    with startup.timed("engine_import"):
+        from backend import engine
+    return engine
 
-if "active_session" not in st.session_state:
-    st.session_state.active_session = None
 
-# Suggestions toggle (default ON)
-if "enable_suggestions" not in st.session_state:
-    st.session_state.enable_suggestions = True
+@st.cache_resource(show_spinner=False)
+def warm_up_backend():
+    # Connecting imports the Gemini SDK: do it off the script thread so a
+    # fresh worker renders its first page without waiting for it
+    if not GEMINI_WARMUP:
+        return None
+
+    def run():
+        from backend.gemini_client import warm_up_client
+        elapsed = warm_up_client()
+        if elapsed is not None:
+            print(f"[GEMINI WARM-UP] connection ready in {elapsed:.2f}s")
+
+    thread = threading.Thread(target=run, name="legitai-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+warm_up_backend()
+
+
+@st.cache_resource(show_spinner=False)
+def start_suggestion_prewarmer():
+    if not PREWARM_SUGGESTIONS:
+        return None
+    from backend.prewarm import SuggestionPrewarmer
+    return SuggestionPrewarmer().start()
+
+
+start_suggestion_prewarmer()
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    if not METRICS_PORT:
+        return None
+    return metrics.start_metrics_server(METRICS_PORT)
+
 
+start_metrics_server()
+
+
+# SESSION STORAGE (one store per server process, shared by every user)
+
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    with startup.timed("session_store_open"):
+        return open_session_store(SESSION_DB_PATH)
+
+
+store = get_session_store()
+
+
+# MESSAGE MEMORY (one governor per server process, shared by every user)
+
+@st.cache_resource(show_spinner=False)
+def get_memory_governor():
+    governor = MemoryGovernor(
+        max_bytes=int(MEMORY_LIMIT_MB * 1024 * 1024),
+        spill_dir=MEMORY_SPILL_DIR,
+        min_idle_seconds=MEMORY_MIN_IDLE_SECONDS,
+    )
+    metrics.register_collector("memory", governor.stats)
+    return governor
+
+
+memory = get_memory_governor()
+
+
+# REPLY GENERATION (shared worker pool; one in-flight reply per chat)
+
+@st.cache_resource(show_spinner=False)
+def get_generation_pool():
+    pool = GenerationPool(max_workers=GENERATION_WORKERS)
+    metrics.register_collector("generation", pool.stats)
+    return pool
+
+
+generation_pool = get_generation_pool()
 
 
 # HELPERS
@@ -68,6 +167,20 @@ def parse_aias_level(choice: str):
         return None
 
 
+def new_chat_state(meta, stored=True):
+    """In-memory chat entry: stored metadata + UI-only state. Messages load lazily."""
+    return {
+        **meta,
+        "stored": stored,   # False until the first message (see store_chat)
+        "messages": None,
+        "has_earlier_messages": False,
+        "render_limit": CHAT_RENDER_WINDOW,
+        "last_prompt": None,
+        "last_message_count": 0,
+        "last_suggestion_choice": None,
+    }
+
+
 def get_active_chat():
     sid = st.session_state.active_session
     if sid and sid in st.session_state.sessions:
@@ -75,53 +188,203 @@ def get_active_chat():
     return None
 
 
-# CREATE DEFAULT FIRST SESSION (if none exists)
-
-if not st.session_state.sessions:
+def create_chat():
+    """A draft chat: nothing is written to the store until its first message."""
     new_id = str(uuid.uuid4())
-    st.session_state.sessions[new_id] = {
-        "title": "New Chat",
-        "messages": [],
-        "level": None,
-        "last_prompt": None,
-        "last_message_count": 0,
-        "last_suggestion_choice": None,
+    now = time.time()
+    meta = {"id": new_id, "title": "New Chat", "level": None,
+            "message_count": 0, "created_at": now, "updated_at": now}
+    # Newest chat first, matching store.list_sessions order
+    st.session_state.sessions = {new_id: new_chat_state(meta, stored=False), **st.session_state.sessions}
+    st.session_state.session_index.add(new_id, meta["title"], meta["level"], meta["updated_at"])
+    return new_id
+
+
+def store_chat(chat):
+    """Write a draft chat (and so, on a first visit, the user) to the store."""
+    if chat["stored"]:
+        return
+    store.create_session(st.session_state.user_id, chat["id"], title=chat["title"], level=chat["level"])
+    chat["stored"] = True
+    remember_user()
+
+
+def remember_user():
+    """Keep the user token in a cookie, so a reload finds the same chats."""
+    if st.context.cookies.get(USER_COOKIE) != st.session_state.user_id:
+        st.html(
+            cookie_script(st.session_state.user_id, secure=(st.context.url or "").startswith("https:")),
+            unsafe_allow_javascript=True,
+        )
+
+
+def switch_chat(sid):
+    previous = get_active_chat()
+    if previous is not None and st.session_state.active_session != sid:
+        memory.discard(previous["messages"])
+        previous["messages"] = None   # only the active chat keeps messages in memory
+        previous["render_limit"] = CHAT_RENDER_WINDOW
+        generation_pool.cancel(previous["id"])   # nobody is waiting for that reply now
+    st.session_state.active_session = sid
+
+
+def ensure_messages_loaded(chat):
+    """The chat's messages, read from the store or back from a memory spill."""
+    if chat["messages"] is None:
+        page = store.load_messages(chat["id"], limit=MESSAGE_PAGE_SIZE) if chat["stored"] else []
+        chat["messages"] = memory.adopt(chat["id"], st.session_state.user_id, page)
+        chat["has_earlier_messages"] = len(chat["messages"]) < chat["message_count"]
+    return memory.load(chat["messages"])
+
+
+def load_earlier_messages(chat):
+    messages = chat["messages"]
+    before_id = messages[0]["id"] if messages else None
+    page = store.load_messages(chat["id"], limit=MESSAGE_PAGE_SIZE, before_id=before_id)
+    memory.prepend(messages, page)
+    chat["has_earlier_messages"] = len(messages) < chat["message_count"]
+
+
+def show_earlier_messages(chat):
+    """Render one more window of older messages, loading a page if needed."""
+    messages = ensure_messages_loaded(chat)
+    chat["render_limit"] += CHAT_RENDER_WINDOW
+    if chat["render_limit"] > len(messages) and chat["has_earlier_messages"]:
+        load_earlier_messages(chat)
+
+
+def touch_chat(chat, **fields):
+    """Keep the sidebar index in step with a chat's title/level/recency."""
+    chat["updated_at"] = time.time()
+    st.session_state.session_index.update(
+        chat["id"],
+        title=fields.get("title"),
+        level=fields.get("level"),
+        updated_at=chat["updated_at"],
+    )
+
+
+def add_message(chat, role, content, meta=None):
+    store_chat(chat)
+    msg_id = store.append_message(chat["id"], role, content, meta)
+    memory.append(ensure_messages_loaded(chat), msg_id, role, content, meta)
+    chat["message_count"] += 1
+    touch_chat(chat)
+
+
+def update_chat(chat, **fields):
+    store_chat(chat)
+    chat.update(fields)
+    store.update_session(chat["id"], **fields)
+    touch_chat(chat, **fields)
+
+
+def generate_reply(handle, engine, level, prompt, history, session_id, user_id,
+                   render_history_seconds):
+    """Pool job: stream one reply into ``handle``. Closing it abandons the call."""
+    with metrics.turn(session_id) as turn:
+        turn.record("render_history", render_history_seconds)
+        stream = engine.chat_with_aias_stream(
+            selected_level_int=level,
+            user_message=prompt,
+            history=history,
+            session_id=session_id,
+            user_id=user_id,
+            on_queue_position=handle.set_queue_position,
+            cancel_event=handle.cancel_event,
+        )
+        yield from stream
+        return stream.result
+
+
+def error_message(error):
+    print("[AIAS BACKEND ERROR]", repr(error))
+    if isinstance(error, CircuitOpenError):
+        return "⚠️ The AI service is temporarily unavailable. Please try again in a moment."
+    if isinstance(error, TimeoutError):
+        return "⚠️ The AI service took too long to answer. Please try again."
+    return "⚠️ Error contacting backend. Please try again."
+
+
+def commit_reply(chat, handle):
+    """Store a finished generation as the chat's assistant message."""
+    if handle.error is not None:
+        add_message(chat, "assistant", error_message(handle.error))
+    else:
+        result = handle.result
+        assistant_text = result["assistant_reply"]
+        violation = result["violation_reason"]
+        is_ok = result["is_within_selected_level"]
+
+        if not is_ok and violation:
+            assistant_text = f"⚠️ **AIAS Level Notice:** {violation}\n\n---\n\n" + assistant_text
+
+        add_message(chat, "assistant", assistant_text, meta={
+            "requested_level": result["requested_level"],
+            "is_within_selected_level": is_ok,
+            "violation_reason": violation,
+        })
+
+    # Rerun guard: the reply belongs to last_prompt
+    chat["last_message_count"] = chat["message_count"]
+
+
+# SESSION STATE DEFAULTS
+
+# Per-browser user id: a random secret token kept in a cookie (never in the
+# URL, where shared links would hand out the chats)
+if "user_id" not in st.session_state:
+    if "u" in st.query_params:
+        del st.query_params["u"]
+    user_id = valid_user_token(st.context.cookies.get(USER_COOKIE))
+    st.session_state.user_id = user_id or new_user_token()
+
+if "sessions" not in st.session_state:
+    # session_id → metadata (title, level, counts); eager, messages are not
+    st.session_state.sessions = {
+        meta["id"]: new_chat_state(meta)
+        for meta in store.list_sessions(st.session_state.user_id)
     }
-    st.session_state.active_session = new_id
 
+if "session_index" not in st.session_state:
+    # Built once per browser session, then updated incrementally
+    index = SessionIndex()
+    for sid, chat in st.session_state.sessions.items():
+        index.add(sid, chat["title"], chat["level"], chat["updated_at"])
+    st.session_state.session_index = index
 
-# SIDEBAR
+if "active_session" not in st.session_state:
+    st.session_state.active_session = next(iter(st.session_state.sessions), None)
 
-with st.sidebar:
-    st.image("assets/legitAI_logo.png")
+# Number of chats listed in the sidebar ("Load more" raises it)
+if "sidebar_limit" not in st.session_state:
+    st.session_state.sidebar_limit = SIDEBAR_PAGE_SIZE
 
-    st.markdown("Use AI responsibly according to your **AI Assistance Scale (AIAS)**.")
+# Suggestions toggle (default ON)
+if "enable_suggestions" not in st.session_state:
+    st.session_state.enable_suggestions = True
 
-    st.markdown("---")
+# Latency / cache debug panel (default OFF)
+if "show_debug" not in st.session_state:
+    st.session_state.show_debug = False
 
-    # NEW CHAT BUTTON
-    if st.button("➕ New Chat", use_container_width=True):
-        new_id = str(uuid.uuid4())
-        st.session_state.sessions[new_id] = {
-            "title": "New Chat",
-            "messages": [],
-            "level": None,
-            "last_prompt": None,
-            "last_message_count": 0,
-            "last_suggestion_choice": None,
-        }
-        st.session_state.active_session = new_id
 
-        # RESET AIAS DROPDOWN
-        if "aias_level_box" in st.session_state:
-            st.session_state["aias_level_box"] = "Choose AIAS Level"
+# CREATE DEFAULT FIRST SESSION (if none exists; stored on its first message)
 
-        st.rerun()
+if not st.session_state.sessions:
+    switch_chat(create_chat())
 
+if any(chat["stored"] for chat in st.session_state.sessions.values()):
+    remember_user()
 
-    st.markdown("---")
-    st.header("💬 Conversations")
 
+# SIDEBAR
+# The chat list and settings are fragments: searching, filtering, paging and
+# toggling rerun only their own block, not the open chat. Anything that
+# changes the main area (switching chats, suggestions) reruns the app.
+
+@st.fragment
+def chat_list():
     badge_colors = {
         1: "gray",
         2: "blue",
@@ -130,7 +393,35 @@ with st.sidebar:
         5: "red",
     }
 
-    for sid, session in st.session_state.sessions.items():
+    # SEARCH + LEVEL FILTER
+
+    search_col, level_col = st.columns([3, 1])
+    with search_col:
+        search_query = st.text_input(
+            "Search chats",
+            placeholder="🔎 Search chats",
+            label_visibility="collapsed",
+        )
+    with level_col:
+        level_filter = st.selectbox(
+            "Level filter",
+            [None, 1, 2, 3, 4, 5],
+            format_func=lambda v: "All" if v is None else f"L{v}",
+            label_visibility="collapsed",
+        )
+
+    # Only the newest `sidebar_limit` matches are rendered
+    visible_ids, total_matches = st.session_state.session_index.search(
+        search_query,
+        level=level_filter,
+        limit=st.session_state.sidebar_limit,
+    )
+
+    if not visible_ids and (search_query or level_filter):
+        st.caption("No matching chats.")
+
+    for sid in visible_ids:
+        session = st.session_state.sessions[sid]
         lvl = session.get("level")
         raw_title = session.get("title", "New Chat")
 
@@ -180,40 +471,113 @@ with st.sidebar:
             )
 
         if clicked:
-            st.session_state.active_session = sid
+            switch_chat(sid)
             st.rerun()
 
+    hidden = total_matches - len(visible_ids)
+    if hidden > 0:
+        if st.button(f"Load more ({hidden} older)", key="sidebar_load_more", use_container_width=True):
+            st.session_state.sidebar_limit += SIDEBAR_PAGE_SIZE
+            st.rerun(scope="fragment")
 
-    st.markdown("---")
-    st.header("Settings")
 
+@st.fragment
+def settings_panel():
     # Auto-suggestions toggle
-    st.session_state.enable_suggestions = st.toggle(
+    enable_suggestions = st.toggle(
         "💡 Enable Suggestions",
         value=st.session_state.enable_suggestions
     )
+    if enable_suggestions != st.session_state.enable_suggestions:
+        st.session_state.enable_suggestions = enable_suggestions
+        st.rerun()   # the suggestion bar lives outside this fragment
 
     st.toggle("🌙 Dark Mode (coming soon)")
 
-    # Export chat transcript
+    st.session_state.show_debug = st.toggle(
+        "🛠️ Debug Panel",
+        value=st.session_state.show_debug
+    )
+
+    # Export chat transcript(s) — generated only when a button is clicked
     active = get_active_chat()
     if active:
-        transcript = f"Chat Title: {active['title']}\n"
-        transcript += f"AIAS Level: {active.get('level', 'Not selected')}\n"
-        transcript += "-"*40 + "\n\n"
+        export_format = st.selectbox(
+            "Export format",
+            list(EXPORT_FORMATS),
+            format_func=lambda f: EXPORT_FORMATS[f].label,
+            key="export_format",
+        )
+        fmt_info = EXPORT_FORMATS[export_format]
 
-        for msg in active["messages"]:
-            role = "USER" if msg["role"] == "user" else "ASSISTANT"
-            transcript += f"{role}:\n{msg['content']}\n\n"
+        # Snapshot plain values: the data callables run on another thread
+        export_chat = {k: active[k] for k in ("id", "title", "level", "created_at", "updated_at")}
+        export_user = st.session_state.user_id
 
         st.download_button(
-            "⬇️ Export This Chat (testing)",
-            data=transcript,
-            file_name=f"{active['title']}.txt",
-            mime="text/plain",
+            "⬇️ Export This Chat",
+            data=lambda: spool(iter_transcript(
+                export_chat, store.iter_messages(export_chat["id"]), export_format
+            )),
+            file_name=export_filename(active["title"], export_format),
+            mime=fmt_info.mime,
+            on_click="ignore",
             use_container_width=True
         )
 
+        st.download_button(
+            "🗂️ Export All Chats (.zip)",
+            data=lambda: spool(iter_zip_archive(store, export_user, export_format)),
+            file_name="legitai_chats.zip",
+            mime="application/zip",
+            on_click="ignore",
+            use_container_width=True
+        )
+
+    # Per-stage timings of recent turns + cache / parser / policy counters
+    if st.session_state.show_debug:
+        with st.expander("🛠️ Latency & cache stats", expanded=True):
+            turns = metrics.recent_turns(10)
+            if turns:
+                st.dataframe(
+                    [{"total_ms": t["total_ms"], **t["stages_ms"], "error": t["error"]} for t in turns],
+                    use_container_width=True,
+                )
+            else:
+                st.caption("No turns recorded yet.")
+
+            for prefix, values in metrics.collect_stats().items():
+                st.caption(prefix)
+                st.json(values, expanded=False)
+
+
+with st.sidebar:
+    st.image("assets/legitAI_logo.png")
+
+    st.markdown("Use AI responsibly according to your **AI Assistance Scale (AIAS)**.")
+
+    st.markdown("---")
+
+    # NEW CHAT BUTTON
+    if st.button("➕ New Chat", use_container_width=True):
+        switch_chat(create_chat())
+
+        # RESET AIAS DROPDOWN
+        if "aias_level_box" in st.session_state:
+            st.session_state["aias_level_box"] = "Choose AIAS Level"
+
+        st.rerun()
+
+
+    st.markdown("---")
+    st.header("💬 Conversations")
+
+    chat_list()
+
+    st.markdown("---")
+    st.header("Settings")
+
+    settings_panel()
 
 
 # AIAS LEVEL DROPDOWN
@@ -264,9 +628,18 @@ chosen_level = parse_aias_level(level_choice)
 
 # CHAT TITLE + EMPTY CHAT
 
-messages = active_chat["messages"]
+messages = ensure_messages_loaded(active_chat)
+
+# COLLECT A FINISHED REPLY
+# Replies are generated on the pool; whichever run finds one finished adds
+# it to the chat. Cancelled or superseded replies can never be claimed.
+pending = generation_pool.get(active_chat["id"])
+if pending is not None and pending.claim():
+    generation_pool.release(pending)
+    commit_reply(active_chat, pending)
+    pending = None
 
-if len(messages) == 0:
+if active_chat["message_count"] == 0:
     st.markdown("<h1 class='center-title'>LegitAI</h1>", unsafe_allow_html=True)
     st.markdown(
         "<p class='center-intro'>Welcome! Choose your AIAS level above and begin your first question.</p>",
@@ -291,9 +664,33 @@ st.markdown("---")
 
 
 # DISPLAY PAST MESSAGES
-for msg in messages:
-    with st.chat_message(msg["role"]):
-        st.markdown(msg["content"])
+# Only the newest render_limit messages are drawn, so rerun cost does not
+# grow with the chat. Paging back reruns just this fragment.
+
+@st.fragment
+def render_history(chat):
+    messages = ensure_messages_loaded(chat)
+    hidden = max(len(messages) - chat["render_limit"], 0)
+
+    if hidden or chat["has_earlier_messages"]:
+        more = hidden + (chat["message_count"] - len(messages))
+        st.button(
+            f"⬆️ Show earlier messages ({more})",
+            key=f"show_earlier_{chat['id']}",
+            on_click=show_earlier_messages,
+            args=(chat,),
+        )
+
+    for msg in messages[hidden:]:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+
+
+render_start = time.perf_counter()
+render_history(active_chat)
+render_history_seconds = time.perf_counter() - render_start
+metrics.observe("render_history", render_history_seconds)
+startup.mark_ready("first_render")
 
 # USER INPUT BAR
 user_input = st.chat_input("Ask anything...")
@@ -302,61 +699,14 @@ user_input = st.chat_input("Ask anything...")
 # LEVEL-BASED SUGGESTION LIST
 level = active_chat["level"] or chosen_level
 
-if level == 1:
-    suggestion_list = [
-        "What is the AIAS scale?",
-        "Give me study tips",
-        "What counts as academic misconduct?",
-        "How to plan my assignment?",
-        "How to improve my focus?",
-    ]
-elif level == 2:
-    suggestion_list = [
-        "Explain recursion conceptually",
-        "Give me a high-level outline",
-        "Brainstorm essay ideas",
-        "Summarize a topic briefly",
-        "Explain gradient descent simply",
-    ]
-elif level == 3:
-    suggestion_list = [
-        "Improve my draft",
-        "Rewrite this paragraph",
-        "Debug this code snippet",
-        "Suggest better structure",
-        "Check clarity of my writing",
-    ]
-elif level == 4:
-    suggestion_list = [
-        "Give a worked recursion example",
-        "Show a sample Python function",
-        "Explain this algorithm step-by-step",
-        "Break down this math problem",
-        "Help refine a partially written solution",
-    ]
-elif level == 5:
-    suggestion_list = [
-        "Write a complete Python example program",
-        "Explain this topic in full depth",
-        "Generate a full solution from scratch",
-        "Optimize this code or algorithm",
-        "Solve this complex problem fully",
-    ]
-else:
-    suggestion_list = [
-        "What is the AIAS scale?",
-        "Give me study tips",
-        "What counts as academic misconduct?",
-        "How to plan my assignment?",
-        "How to improve my focus?",
-    ]
+suggestion_list = suggestions_for_level(level)
 
 
 # FIXED SUGGESTION HANDLING (NO MORE RE-TRIGGER)
 
 suggestion_clicked = None
 
-if user_input is None and st.session_state.enable_suggestions:
+if user_input is None and pending is None and st.session_state.enable_suggestions:
     with st.container():
 
         st.markdown("Suggestions")
@@ -387,11 +737,6 @@ if user_input:
 elif suggestion_clicked:
     prompt = suggestion_clicked
 
-# No user action → stop
-if not prompt:
-    st.stop()
-
-
 
 # prevents export / dropdown / toggle rerun from re-sending last prompt
 
@@ -400,15 +745,48 @@ if "last_prompt" not in active_chat:
 if "last_message_count" not in active_chat:
     active_chat["last_message_count"] = 0
 
-current_msg_count = len(messages)
+current_msg_count = active_chat["message_count"]
 
 if prompt == active_chat["last_prompt"] and current_msg_count == active_chat["last_message_count"]:
+    prompt = None
+
+# No user action and no reply on its way → stop
+if not prompt and pending is None:
+    st.stop()
+
+
+# PENDING REPLY
+# Polls the pool without blocking the script: the rest of the page stays
+# interactive while Gemini answers. Once the reply is ready, a full rerun
+# collects it (see COLLECT A FINISHED REPLY).
+
+@st.fragment(run_every=0.3)
+def show_pending_reply(handle):
+    if handle.done:
+        st.rerun()
+
+    with st.chat_message("assistant"):
+        text = handle.text
+        if text:
+            st.markdown(text)
+        elif handle.queue_position is not None:
+            # Waiting for Gemini quota
+            st.markdown(
+                f"⏳ Lots of students are asking right now — you're "
+                f"**#{handle.queue_position + 1}** in line…"
+            )
+        else:
+            st.markdown("…")
+
+
+if not prompt:
+    show_pending_reply(pending)
     st.stop()
 
 
 # SAVE USER MESSAGE
 
-messages.append({"role": "user", "content": prompt})
+add_message(active_chat, "user", prompt)
 
 with st.chat_message("user"):
     st.markdown(prompt)
@@ -417,12 +795,12 @@ with st.chat_message("user"):
 # Rename chat title on first message
 if active_chat["title"] == "New Chat":
     title_short = prompt[:40] + ("..." if len(prompt) > 40 else "")
-    active_chat["title"] = title_short
+    update_chat(active_chat, title=title_short)
 
 
 # Lock level
-if active_chat["level"] is None:
-    active_chat["level"] = chosen_level
+if active_chat["level"] is None and chosen_level is not None:
+    update_chat(active_chat, level=chosen_level)
 
 
 # Ensure level chosen
@@ -433,58 +811,36 @@ if active_chat["level"] is None:
     )
     with st.chat_message("assistant"):
         st.markdown(warn_text)
-    messages.append({"role": "assistant", "content": warn_text})
+    add_message(active_chat, "assistant", warn_text)
 
     active_chat["last_prompt"] = prompt
-    active_chat["last_message_count"] = len(messages)
+    active_chat["last_message_count"] = active_chat["message_count"]
     st.stop()
 
 
-# CALL BACKEND
-
-try:
-    result = chat_with_aias(
-        selected_level_int=active_chat["level"],
-        user_message=prompt,
-        history=messages,
-    )
-except Exception as e:
-    print("[AIAS BACKEND ERROR]", repr(e))
-    err_msg = "⚠️ Error contacting backend. Please try again."
-    with st.chat_message("assistant"):
-        st.markdown(err_msg)
-    messages.append({"role": "assistant", "content": err_msg})
-
-    active_chat["last_prompt"] = prompt
-    active_chat["last_message_count"] = len(messages)
-    st.stop()
-
-
-assistant_text = result["assistant_reply"]
-violation = result["violation_reason"]
-is_ok = result["is_within_selected_level"]
-
-if not is_ok and violation:
-    assistant_text = f"⚠️ **AIAS Level Notice:** {violation}\n\n---\n\n" + assistant_text
-
-
-# STREAMING OUTPUT
-
-with st.chat_message("assistant"):
-    placeholder = st.empty()
-    streamed = ""
-
-    for line in assistant_text.split("\n"):
-        streamed += line + "\n"
-        placeholder.markdown(streamed)
-        time.sleep(0.03)
+# CALL BACKEND (BACKGROUND GENERATION)
+# A newer prompt in the same chat cancels the reply still in flight.
 
-messages.append({"role": "assistant", "content": assistant_text})
+# Everything the job needs is captured here: it runs on a pool thread,
+# outside this script run (no st.session_state there)
+job_args = (
+    get_engine(),
+    active_chat["level"],
+    prompt,
+    list(messages),   # snapshot: later appends must not reach the prompt
+    st.session_state.active_session,
+    st.session_state.user_id,
+    render_history_seconds,
+)
+pending = generation_pool.submit(
+    active_chat["id"], lambda handle: generate_reply(handle, *job_args)
+)
 
 
 # UPDATE RERUN GUARD VALUES
 
 active_chat["last_prompt"] = prompt
-active_chat["last_message_count"] = len(messages)
+active_chat["last_message_count"] = active_chat["message_count"]
 
+show_pending_reply(pending)
 st.stop()
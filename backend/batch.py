@@ -0,0 +1,388 @@
+# backend/batch.py
+#
+# Headless batch runs of the AIAS engine, for auditing how LegitAI answers
+# a corpus of prompts at each level.
+#
+#   python -m backend.batch prompts.jsonl -o results.jsonl --workers 16
+#
+# Input: one JSON object per line
+#   {"id": "q1", "level": 3, "message": "...", "history": [{"role": ..., "content": ...}]}
+# "id" defaults to the line number and "history" to []. Results are appended
+# to the output (JSONL, or CSV when it ends in .csv) as each prompt finishes;
+# rerunning the same command skips ids already in the output. With
+# --retry-errors failed ids run again and the newest row for an id wins.
+#
+# Calls go through the engine's request scheduler in the batch lane, so
+# they already share GEMINI_RPM / GEMINI_TPM with (and yield to) live
+# students; --rpm / --tpm only cap the batch further.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from backend.config import (
+    HISTORY_SUMMARY_TOKENS,
+    HISTORY_TOKEN_BUDGET,
+    SCHEDULER_EXPECTED_OUTPUT_TOKENS,
+)
+from backend.engine import (
+    STATIC_PROMPT_TOKENS,
+    AiasLevel,
+    generate_aias_response,
+    generate_aias_response_async,
+)
+from backend.scheduler import Priority
+from backend.ratelimit import TokenBucket
+from backend.tokens import estimate_tokens
+
+RESULT_FIELDS = [
+    "id", "level", "requested_level", "is_within_selected_level", "violation_reason",
+    "latency_ms", "prompt_tokens", "output_tokens", "response_cache_hit", "error",
+]
+
+
+# INPUT
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield input records; malformed lines become records with an error."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"id": str(line_no), "error": f"invalid JSON: {e.msg}"}
+                continue
+            if not isinstance(record, dict):
+                yield {"id": str(line_no), "error": "line must be a JSON object"}
+                continue
+
+            record["id"] = str(record.get("id", line_no))
+            record.setdefault("history", [])
+            yield record
+
+
+def _validate(record: Dict[str, Any]) -> Optional[str]:
+    if "error" in record:
+        return record["error"]
+    if record.get("level") not in (1, 2, 3, 4, 5):
+        return "level must be an integer 1–5"
+    if not isinstance(record.get("message"), str) or not record["message"].strip():
+        return "message must be a non-empty string"
+    history = record["history"]
+    if not isinstance(history, list) or not all(
+        isinstance(m, dict) and isinstance(m.get("role"), str) and isinstance(m.get("content"), str)
+        for m in history
+    ):
+        return "history must be a list of {role, content} objects"
+    return None
+
+
+# OUTPUT + CHECKPOINT
+# The output file is the checkpoint: every finished record is flushed as
+# soon as it completes, so after a crash or Ctrl-C the ids already written
+# are exactly the ones that are done.
+
+class ResultWriter:
+
+    def __init__(self, path: str, fmt: str, include_reply: bool = False) -> None:
+        self.path = path
+        self.fmt = fmt
+        self.fields = RESULT_FIELDS + (["assistant_reply"] if include_reply else [])
+        self._lock = threading.Lock()
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=self.fields, extrasaction="ignore")
+            if new_file:
+                self._csv.writeheader()
+
+    @staticmethod
+    def completed_ids(path: str, fmt: str, retry_errors: bool) -> Set[str]:
+        if not os.path.exists(path):
+            return set()
+
+        done: Set[str] = set()
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = csv.DictReader(f) if fmt == "csv" else (
+                json.loads(line) for line in f if line.strip()
+            )
+            try:
+                for row in rows:
+                    if retry_errors and row.get("error"):
+                        continue
+                    done.add(str(row["id"]))
+            except (json.JSONDecodeError, KeyError):
+                pass   # last line cut off by a crash; everything before it counts
+        return done
+
+    def write(self, result: Dict[str, Any]) -> None:
+        with self._lock:
+            if self.fmt == "csv":
+                self._csv.writerow(result)
+            else:
+                self._file.write(json.dumps(
+                    {k: result.get(k) for k in self.fields}, ensure_ascii=False
+                ) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# RATE LIMITS
+
+class Quota:
+    """
+    Optional RPM / TPM ceiling for one batch run, below the deployment
+    quota the request scheduler enforces. Tokens are reserved up front from
+    an estimate and settled against the usage Gemini reports; cache and
+    policy hits give their reservation back.
+    """
+
+    def __init__(self, rpm: int, tpm: int, expected_output_tokens: int) -> None:
+        self.requests = TokenBucket.per_minute(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket.per_minute(tpm) if tpm > 0 else None
+        self.expected_output_tokens = expected_output_tokens
+
+    def estimate(self, record: Dict[str, Any]) -> int:
+        history_tokens = sum(estimate_tokens(m.get("content", "")) for m in record["history"])
+        return (
+            STATIC_PROMPT_TOKENS[AiasLevel(record["level"])]
+            + estimate_tokens(record["message"])
+            + min(history_tokens, HISTORY_TOKEN_BUDGET + HISTORY_SUMMARY_TOKENS)
+            + self.expected_output_tokens
+        )
+
+    def acquire(self, estimate: int) -> None:
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(estimate)
+
+    async def acquire_async(self, estimate: int) -> None:
+        if self.requests:
+            await self.requests.acquire_async(1)
+        if self.tokens:
+            await self.tokens.acquire_async(estimate)
+
+    def settle(self, estimate: int, result: Dict[str, Any]) -> None:
+        went_upstream = not result.get("response_cache_hit") and result.get("prompt_tokens")
+        actual = (result["prompt_tokens"] + result["output_tokens"]) if went_upstream else 0
+
+        if self.requests and not went_upstream and not result.get("error"):
+            self.requests.refund(1)
+        if self.tokens:
+            if actual > estimate:
+                self.tokens.debit(actual - estimate)
+            else:
+                self.tokens.refund(estimate - actual)
+
+
+# RUNNING ONE RECORD
+
+def _result(record: Dict[str, Any], started: float, llm_resp=None, error: str = None) -> Dict[str, Any]:
+    usage = llm_resp.usage if llm_resp is not None else None
+    return {
+        "id": record["id"],
+        "level": record.get("level"),
+        "requested_level": llm_resp.requested_level if llm_resp else None,
+        "is_within_selected_level": llm_resp.is_within_selected_level if llm_resp else None,
+        "violation_reason": llm_resp.violation_reason if llm_resp else None,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "prompt_tokens": usage.prompt_tokens if usage else 0,
+        "output_tokens": usage.output_tokens if usage else 0,
+        "response_cache_hit": usage.response_cache_hit if usage else False,
+        "error": error,
+        "assistant_reply": llm_resp.assistant_reply_md if llm_resp else None,
+    }
+
+
+def run_record(record: Dict[str, Any], quota: Quota, refresh_cache: bool) -> Dict[str, Any]:
+    started = time.perf_counter()
+    invalid = _validate(record)
+    if invalid:
+        return _result(record, started, error=invalid)
+
+    estimate = 0
+    try:
+        estimate = quota.estimate(record)
+        quota.acquire(estimate)
+        started = time.perf_counter()   # latency excludes time spent waiting for quota
+        llm_resp = generate_aias_response(
+            record["level"], record["message"], record["history"], refresh_cache=refresh_cache,
+            user_id="batch", priority=Priority.BATCH,
+        )
+        result = _result(record, started, llm_resp)
+    except Exception as e:
+        result = _result(record, started, error=f"{type(e).__name__}: {e}")
+
+    quota.settle(estimate, result)
+    return result
+
+
+async def run_record_async(record: Dict[str, Any], quota: Quota, refresh_cache: bool) -> Dict[str, Any]:
+    started = time.perf_counter()
+    invalid = _validate(record)
+    if invalid:
+        return _result(record, started, error=invalid)
+
+    estimate = 0
+    try:
+        estimate = quota.estimate(record)
+        await quota.acquire_async(estimate)
+        started = time.perf_counter()
+        llm_resp = await generate_aias_response_async(
+            record["level"], record["message"], record["history"], refresh_cache=refresh_cache,
+            user_id="batch", priority=Priority.BATCH,
+        )
+        result = _result(record, started, llm_resp)
+    except Exception as e:
+        result = _result(record, started, error=f"{type(e).__name__}: {e}")
+
+    quota.settle(estimate, result)
+    return result
+
+
+# POOLS
+
+class Progress:
+
+    def __init__(self, skipped: int, every: int = 50) -> None:
+        self.started = time.perf_counter()
+        self.skipped = skipped
+        self.every = every
+        self.done = 0
+        self.errors = 0
+
+    def update(self, result: Dict[str, Any]) -> None:
+        self.done += 1
+        self.errors += bool(result.get("error"))
+        if self.done % self.every == 0:
+            self.report()
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        print(
+            f"[BATCH] {self.done} done ({self.errors} errors, {self.skipped} skipped) "
+            f"in {elapsed:.1f}s — {rate:.1f}/s",
+            file=sys.stderr,
+        )
+
+
+def run_threads(records: Iterator[Dict[str, Any]], writer: ResultWriter, quota: Quota,
+                workers: int, refresh_cache: bool, progress: Progress) -> None:
+    # At most 2×workers records in flight, so huge inputs are never fully loaded
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="legitai-batch") as pool:
+        pending = set()
+        for record in records:
+            pending.add(pool.submit(run_record, record, quota, refresh_cache))
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    writer.write(result)
+                    progress.update(result)
+
+        for future in pending:
+            result = future.result()
+            writer.write(result)
+            progress.update(result)
+
+
+async def run_async(records: Iterator[Dict[str, Any]], writer: ResultWriter, quota: Quota,
+                    workers: int, refresh_cache: bool, progress: Progress) -> None:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+
+    async def worker() -> None:
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            result = await run_record_async(record, quota, refresh_cache)
+            writer.write(result)
+            progress.update(result)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    for record in records:
+        await queue.put(record)
+    for _ in tasks:
+        await queue.put(None)
+    await asyncio.gather(*tasks)
+
+
+# CLI
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.batch",
+        description="Run a JSONL corpus of (level, message, history) through the AIAS engine.",
+    )
+    parser.add_argument("input", help="JSONL file of records")
+    parser.add_argument("-o", "--output", required=True, help="results file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="output format (default: from the output extension)")
+    parser.add_argument("--mode", choices=["thread", "async"], default="thread")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rpm", type=int, default=0,
+                        help="cap this run below GEMINI_RPM, requests per minute (default: no extra cap)")
+    parser.add_argument("--tpm", type=int, default=0,
+                        help="cap this run below GEMINI_TPM, tokens per minute (default: no extra cap)")
+    parser.add_argument("--expected-output-tokens", type=int, default=SCHEDULER_EXPECTED_OUTPUT_TOKENS,
+                        help="output tokens reserved per request for --tpm "
+                             "(default: SCHEDULER_EXPECTED_OUTPUT_TOKENS)")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="ignore cached answers and ask Gemini again")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="on resume, rerun records whose previous result was an error")
+    parser.add_argument("--include-reply", action="store_true",
+                        help="also write the assistant reply text")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+
+    done = ResultWriter.completed_ids(args.output, fmt, args.retry_errors)
+    progress = Progress(skipped=0)
+
+    def pending_records() -> Iterator[Dict[str, Any]]:
+        for record in read_records(args.input):
+            if record["id"] in done:
+                progress.skipped += 1
+                continue
+            yield record
+
+    writer = ResultWriter(args.output, fmt, include_reply=args.include_reply)
+    quota = Quota(args.rpm, args.tpm, args.expected_output_tokens)
+
+    try:
+        if args.mode == "async":
+            asyncio.run(run_async(pending_records(), writer, quota, args.workers,
+                                  args.refresh_cache, progress))
+        else:
+            run_threads(pending_records(), writer, quota, args.workers,
+                        args.refresh_cache, progress)
+    except KeyboardInterrupt:
+        print("[BATCH] interrupted — rerun the same command to resume", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+        progress.report()
+
+    return 1 if progress.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
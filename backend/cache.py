@@ -0,0 +1,242 @@
+# backend/cache.py
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.gemini_client import AiasLLMResponse
+
+
+# CACHE KEYS
+
+def normalize_message(message: str) -> str:
+    """
+    Normalize a student message for exact-match lookups.
+
+    Multi-line messages usually carry code or drafts where case and
+    indentation matter, so only trailing whitespace is dropped. Single-line
+    messages are treated as prose: whitespace is collapsed and case folded,
+    so "Give me study tips" and "give me  study tips " share an entry.
+    """
+    text = message.replace("\r\n", "\n").strip()
+
+    if "\n" in text:
+        return "\n".join(line.rstrip() for line in text.split("\n"))
+
+    return " ".join(text.split()).casefold()
+
+
+def history_hash(history_window: List[Dict[str, str]], history_summary: str = "") -> str:
+    """Hash of the exact history window (and summary of older turns) in the prompt."""
+    return hashlib.sha256(
+        json.dumps(
+            [history_summary]
+            + [(m.get("role", "user"), m.get("content", "")) for m in history_window],
+            ensure_ascii=False,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def make_cache_key(model_name: str,
+                   level: int,
+                   user_message: str,
+                   history_window: List[Dict[str, str]],
+                   history_summary: str = "") -> str:
+    """
+    Key = model + selected level + normalized message + hash of the exact
+    history window (and summary of older turns) that goes into the prompt.
+    """
+    raw = json.dumps(
+        [model_name, int(level), normalize_message(user_message),
+         history_hash(history_window, history_summary)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# RESPONSE CACHE
+
+class ResponseCache:
+    """
+    Two-tier cache of validated model responses.
+
+    - Memory tier: LRU with a per-entry TTL, private to this process.
+    - SQLite tier (optional): shared by every worker process pointing at the
+      same file. Disk hits are promoted into the memory tier.
+
+    Values are stored as JSON, so every ``get`` returns a fresh object that
+    callers may mutate freely.
+    """
+
+    def __init__(self,
+                 max_entries: int = 512,
+                 ttl_seconds: float = 3600,
+                 sqlite_path: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        if sqlite_path:
+            self._init_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or bool(self.sqlite_path)
+
+    # SQLITE TIER
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.sqlite_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.commit()
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        row = self._conn().execute(
+            "SELECT expires_at, value FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[0] <= now:
+            self._disk_delete(key)
+            return None
+        return row[0], row[1]
+
+    def _disk_set(self, key: str, expires_at: float, value: str) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at),
+        )
+        conn.commit()
+
+    def _disk_delete(self, key: str) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+        conn.commit()
+
+    def purge_expired(self) -> None:
+        """Drop expired rows from the SQLite tier."""
+        if not self.sqlite_path:
+            return
+        conn = self._conn()
+        conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+
+    # MEMORY TIER
+
+    def _memory_put(self, key: str, expires_at: float, value: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # PUBLIC API
+
+    def get(self, key: str) -> Optional[AiasLLMResponse]:
+        if not self.enabled:
+            return None
+
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return AiasLLMResponse.model_validate_json(entry[1])
+
+                del self._memory[key]
+                self._stats["expirations"] += 1
+
+        if self.sqlite_path:
+            entry = self._disk_get(key, now)
+            if entry is not None:
+                self._memory_put(key, entry[0], entry[1])
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                return AiasLLMResponse.model_validate_json(entry[1])
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, response: AiasLLMResponse) -> None:
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        # Token usage belongs to the original request, not to later hits
+        value = response.model_dump_json(exclude={"usage"})
+
+        self._memory_put(key, expires_at, value)
+        if self.sqlite_path:
+            self._disk_set(key, expires_at, value)
+
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.sqlite_path:
+            self._disk_delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.sqlite_path:
+            conn = self._conn()
+            conn.execute("DELETE FROM response_cache")
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus current size, for sizing the cache."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
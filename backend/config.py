@@ -6,11 +6,126 @@ from dotenv import load_dotenv
 # Ensure .env is loaded (GEMINI_API_KEY, GEMINI_MODEL, etc.)
 load_dotenv()
 
+# Checked on the first upstream request (require_api_key), not at import,
+# so tooling and cold starts don't depend on it
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise RuntimeError(
-        "GEMINI_API_KEY is not set. Please add it to your .env file."
-    )
+
+
+def require_api_key() -> str:
+    if not GEMINI_API_KEY:
+        raise RuntimeError(
+            "GEMINI_API_KEY is not set. Please add it to your .env file."
+        )
+    return GEMINI_API_KEY
+
 
 # Default model
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+# Point the SDK somewhere other than Google (e.g. the load-test stand-in,
+# benchmarks/mock_gemini.py): GEMINI_API_ENDPOINT=http://127.0.0.1:8765
+# with GEMINI_TRANSPORT=rest. Unset = SDK defaults
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT") or None
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT") or None
+
+# Open the Gemini connection when the app starts (set to 0 to disable)
+GEMINI_WARMUP = os.getenv("GEMINI_WARMUP", "1") == "1"
+
+# Max in-flight async Gemini requests per event loop / process
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+
+# Exact-match response cache (in-memory LRU + optional shared SQLite file)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB") or None
+
+# Pre-generate answers for the suggestion pills in the background.
+# Keep PREWARM_INTERVAL below RESPONSE_CACHE_TTL so warmed entries never lapse.
+PREWARM_SUGGESTIONS = os.getenv("PREWARM_SUGGESTIONS", "1") == "1"
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "3000"))
+
+# Upload the static AIAS rules as Gemini cached content (needs a model/prefix
+# large enough for context caching; falls back to a plain system instruction)
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "0") == "1"
+GEMINI_CONTEXT_CACHE_TTL = float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+
+# Prompt history: newest turns verbatim up to this many (estimated) tokens,
+# older turns compacted into a rolling summary of at most HISTORY_SUMMARY_TOKENS
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))
+
+# Answer high-confidence out-of-level requests locally (no Gemini call)
+POLICY_PREFILTER = os.getenv("POLICY_PREFILTER", "1") == "1"
+POLICY_PREFILTER_THRESHOLD = float(os.getenv("POLICY_PREFILTER_THRESHOLD", "0.9"))
+
+# Chat session storage (SQLite file, or ":memory:" for a non-persistent store)
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "legitai_sessions.db")
+# Messages loaded per page when opening a chat
+MESSAGE_PAGE_SIZE = int(os.getenv("MESSAGE_PAGE_SIZE", "50"))
+# Chats shown in the sidebar before "Load more"
+SIDEBAR_PAGE_SIZE = int(os.getenv("SIDEBAR_PAGE_SIZE", "20"))
+# Newest messages rendered in the open chat; older ones behind "Show earlier"
+CHAT_RENDER_WINDOW = int(os.getenv("CHAT_RENDER_WINDOW", "20"))
+
+# Upstream resilience: total deadline per request (retries included), retry
+# backoff, hedged duplicates past the recent p95, circuit breaker and an
+# optional cheaper model used while the breaker is open
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", "60"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5"))
+GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "8"))
+GEMINI_HEDGE = os.getenv("GEMINI_HEDGE", "0") == "1"
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+GEMINI_FALLBACK_MODEL = os.getenv("GEMINI_FALLBACK_MODEL", "")
+
+# Send the AIAS reply model as response_schema (disable for SDKs without support)
+GEMINI_RESPONSE_SCHEMA = os.getenv("GEMINI_RESPONSE_SCHEMA", "1") == "1"
+
+# Observability: /metrics port for Prometheus (0 = off) and JSON log line per turn
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LOG = os.getenv("METRICS_LOG", "1") == "1"
+
+# Gemini quota for this deployment (0 = unlimited); used by rate limiting
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "0"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "0"))
+# Longest a request may queue for quota before failing with a timeout
+SCHEDULER_MAX_WAIT = float(os.getenv("SCHEDULER_MAX_WAIT", "60"))
+# Output tokens reserved per request until Gemini reports the real count
+SCHEDULER_EXPECTED_OUTPUT_TOKENS = int(os.getenv("SCHEDULER_EXPECTED_OUTPUT_TOKENS", "400"))
+
+# Share one upstream call between concurrent identical requests
+SINGLEFLIGHT = os.getenv("SINGLEFLIGHT", "1") == "1"
+# Followers per in-flight call; callers beyond this make their own call
+SINGLEFLIGHT_MAX_WAITERS = int(os.getenv("SINGLEFLIGHT_MAX_WAITERS", "100"))
+
+# Model routing (backend/router.py): tiers cheapest first as
+# "name=model@input/output" USD per 1M tokens, and the complexity score
+# below which each tier is used (one threshold fewer than tiers), e.g.
+#   ROUTER_TIERS="lite=gemini-2.0-flash-lite@0.075/0.30,full=gemini-2.0-flash@0.10/0.40"
+#   ROUTER_THRESHOLDS="0.35"
+ROUTER = os.getenv("ROUTER", "1") == "1"
+ROUTER_TIERS = os.getenv("ROUTER_TIERS", f"full={GEMINI_MODEL}@0.10/0.40")
+ROUTER_THRESHOLDS = [
+    float(v) for v in os.getenv("ROUTER_THRESHOLDS", "").split(",") if v.strip()
+]
+# Answer a few fixed first-turn questions (what is AIAS, study tips) locally
+ROUTER_LOCAL = os.getenv("ROUTER_LOCAL", "1") == "1"
+
+# Near-duplicate questions reuse a cached answer (backend/semantic_cache.py):
+# cosine similarity of hashed TF-IDF vectors, same level, intent and history
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+
+# Threads generating replies in the background (backend/worker.py), shared
+# by every browser session in the process
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "16"))
+
+# Per-process ceiling on chat messages held in session state (0 = never
+# spill). Above it, chats idle for MEMORY_MIN_IDLE_SECONDS are written
+# compressed to MEMORY_SPILL_DIR (default: a temp dir) until reopened
+MEMORY_LIMIT_MB = float(os.getenv("MEMORY_LIMIT_MB", "256"))
+MEMORY_MIN_IDLE_SECONDS = float(os.getenv("MEMORY_MIN_IDLE_SECONDS", "120"))
+MEMORY_SPILL_DIR = os.getenv("MEMORY_SPILL_DIR") or None
@@ -2,10 +2,51 @@
 
 from __future__ import annotations
 
+import threading
+import time
 from enum import IntEnum
-from typing import List, Dict, Any
-
-from backend.gemini_client import call_aias_model, AiasLLMResponse
+from typing import List, Dict, Any, Callable, Generator, Iterator, Optional, Tuple
+
+from backend.cache import ResponseCache, make_cache_key
+from backend.config import (
+    GEMINI_MODEL,
+    GEMINI_RPM,
+    GEMINI_TPM,
+    HISTORY_SUMMARY_TOKENS,
+    HISTORY_TOKEN_BUDGET,
+    POLICY_PREFILTER,
+    POLICY_PREFILTER_THRESHOLD,
+    RESPONSE_CACHE_DB,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+    ROUTER,
+    ROUTER_LOCAL,
+    ROUTER_THRESHOLDS,
+    ROUTER_TIERS,
+    SEMANTIC_CACHE,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+    SCHEDULER_EXPECTED_OUTPUT_TOKENS,
+    SCHEDULER_MAX_WAIT,
+    SINGLEFLIGHT,
+    SINGLEFLIGHT_MAX_WAITERS,
+)
+from backend.gemini_client import (
+    PARSE_ERROR_REASON,
+    call_aias_model,
+    call_aias_model_async,
+    stream_aias_model,
+    AiasLLMResponse,
+    TokenUsage,
+)
+from backend.history import HistoryManager, HistoryWindow
+from backend.metrics import register_collector, span
+from backend.policy import PolicyPrefilter, is_explanation_request
+from backend.router import ModelRouter, Route, parse_tiers
+from backend.scheduler import Priority, RequestCancelled, RequestScheduler, Ticket
+from backend.semantic_cache import SemanticCache, SemanticQuery, make_scope
+from backend.singleflight import SingleFlight
+from backend.tokens import estimate_tokens
 
 
 
@@ -28,6 +69,18 @@ def _level_from_int(value: int) -> AiasLevel:
 
 # PROMPT BUILDING LOGIC
 
+history_manager = HistoryManager(
+    token_budget=HISTORY_TOKEN_BUDGET,
+    summary_token_budget=HISTORY_SUMMARY_TOKENS,
+)
+
+
+def history_window(history: List[Dict[str, str]],
+                   user_message: str,
+                   session_id: Optional[str] = None) -> HistoryWindow:
+    """The part of the conversation that goes into the prompt."""
+    return history_manager.window(history, user_message, session_id)
+
 INTENT_RULES = """
 INTENT HANDLING RULES (MANDATORY, DO NOT BREAK):
 
@@ -63,20 +116,86 @@ If the user requests an EXPLANATION, you MUST NOT regenerate full code under ANY
 """
 
 
+LEVEL_RULES = """
+AIAS LEVEL RULES (STRICT):
+
+LEVEL 1 — No AI Assistance
+- NOT allowed: academic explanations, examples, concepts, summaries,
+writing help, programming, code, assignment content.
+- ALLOWED: study habits, motivation, productivity, wellbeing,
+AIAS rule explanations ONLY.
+
+LEVEL 2 — Limited Assistance
+- High-level conceptual help ONLY.
+- Allowed: brainstorming, outlines.
+- NOT allowed: detailed solutions, full paragraphs, code.
+
+LEVEL 3 — Moderate Assistance
+- Can improve or debug student-provided work.
+- NOT allowed: generating full new solutions.
+
+LEVEL 4 — Significant Assistance
+- Full examples, code, solutions allowed.
+- Must still stay within academic integrity boundaries.
+
+LEVEL 5 — AI-Dominant Assistance
+- Fully unrestricted academic support.
+"""
+
+
+def _build_system_instruction(selected_level: AiasLevel) -> str:
+    """
+    Static part of the prompt: identical for every turn at a given level,
+    so it is sent as the model's system instruction (and can be context-cached).
+    """
+    return f"""You are **LegitAI**, an Integrity-Safe AI Assistant.
+
+Follow ALL rules exactly.
+{LEVEL_RULES}
+{INTENT_RULES}
+Your job:
+1. Read the student's selected AIAS level: {selected_level.value}
+2. Determine your own "actual assistance level" (1–5).
+3. Decide if your reply violates the selected level.
+4. Output JSON fields ONLY:
+- requested_level: integer 1–5
+- is_within_selected_level: true/false
+- violation_reason: null or short string
+- assistant_reply_md: markdown response
+"""
+
+
+# Compiled once at import: one system instruction per level
+SYSTEM_INSTRUCTIONS: Dict[AiasLevel, str] = {
+    level: _build_system_instruction(level) for level in AiasLevel
+}
+
+STATIC_PROMPT_TOKENS: Dict[AiasLevel, int] = {
+    level: estimate_tokens(text) for level, text in SYSTEM_INSTRUCTIONS.items()
+}
+
+
 def build_aias_prompt(selected_level: AiasLevel,
                       user_message: str,
-                      history: List[Dict[str, str]]) -> str:
+                      history: List[Dict[str, str]],
+                      summary: str = "") -> str:
     """
-    Build prompt ensuring:
-    - AIAS rules
-    - Intent classification
-    - Level restriction
-    - Structured output from model
+    Build the per-turn (dynamic) part of the prompt:
+    - Summary of older turns
+    - Recent conversation history (already windowed, see history_window)
+    - The student's latest message
+
+    The AIAS rules, intent rules and output format live in
+    SYSTEM_INSTRUCTIONS[selected_level].
     """
 
+    summary_block = ""
+    if summary:
+        summary_block = "Summary of earlier conversation:\n" + summary + "\n\n"
+
     # Build short conversation history
     history_lines: List[str] = []
-    for msg in history[-6:]:   # last six messages
+    for msg in history:
         role = msg.get("role", "user")
         content = msg.get("content", "")
         history_lines.append(f"{role.upper()}: {content}")
@@ -85,134 +204,544 @@ def build_aias_prompt(selected_level: AiasLevel,
     if history_lines:
         history_block = "Conversation so far:\n" + "\n".join(history_lines) + "\n\n"
 
+    prompt = (
+        f"{summary_block}"
+        f"{history_block}"
+        f"Student’s latest message:\n"
+        f"\"\"\"{user_message}\"\"\""
+    )
+
+    return prompt
+
+
+# OVERRIDE: Prevent code regeneration during explanations
+
+def apply_explanation_override(user_message: str) -> str:
+    """
+    If user clearly asks for explanation, ensure model NEVER generates new code.
+    """
+    if is_explanation_request(user_message):
+        return user_message + (
+            "\n\nIMPORTANT: The user is explicitly asking for an explanation. "
+            "Do NOT generate new code. ONLY explain the existing code."
+        )
+
+    return user_message
 
-    # LEVEL RULES
 
-    LEVEL_RULES = f"""
-        AIAS LEVEL RULES (STRICT):
+# MODEL RESPONSE PROCESSING
 
-        LEVEL 1 — No AI Assistance
-        - NOT allowed: academic explanations, examples, concepts, summaries,
-        writing help, programming, code, assignment content.
-        - ALLOWED: study habits, motivation, productivity, wellbeing,
-        AIAS rule explanations ONLY.
+def _enforce_selected_level(llm_resp: AiasLLMResponse,
+                            selected_level: AiasLevel) -> AiasLLMResponse:
+    """
+    Clamp the model's self-reported level and make the violation flags
+    consistent with the student's selected level.
+    """
 
-        LEVEL 2 — Limited Assistance
-        - High-level conceptual help ONLY.
-        - Allowed: brainstorming, outlines.
-        - NOT allowed: detailed solutions, full paragraphs, code.
+    with span("level_clamp"):
+        # Safety clamp
+        if llm_resp.requested_level not in (1, 2, 3, 4, 5):
+            llm_resp.requested_level = selected_level.value
 
-        LEVEL 3 — Moderate Assistance
-        - Can improve or debug student-provided work.
-        - NOT allowed: generating full new solutions.
+        allowed = llm_resp.requested_level <= selected_level.value
 
-        LEVEL 4 — Significant Assistance
-        - Full examples, code, solutions allowed.
-        - Must still stay within academic integrity boundaries.
+        if llm_resp.is_within_selected_level != allowed:
+            llm_resp.is_within_selected_level = allowed
 
-        LEVEL 5 — AI-Dominant Assistance
-        - Fully unrestricted academic support.
-        """
+            if not allowed and not llm_resp.violation_reason:
+                llm_resp.violation_reason = f"This exceeds AIAS Level {selected_level.value}."
 
-    # FINAL PROMPT
+    return llm_resp
 
-    prompt = f"""
-        You are **LegitAI**, an Integrity-Safe AI Assistant.
 
-        Follow ALL rules exactly.
+# LOCAL POLICY PRE-FILTER
+
+policy_prefilter = PolicyPrefilter(
+    threshold=POLICY_PREFILTER_THRESHOLD,
+    enabled=POLICY_PREFILTER,
+)
+
+
+def _local_policy_response(selected_level: AiasLevel,
+                           user_message: str) -> Optional[AiasLLMResponse]:
+    with span("policy_prefilter"):
+        llm_resp = policy_prefilter.check(selected_level.value, user_message)
+    if llm_resp is None:
+        return None
+    llm_resp.usage = TokenUsage()   # no upstream tokens spent
+    return _enforce_selected_level(llm_resp, selected_level)
+
+
+# RESPONSE CACHE
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl_seconds=RESPONSE_CACHE_TTL,
+    sqlite_path=RESPONSE_CACHE_DB,
+)
+
+
+# Near-duplicates of a cached question ("explain big-O notation simply"
+# after "explain big O notation") in the same level, intent and history
+# resolve to that question's cache key
+semantic_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_SIZE,
+    ttl_seconds=RESPONSE_CACHE_TTL,
+    enabled=SEMANTIC_CACHE,
+)
+
+
+def _cache_response(cache_key: str,
+                    llm_resp: AiasLLMResponse,
+                    semantic: Optional[SemanticQuery] = None) -> None:
+    # Never cache the parse-error fallback, the next try may well succeed
+    if llm_resp.violation_reason == PARSE_ERROR_REASON:
+        return
+    response_cache.set(cache_key, llm_resp)
+    if semantic is not None:
+        semantic_cache.add(semantic, cache_key)
+
+
+def _cache_lookup(cache_key: str,
+                  semantic: Optional[SemanticQuery] = None) -> Optional[AiasLLMResponse]:
+    with span("cache_lookup"):
+        llm_resp = response_cache.get(cache_key)
+    if llm_resp is not None or semantic is None:
+        return llm_resp
+
+    with span("semantic_lookup"):
+        similar_key = semantic_cache.lookup(semantic)
+        if similar_key is None:
+            return None
+        llm_resp = response_cache.get(similar_key)
+        if llm_resp is None:
+            semantic_cache.discard(similar_key)
+    return llm_resp
 
-        {LEVEL_RULES}
 
-        {INTENT_RULES}
+register_collector("response_cache", response_cache.stats)
+register_collector("semantic_cache", semantic_cache.stats)
+register_collector("policy", policy_prefilter.stats)
 
-        Your job:
-        1. Read the student's selected AIAS level: {selected_level.value}
-        2. Determine your own "actual assistance level" (1–5).
-        3. Decide if your reply violates the selected level.
-        4. Output JSON fields ONLY:
-        - requested_level: integer 1–5
-        - is_within_selected_level: true/false
-        - violation_reason: null or short string
-        - assistant_reply_md: markdown response
 
-        {history_block}
+# REQUEST SCHEDULER (shared by every session in the process)
 
-        Student’s latest message:
-        \"\"\"{user_message}\"\"\"
-        """
+request_scheduler = RequestScheduler(
+    rpm=GEMINI_RPM,
+    tpm=GEMINI_TPM,
+    max_wait=SCHEDULER_MAX_WAIT,
+)
 
-    return prompt
+register_collector("scheduler", request_scheduler.stats)
 
 
-# OVERRIDE: Prevent code regeneration during explanations
+def _scheduler_args(selected_level: AiasLevel,
+                    prompt: str,
+                    user_id: Optional[str],
+                    session_id: Optional[str],
+                    priority: Priority,
+                    on_queue_position: Optional[Callable[[int], None]],
+                    cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    return {
+        "user_id": user_id or session_id or "anonymous",
+        "priority": priority,
+        # Reserved up front, corrected by _settle once usage is known
+        "tokens": (
+            STATIC_PROMPT_TOKENS[selected_level]
+            + estimate_tokens(prompt)
+            + SCHEDULER_EXPECTED_OUTPUT_TOKENS
+        ),
+        "on_position": on_queue_position,
+        "cancel_event": cancel_event,
+    }
 
-def apply_explanation_override(user_message: str) -> str:
+
+def _settle(ticket: Ticket, llm_resp: AiasLLMResponse) -> None:
+    usage = llm_resp.usage
+    if usage is not None and usage.prompt_tokens:
+        request_scheduler.settle(ticket, usage.prompt_tokens + usage.output_tokens)
+
+
+# MODEL ROUTING
+# Cheap requests go to a cheaper tier (or a canned local answer); the route
+# is decided before the cache lookup, and its model is part of the cache key.
+
+model_router = ModelRouter(
+    tiers=parse_tiers(ROUTER_TIERS),
+    thresholds=ROUTER_THRESHOLDS,
+    local_enabled=ROUTER_LOCAL,
+    enabled=ROUTER,
+)
+
+register_collector("router", model_router.stats)
+
+
+def _record_route(route: Route, llm_resp: AiasLLMResponse, elapsed: float) -> None:
+    usage = llm_resp.usage or TokenUsage()
+    model_router.record(route.tier, elapsed, usage.prompt_tokens, usage.output_tokens)
+
+
+def _canned_response(route: Route, selected_level: AiasLevel) -> AiasLLMResponse:
+    llm_resp = AiasLLMResponse(
+        requested_level=1,
+        is_within_selected_level=True,
+        violation_reason=None,
+        assistant_reply_md=route.canned_reply,
+        usage=TokenUsage(),   # no upstream tokens spent
+    )
+    model_router.record(route.tier, 0.0)
+    return _enforce_selected_level(llm_resp, selected_level)
+
+
+# IN-FLIGHT COALESCING
+# Students clicking the same suggestion at the same moment all miss the
+# cache; they share one upstream call keyed by the response cache key.
+# Followers are accounted like cache hits (no upstream tokens spent). A
+# leader cancelled while still queued hands the call over to a follower.
+
+inflight = SingleFlight(
+    max_waiters=SINGLEFLIGHT_MAX_WAITERS,
+    copy_result=lambda resp: resp.model_copy(deep=True),
+    enabled=SINGLEFLIGHT,
+    abandoned=(RequestCancelled,),
+)
+
+register_collector("singleflight", inflight.stats)
+
+
+def _fetch(selected_level: AiasLevel,
+           prompt: str,
+           cache_key: str,
+           semantic: Optional[SemanticQuery],
+           route: Route,
+           scheduler_args: Dict[str, Any]) -> AiasLLMResponse:
+    with span("queue_wait"):
+        ticket = request_scheduler.acquire(**scheduler_args)
+    started = time.perf_counter()
+    llm_resp = call_aias_model(prompt, SYSTEM_INSTRUCTIONS[selected_level], route.tier.model)
+    _record_route(route, llm_resp, time.perf_counter() - started)
+    _settle(ticket, llm_resp)
+    _cache_response(cache_key, llm_resp, semantic)
+    return llm_resp
+
+
+async def _fetch_async(selected_level: AiasLevel,
+                       prompt: str,
+                       cache_key: str,
+                       semantic: Optional[SemanticQuery],
+                       route: Route,
+                       scheduler_args: Dict[str, Any]) -> AiasLLMResponse:
+    with span("queue_wait"):
+        ticket = await request_scheduler.acquire_async(**scheduler_args)
+    started = time.perf_counter()
+    llm_resp = await call_aias_model_async(
+        prompt, SYSTEM_INSTRUCTIONS[selected_level], route.tier.model
+    )
+    _record_route(route, llm_resp, time.perf_counter() - started)
+    _settle(ticket, llm_resp)
+    _cache_response(cache_key, llm_resp, semantic)
+    return llm_resp
+
+
+def _fetch_stream(selected_level: AiasLevel,
+                  prompt: str,
+                  cache_key: str,
+                  semantic: Optional[SemanticQuery],
+                  route: Route,
+                  scheduler_args: Dict[str, Any]) -> Generator[str, None, AiasLLMResponse]:
+    with span("queue_wait"):
+        ticket = request_scheduler.acquire(**scheduler_args)
+    started = time.perf_counter()
+    llm_resp = yield from stream_aias_model(
+        prompt, SYSTEM_INSTRUCTIONS[selected_level], route.tier.model,
+        cancel_event=scheduler_args["cancel_event"],
+    )
+    # Includes time the reader spent between chunks, like upstream_total
+    _record_route(route, llm_resp, time.perf_counter() - started)
+    _settle(ticket, llm_resp)
+    _cache_response(cache_key, llm_resp, semantic)
+    return llm_resp
+
+
+def _prepare_prompt(selected_level_int: int,
+                    user_message: str,
+                    history: List[Dict[str, str]],
+                    session_id: Optional[str]
+                    ) -> Tuple[AiasLevel, str, str, Optional[SemanticQuery], Route]:
+    selected_level = _level_from_int(selected_level_int)
+
+    with span("history_window"):
+        window = history_window(history, user_message, session_id)
+
+    # Apply explanation override
+    with span("explanation_override"):
+        safe_user_message = apply_explanation_override(user_message)
+
+    with span("build_prompt"):
+        prompt = build_aias_prompt(
+            selected_level, safe_user_message, window.messages, window.summary
+        )
+
+    with span("route"):
+        route = model_router.route(selected_level.value, user_message, window.messages)
+
+    model_name = route.tier.model or GEMINI_MODEL
+    cache_key = make_cache_key(
+        model_name, selected_level.value, user_message, window.messages, window.summary
+    )
+    semantic = semantic_cache.query(
+        make_scope(model_name, selected_level.value, route.features.intent.value,
+                   window.messages, window.summary),
+        user_message,
+    )
+
+    return selected_level, prompt, cache_key, semantic, route
+
+
+def _record_usage(llm_resp: AiasLLMResponse,
+                  selected_level: AiasLevel,
+                  prompt: str,
+                  from_cache: bool) -> None:
     """
-    If user clearly asks for explanation, ensure model NEVER generates new code.
+    Fill in the static (system instruction) vs dynamic (history + message)
+    split of the prompt tokens for this request.
     """
-    lowered = user_message.lower()
+    static_tokens = STATIC_PROMPT_TOKENS[selected_level]
 
-    explanation_triggers = [
-        "explain", "explanation",
-        "describe", "walk me through",
-        "what does this do",
-        "how does this work",
-        "explain the code"
-    ]
+    if from_cache:
+        llm_resp.usage = TokenUsage(response_cache_hit=True)
+        return
 
-    if any(word in lowered for word in explanation_triggers):
-        return user_message + (
-            "\n\nIMPORTANT: The user is explicitly asking for an explanation. "
-            "Do NOT generate new code. ONLY explain the existing code."
-        )
+    usage = llm_resp.usage or TokenUsage()
 
-    return user_message
+    if usage.prompt_tokens:
+        # Exact total from Gemini, static share estimated locally
+        usage.static_tokens = min(static_tokens, usage.prompt_tokens)
+        usage.dynamic_tokens = usage.prompt_tokens - usage.static_tokens
+    else:
+        usage.static_tokens = static_tokens
+        usage.dynamic_tokens = estimate_tokens(prompt)
+        usage.prompt_tokens = usage.static_tokens + usage.dynamic_tokens
 
+    llm_resp.usage = usage
 
-# MODEL RESPONSE PROCESSING
 
 def generate_aias_response(selected_level_int: int,
                            user_message: str,
-                           history: List[Dict[str, str]]) -> AiasLLMResponse:
+                           history: List[Dict[str, str]],
+                           refresh_cache: bool = False,
+                           session_id: Optional[str] = None,
+                           user_id: Optional[str] = None,
+                           priority: Priority = Priority.INTERACTIVE,
+                           on_queue_position: Optional[Callable[[int], None]] = None,
+                           cancel_event: Optional[threading.Event] = None
+                           ) -> AiasLLMResponse:
     """
-    Build prompt → call Gemini → validate → return structured.
+    Build prompt → (cache) → call Gemini → validate → return structured.
+    refresh_cache=True skips the lookup and overwrites any cached entry.
+
+    Upstream calls wait for a slot from request_scheduler (fair per user_id,
+    falling back to session_id); on_queue_position receives the number of
+    requests ahead while waiting. Setting cancel_event while queued raises
+    RequestCancelled instead of going upstream.
     """
 
-    selected_level = _level_from_int(selected_level_int)
+    selected_level, prompt, cache_key, semantic, route = _prepare_prompt(
+        selected_level_int, user_message, history, session_id
+    )
 
-    # Apply explanation override
-    safe_user_message = apply_explanation_override(user_message)
+    local_resp = _local_policy_response(selected_level, user_message)
+    if local_resp is not None:
+        return local_resp
 
-    prompt = build_aias_prompt(selected_level, safe_user_message, history)
+    if route.canned_reply is not None:
+        return _canned_response(route, selected_level)
 
-    llm_resp = call_aias_model(prompt)
+    llm_resp = None if refresh_cache else _cache_lookup(cache_key, semantic)
+    from_cache = llm_resp is not None
+    if llm_resp is None:
+        scheduler_args = _scheduler_args(
+            selected_level, prompt, user_id, session_id, priority, on_queue_position,
+            cancel_event,
+        )
+        llm_resp, from_cache = inflight.do(
+            cache_key, lambda: _fetch(
+                selected_level, prompt, cache_key, semantic, route, scheduler_args
+            )
+        )
 
-    # Safety clamp
-    if llm_resp.requested_level not in (1, 2, 3, 4, 5):
-        llm_resp.requested_level = selected_level.value
+    _record_usage(llm_resp, selected_level, prompt, from_cache)
 
-    allowed = llm_resp.requested_level <= selected_level.value
+    return _enforce_selected_level(llm_resp, selected_level)
 
-    if llm_resp.is_within_selected_level != allowed:
-        llm_resp.is_within_selected_level = allowed
 
-        if not allowed and not llm_resp.violation_reason:
-            llm_resp.violation_reason = f"This exceeds AIAS Level {selected_level.value}."
+async def generate_aias_response_async(selected_level_int: int,
+                                       user_message: str,
+                                       history: List[Dict[str, str]],
+                                       refresh_cache: bool = False,
+                                       session_id: Optional[str] = None,
+                                       user_id: Optional[str] = None,
+                                       priority: Priority = Priority.INTERACTIVE,
+                                       on_queue_position: Optional[Callable[[int], None]] = None
+                                       ) -> AiasLLMResponse:
+    """
+    Async variant of generate_aias_response (bounded by GEMINI_MAX_CONCURRENCY).
+    """
 
-    return llm_resp
+    selected_level, prompt, cache_key, semantic, route = _prepare_prompt(
+        selected_level_int, user_message, history, session_id
+    )
 
+    local_resp = _local_policy_response(selected_level, user_message)
+    if local_resp is not None:
+        return local_resp
 
-# PUBLIC API FOR FRONTEND
+    if route.canned_reply is not None:
+        return _canned_response(route, selected_level)
 
-def chat_with_aias(selected_level_int: int,
-                   user_message: str,
-                   history: List[Dict[str, str]]) -> Dict[str, Any]:
+    llm_resp = None if refresh_cache else _cache_lookup(cache_key, semantic)
+    from_cache = llm_resp is not None
+    if llm_resp is None:
+        scheduler_args = _scheduler_args(
+            selected_level, prompt, user_id, session_id, priority, on_queue_position
+        )
+        llm_resp, from_cache = await inflight.do_async(
+            cache_key,
+            lambda: _fetch_async(
+                selected_level, prompt, cache_key, semantic, route, scheduler_args
+            ),
+        )
 
-    llm_resp = generate_aias_response(selected_level_int, user_message, history)
+    _record_usage(llm_resp, selected_level, prompt, from_cache)
 
+    return _enforce_selected_level(llm_resp, selected_level)
+
+
+def generate_aias_response_stream(selected_level_int: int,
+                                  user_message: str,
+                                  history: List[Dict[str, str]],
+                                  session_id: Optional[str] = None,
+                                  user_id: Optional[str] = None,
+                                  priority: Priority = Priority.INTERACTIVE,
+                                  on_queue_position: Optional[Callable[[int], None]] = None,
+                                  cancel_event: Optional[threading.Event] = None
+                                  ) -> Generator[str, None, AiasLLMResponse]:
+    """
+    Streaming variant of generate_aias_response.
+    Yields reply chunks, returns the validated response when done.
+    A cache hit is yielded as a single chunk. Closing the generator
+    abandons the upstream stream, unless coalesced callers are still
+    reading it.
+    """
+
+    selected_level, prompt, cache_key, semantic, route = _prepare_prompt(
+        selected_level_int, user_message, history, session_id
+    )
+
+    local_resp = _local_policy_response(selected_level, user_message)
+    if local_resp is not None:
+        yield local_resp.assistant_reply_md
+        return local_resp
+
+    if route.canned_reply is not None:
+        canned = _canned_response(route, selected_level)
+        yield canned.assistant_reply_md
+        return canned
+
+    llm_resp = _cache_lookup(cache_key, semantic)
+    from_cache = llm_resp is not None
+    if llm_resp is not None:
+        yield llm_resp.assistant_reply_md
+    else:
+        scheduler_args = _scheduler_args(
+            selected_level, prompt, user_id, session_id, priority, on_queue_position,
+            cancel_event,
+        )
+        llm_resp, from_cache = yield from inflight.stream(
+            cache_key,
+            lambda: _fetch_stream(
+                selected_level, prompt, cache_key, semantic, route, scheduler_args
+            ),
+            cancel_event=cancel_event,
+        )
+
+    _record_usage(llm_resp, selected_level, prompt, from_cache)
+
+    return _enforce_selected_level(llm_resp, selected_level)
+
+
+# PUBLIC API FOR FRONTEND
+
+def _to_chat_result(llm_resp: AiasLLMResponse) -> Dict[str, Any]:
     return {
         "requested_level": llm_resp.requested_level,
         "is_within_selected_level": llm_resp.is_within_selected_level,
         "violation_reason": llm_resp.violation_reason,
         "assistant_reply": llm_resp.assistant_reply_md,
+        "usage": llm_resp.usage.model_dump() if llm_resp.usage else None,
     }
+
+
+def chat_with_aias(selected_level_int: int,
+                   user_message: str,
+                   history: List[Dict[str, str]],
+                   session_id: Optional[str] = None,
+                   user_id: Optional[str] = None,
+                   on_queue_position: Optional[Callable[[int], None]] = None,
+                   cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+
+    llm_resp = generate_aias_response(
+        selected_level_int, user_message, history, session_id=session_id,
+        user_id=user_id, on_queue_position=on_queue_position, cancel_event=cancel_event,
+    )
+
+    return _to_chat_result(llm_resp)
+
+
+async def chat_with_aias_async(selected_level_int: int,
+                               user_message: str,
+                               history: List[Dict[str, str]],
+                               session_id: Optional[str] = None,
+                               user_id: Optional[str] = None,
+                               on_queue_position: Optional[Callable[[int], None]] = None
+                               ) -> Dict[str, Any]:
+
+    llm_resp = await generate_aias_response_async(
+        selected_level_int, user_message, history, session_id=session_id,
+        user_id=user_id, on_queue_position=on_queue_position,
+    )
+
+    return _to_chat_result(llm_resp)
+
+
+class AiasChatStream:
+    """
+    Iterate to receive reply chunks as they are generated.
+    Once iteration finishes, ``result`` holds the same dict chat_with_aias returns.
+    """
+
+    def __init__(self, chunks: Generator[str, None, AiasLLMResponse]) -> None:
+        self._chunks = chunks
+        self.result: Optional[Dict[str, Any]] = None
+
+    def __iter__(self) -> Iterator[str]:
+        llm_resp = yield from self._chunks
+        self.result = _to_chat_result(llm_resp)
+
+
+def chat_with_aias_stream(selected_level_int: int,
+                          user_message: str,
+                          history: List[Dict[str, str]],
+                          session_id: Optional[str] = None,
+                          user_id: Optional[str] = None,
+                          on_queue_position: Optional[Callable[[int], None]] = None,
+                          cancel_event: Optional[threading.Event] = None
+                          ) -> AiasChatStream:
+
+    return AiasChatStream(
+        generate_aias_response_stream(
+            selected_level_int, user_message, history, session_id=session_id,
+            user_id=user_id, on_queue_position=on_queue_position, cancel_event=cancel_event,
+        )
+    )
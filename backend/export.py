@@ -0,0 +1,145 @@
+# backend/export.py
+
+from __future__ import annotations
+
+import json
+import re
+import tempfile
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Union
+
+from backend.storage import SessionStore
+
+
+class ExportFormat(NamedTuple):
+    label: str
+    extension: str
+    mime: str
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "txt": ExportFormat("Plain text", "txt", "text/plain"),
+    "md": ExportFormat("Markdown", "md", "text/markdown"),
+    "jsonl": ExportFormat("JSON Lines", "jsonl", "application/x-ndjson"),
+}
+
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w\- .]+")
+
+
+def export_filename(title: str, fmt: str) -> str:
+    safe = _UNSAFE_FILENAME_RE.sub("", title).strip() or "chat"
+    return f"{safe[:60]}.{EXPORT_FORMATS[fmt].extension}"
+
+
+def _meta_line(meta: Dict[str, Any]) -> str:
+    parts = [f"requested level {meta.get('requested_level')}"]
+    if meta.get("is_within_selected_level") is False:
+        parts.append("VIOLATION: " + (meta.get("violation_reason") or "exceeds selected level"))
+    else:
+        parts.append("within selected level")
+    return " · ".join(parts)
+
+
+# TRANSCRIPT GENERATORS (one chunk per message, nothing held in memory)
+
+def _iter_txt(session: Dict[str, Any], messages: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    yield f"Chat Title: {session['title']}\n"
+    yield f"AIAS Level: {session.get('level') or 'Not selected'}\n"
+    yield "-" * 40 + "\n\n"
+
+    for msg in messages:
+        role = "USER" if msg["role"] == "user" else "ASSISTANT"
+        meta = msg.get("meta")
+        meta_text = f"[{_meta_line(meta)}]\n" if meta else ""
+        yield f"{role}:\n{meta_text}{msg['content']}\n\n"
+
+
+def _iter_md(session: Dict[str, Any], messages: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    yield f"# {session['title']}\n\n"
+    yield f"**AIAS Level:** {session.get('level') or 'Not selected'}\n\n---\n\n"
+
+    for msg in messages:
+        heading = "🧑 User" if msg["role"] == "user" else "🤖 Assistant"
+        meta = msg.get("meta")
+        meta_text = f"_{_meta_line(meta)}_\n\n" if meta else ""
+        yield f"### {heading}\n\n{meta_text}{msg['content']}\n\n"
+
+
+def _iter_jsonl(session: Dict[str, Any], messages: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    header = {
+        "type": "session",
+        "id": session.get("id"),
+        "title": session["title"],
+        "level": session.get("level"),
+        "created_at": session.get("created_at"),
+        "updated_at": session.get("updated_at"),
+    }
+    yield json.dumps(header, ensure_ascii=False) + "\n"
+
+    for msg in messages:
+        record = {"type": "message", "role": msg["role"], "content": msg["content"]}
+        record.update(msg.get("meta") or {})
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+_WRITERS = {"txt": _iter_txt, "md": _iter_md, "jsonl": _iter_jsonl}
+
+
+def iter_transcript(session: Dict[str, Any],
+                    messages: Iterable[Dict[str, Any]],
+                    fmt: str = "txt") -> Iterator[str]:
+    """Stream one chat as text chunks in the given format."""
+    return _WRITERS[fmt](session, messages)
+
+
+# BULK EXPORT
+
+class _ChunkSink:
+    """Write-only, non-seekable stream; zipfile falls back to data descriptors."""
+
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        chunks, self.chunks = self.chunks, []
+        yield from chunks
+
+
+def iter_zip_archive(store: SessionStore, user_id: str, fmt: str = "txt") -> Iterator[bytes]:
+    """
+    Stream every chat of a user as a zip archive, one file per chat.
+    Messages are read from the store in batches and compressed as they go.
+    """
+    sink = _ChunkSink()
+
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for i, session in enumerate(store.list_sessions(user_id), start=1):
+            name = f"{i:03d}_{export_filename(session['title'], fmt)}"
+
+            with archive.open(name, mode="w", force_zip64=True) as entry:
+                for chunk in iter_transcript(session, store.iter_messages(session["id"]), fmt):
+                    entry.write(chunk.encode("utf-8"))
+                    yield from sink.drain()
+
+            yield from sink.drain()
+
+    yield from sink.drain()
+
+
+def spool(chunks: Iterable[Union[str, bytes]], max_memory: int = 8 * 1024 * 1024) -> BinaryIO:
+    """
+    Collect streamed chunks into a file object (spills to disk past
+    ``max_memory`` bytes), rewound and ready to be read or downloaded.
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    for chunk in chunks:
+        out.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+    out.seek(0)
+    return out
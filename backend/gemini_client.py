@@ -1,47 +1,339 @@
 # backend/gemini_client.py
 
-import google.generativeai as genai
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from pydantic import BaseModel
-from typing import Optional
-from backend.config import GEMINI_API_KEY, GEMINI_MODEL
+from typing import TYPE_CHECKING, Any, Callable, Dict, Generator, List, Optional, Tuple
+from backend.config import (
+    GEMINI_MODEL,
+    GEMINI_API_ENDPOINT,
+    GEMINI_TRANSPORT,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_CONTEXT_CACHE,
+    GEMINI_CONTEXT_CACHE_TTL,
+    GEMINI_DEADLINE,
+    GEMINI_MAX_RETRIES,
+    GEMINI_RETRY_BASE_DELAY,
+    GEMINI_RETRY_MAX_DELAY,
+    GEMINI_HEDGE,
+    GEMINI_HEDGE_MIN_SAMPLES,
+    GEMINI_BREAKER_FAILURES,
+    GEMINI_BREAKER_RESET,
+    GEMINI_FALLBACK_MODEL,
+    GEMINI_RESPONSE_SCHEMA,
+    require_api_key,
+)
+from backend.metrics import observe, register_collector, span
+from backend.parsing import parse_llm_json
+from backend.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    RetryPolicy,
+    is_retryable,
+)
+from backend.scheduler import RequestCancelled
+from backend.startup import timed
 
-# Configure API key
-genai.configure(api_key=GEMINI_API_KEY)
+if TYPE_CHECKING:
+    import google.generativeai as genai
 
-# Pydantic response model
-class AiasLLMResponse(BaseModel):
+# PROVIDER SDK
+#
+# google.generativeai (and the gRPC / protobuf stack under it) takes longer
+# to import than the rest of the app together. Import and configure it on
+# the first upstream request, so a new worker can serve its first page
+# without paying for it.
+
+_genai_module = None
+_genai_lock = threading.Lock()
+
+
+def _genai():
+    global _genai_module
+    if _genai_module is None:
+        with _genai_lock:
+            if _genai_module is None:
+                with timed("genai_import"):
+                    import google.generativeai as genai
+                    genai.configure(
+                        api_key=require_api_key(),
+                        transport=GEMINI_TRANSPORT,
+                        client_options=(
+                            {"api_endpoint": GEMINI_API_ENDPOINT} if GEMINI_API_ENDPOINT else None
+                        ),
+                    )
+                _genai_module = genai
+    return _genai_module
+
+
+# Token accounting for one request (filled in by the client / engine)
+class TokenUsage(BaseModel):
+    prompt_tokens: int = 0
+    static_tokens: int = 0       # system instruction share of prompt_tokens
+    dynamic_tokens: int = 0      # history + latest message share
+    cached_tokens: int = 0       # prompt tokens served from Gemini context cache
+    output_tokens: int = 0
+    response_cache_hit: bool = False
+
+
+# Fields the model must produce (also sent as the response schema)
+class AiasReplySchema(BaseModel):
     requested_level: int
     is_within_selected_level: bool
     violation_reason: Optional[str]
     assistant_reply_md: str
 
-def call_aias_model(prompt: str) -> AiasLLMResponse:
+
+# Pydantic response model
+class AiasLLMResponse(AiasReplySchema):
+    usage: Optional[TokenUsage] = None   # not produced by the model
+
+
+# Targeted re-ask when only the level fields are missing
+class AiasLevelCheck(BaseModel):
+    requested_level: int
+    violation_reason: Optional[str]
+
+
+# Every AIAS call asks for a JSON body
+AIAS_GENERATION_CONFIG: Dict[str, Any] = {
+    "response_mime_type": "application/json"
+}
+if GEMINI_RESPONSE_SCHEMA:
+    AIAS_GENERATION_CONFIG["response_schema"] = AiasReplySchema
+
+REASK_GENERATION_CONFIG: Dict[str, Any] = {
+    "response_mime_type": "application/json",
+    "response_schema": AiasLevelCheck,
+}
+
+
+def _usage_from_response(response: Any) -> Optional[TokenUsage]:
+    meta = getattr(response, "usage_metadata", None)
+    if meta is None:
+        return None
+    return TokenUsage(
+        prompt_tokens=getattr(meta, "prompt_token_count", 0) or 0,
+        cached_tokens=getattr(meta, "cached_content_token_count", 0) or 0,
+        output_tokens=getattr(meta, "candidates_token_count", 0) or 0,
+    )
+
+
+# violation_reason of the fallback object returned when parsing fails
+PARSE_ERROR_REASON = "Model returned invalid JSON."
+
+
+# CLIENT REGISTRY
+#
+# GenerativeModel objects are cheap to keep but not free to build, and the
+# gRPC/HTTP transport behind them is only set up on first use. Keep one model
+# per (model name, generation config, system instruction) for the whole
+# process so every Streamlit rerun and every user reuses the same warmed
+# connection.
+
+# key → (model, expires_at); expires_at is set for context-cached models
+_model_registry: Dict[Tuple[str, str, str], Tuple[genai.GenerativeModel, Optional[float]]] = {}
+_registry_lock = threading.Lock()
+
+
+def _registry_key(model_name: str,
+                  generation_config: Optional[Dict[str, Any]],
+                  system_instruction: Optional[str]) -> Tuple[str, str, str]:
+    return (
+        model_name,
+        # Schema classes are keyed by name
+        json.dumps(generation_config or {}, sort_keys=True,
+                   default=lambda o: getattr(o, "__name__", repr(o))),
+        system_instruction or "",
+    )
+
+
+def _create_context_cached_model(model_name: str,
+                                 generation_config: Dict[str, Any],
+                                 system_instruction: str) -> genai.GenerativeModel:
     """
-    Calls Gemini and parses JSON manually.
-    Compatible with Streamlit Cloud (which uses older google-generativeai).
+    Upload the system instruction as Gemini cached content so its tokens are
+    billed at the cached rate and skip prefill on every request.
     """
+    cached = _genai().caching.CachedContent.create(
+        model=model_name,
+        display_name="legitai-aias-rules",
+        system_instruction=system_instruction,
+        ttl=datetime.timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL),
+    )
+    return _genai().GenerativeModel.from_cached_content(
+        cached, generation_config=generation_config
+    )
+
 
-    model = genai.GenerativeModel(GEMINI_MODEL)
+def _build_model(model_name: str,
+                 generation_config: Dict[str, Any],
+                 system_instruction: Optional[str]) -> Tuple[genai.GenerativeModel, Optional[float]]:
+    if system_instruction and GEMINI_CONTEXT_CACHE:
+        try:
+            model = _create_context_cached_model(
+                model_name, generation_config, system_instruction
+            )
+            # Rebuild a little before the server-side cache expires
+            return model, time.time() + GEMINI_CONTEXT_CACHE_TTL * 0.9
+        except Exception as e:
+            # e.g. prefix below the model's minimum cacheable size
+            print("[GEMINI CONTEXT CACHE UNAVAILABLE]", repr(e))
 
-    response = model.generate_content(
-        prompt,
-        generation_config={
-            "response_mime_type": "application/json"
-        }
+    model = _genai().GenerativeModel(
+        model_name,
+        generation_config=generation_config,
+        system_instruction=system_instruction,
     )
+    return model, None
+
+
+def get_model(model_name: str = GEMINI_MODEL,
+              generation_config: Optional[Dict[str, Any]] = None,
+              system_instruction: Optional[str] = None) -> genai.GenerativeModel:
+    """
+    Return the shared GenerativeModel for this name + config + system
+    instruction, creating it once.
+    """
+    if generation_config is None:
+        generation_config = AIAS_GENERATION_CONFIG
+
+    key = _registry_key(model_name, generation_config, system_instruction)
+
+    entry = _model_registry.get(key)
+    if entry is not None and (entry[1] is None or entry[1] > time.time()):
+        return entry[0]
+
+    with _registry_lock:
+        entry = _model_registry.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            entry = _build_model(model_name, generation_config, system_instruction)
+            _model_registry[key] = entry
+
+    return entry[0]
+
+
+def warm_up_client(model_name: str = GEMINI_MODEL) -> Optional[float]:
+    """
+    Open the upstream connection ahead of the first real request.
+
+    Uses a count_tokens call (no generation, no output tokens) so the TLS
+    handshake and channel setup are paid at startup instead of on a
+    student's first turn. Returns the elapsed seconds, or None on failure.
+    """
+    start = time.perf_counter()
+    try:
+        get_model(model_name).count_tokens("ping")
+    except Exception as e:
+        print("[GEMINI WARM-UP FAILED]", repr(e))
+        return None
+
+    return time.perf_counter() - start
+
+
+# PARSING
+
+_parse_stats = {"ok": 0, "repaired": 0, "partial": 0, "reasked": 0, "failed": 0}
+_parse_stats_lock = threading.Lock()
+
+
+def _count_parse(outcome: str) -> None:
+    with _parse_stats_lock:
+        _parse_stats[outcome] += 1
+
+
+def parse_stats() -> Dict[str, Any]:
+    """Parse outcome counters; failure_rate counts only unrecoverable output."""
+    with _parse_stats_lock:
+        stats: Dict[str, Any] = dict(_parse_stats)
+    total = stats["ok"] + stats["repaired"] + stats["partial"] + stats["failed"]
+    stats["failure_rate"] = stats["failed"] / total if total else 0.0
+    return stats
+
+
+REASK_PROMPT = """Your previous answer to the student was cut off before its
+level assessment. Assess the reply below and return ONLY:
+- requested_level: integer 1–5 (the assistance level this reply actually provides)
+- violation_reason: null or short string
+
+{prompt}
+
+Your reply:
+\"\"\"{reply}\"\"\"
+"""
+
+
+def _reask_level_fields(reply: str,
+                        prompt: str,
+                        system_instruction: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Ask only for the missing level fields instead of regenerating the whole
+    answer: a few output tokens rather than a full reply.
+    """
+
+    def attempt(model_name: str, timeout: float) -> Any:
+        model = get_model(
+            model_name,
+            generation_config=REASK_GENERATION_CONFIG,
+            system_instruction=system_instruction,
+        )
+        return model.generate_content(
+            REASK_PROMPT.format(prompt=prompt, reply=reply),
+            request_options={"timeout": timeout},
+        )
 
-    # Gemini returns text → we must parse JSON manually.
     try:
-        import json
+        _, response = _with_retries(attempt)
+        data = parse_llm_json(response.text).data
+        return AiasLevelCheck(**data).model_dump()
+    except Exception as e:
+        print("[GEMINI RE-ASK FAILED]", repr(e))
+        return None
 
-        raw_text = response.text.strip()
-        data = json.loads(raw_text)
 
-        return AiasLLMResponse(**data)
+def _parse_model_output(raw_text: str,
+                        prompt: str = "",
+                        system_instruction: Optional[str] = None) -> AiasLLMResponse:
+    """
+    Parse the raw JSON text returned by Gemini into an AiasLLMResponse.
+
+    Repairs fenced / wrapped / truncated JSON, re-asks for the level fields
+    if only those are missing, and falls back to a safe object otherwise.
+    """
+    result = parse_llm_json(raw_text)
+    data = result.data
+    outcome = result.status
+
+    if "assistant_reply_md" in data and "requested_level" not in data and prompt:
+        level_fields = _reask_level_fields(data["assistant_reply_md"], prompt, system_instruction)
+        if level_fields is not None:
+            data.update(level_fields)
+            _count_parse("reasked")
+
+    # The engine recomputes this from requested_level anyway
+    data.setdefault("is_within_selected_level", True)
+    data.setdefault("violation_reason", None)
+
+    try:
+        llm_resp = AiasLLMResponse(**data)
+        _count_parse(outcome)
+        return llm_resp
 
     except Exception as e:
+        _count_parse("failed")
+
         print("\n\n===== JSON PARSE ERROR =====")
-        print("Raw model output:\n", response.text)
+        print("Raw model output:\n", raw_text)
         print("Error:", e)
         print("============================\n\n")
 
@@ -49,6 +341,443 @@ def call_aias_model(prompt: str) -> AiasLLMResponse:
         return AiasLLMResponse(
             requested_level=1,
             is_within_selected_level=False,
-            violation_reason="Model returned invalid JSON.",
+            violation_reason=PARSE_ERROR_REASON,
             assistant_reply_md="⚠️ Internal parsing error — but I'm still here! Please try again."
         )
+
+
+# RESILIENCE
+#
+# Every upstream call gets a deadline (GEMINI_DEADLINE seconds, retries
+# included), jittered exponential retries on transient errors, an optional
+# hedged duplicate once a call outlives the recent p95 latency, and a
+# circuit breaker that fails fast — or switches to GEMINI_FALLBACK_MODEL —
+# while the primary model is browning out.
+
+retry_policy = RetryPolicy(GEMINI_MAX_RETRIES, GEMINI_RETRY_BASE_DELAY, GEMINI_RETRY_MAX_DELAY)
+latency_tracker = LatencyTracker()
+circuit_breaker = CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET)
+
+_hedge_pool: Optional[ThreadPoolExecutor] = (
+    ThreadPoolExecutor(max_workers=2 * GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini-hedge")
+    if GEMINI_HEDGE else None
+)
+
+_resilience_stats = {"retries": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0, "rejected": 0}
+_stats_lock = threading.Lock()
+
+
+def _bump(counter: str) -> None:
+    with _stats_lock:
+        _resilience_stats[counter] += 1
+
+
+def resilience_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_resilience_stats)
+    stats["breaker_state"] = circuit_breaker.state
+    stats["p95_latency"] = latency_tracker.percentile(95)
+    return stats
+
+
+register_collector("parse", parse_stats)
+register_collector("resilience", resilience_stats)
+
+
+def _choose_model(preferred: Optional[str] = None) -> str:
+    # Routed tiers (backend/router.py) are not behind the primary's breaker
+    if preferred and preferred != GEMINI_MODEL:
+        return preferred
+    if circuit_breaker.allow():
+        return GEMINI_MODEL
+    if GEMINI_FALLBACK_MODEL:
+        _bump("fallbacks")
+        return GEMINI_FALLBACK_MODEL
+    _bump("rejected")
+    raise CircuitOpenError(f"{GEMINI_MODEL} is temporarily unavailable.")
+
+
+def _record_outcome(model_name: str,
+                    error: Optional[BaseException],
+                    elapsed: Optional[float] = None) -> None:
+    # Only the primary model drives the breaker and the hedging threshold
+    if model_name != GEMINI_MODEL:
+        return
+    if error is not None and is_retryable(error):
+        circuit_breaker.record_failure()
+        return
+    # Success, or a non-transient error (the upstream itself is reachable)
+    circuit_breaker.record_success()
+    if error is None and elapsed is not None:
+        latency_tracker.record(elapsed)
+
+
+def _abandon_outcome(model_name: str) -> None:
+    # No outcome to report, but a half-open trial must not stay claimed
+    if model_name == GEMINI_MODEL:
+        circuit_breaker.release_trial()
+
+
+def _remaining(deadline: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError(f"Gemini request exceeded its {GEMINI_DEADLINE:.0f}s deadline.")
+    return remaining
+
+
+def _run_hedged(call: Callable[[], Any], timeout: float) -> Any:
+    """
+    Run ``call``; if it is still pending after the recent p95 latency,
+    send an identical request and return whichever succeeds first.
+    """
+    hedge_after = (
+        latency_tracker.percentile(95, GEMINI_HEDGE_MIN_SAMPLES) if _hedge_pool else None
+    )
+    if hedge_after is None or hedge_after >= timeout:
+        return call()
+
+    primary = _hedge_pool.submit(call)
+    try:
+        return primary.result(timeout=hedge_after)
+    except FuturesTimeoutError:
+        pass
+
+    _bump("hedges")
+    hedge = _hedge_pool.submit(call)
+
+    deadline = time.monotonic() + timeout - hedge_after
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+
+    while pending:
+        done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            raise TimeoutError("Gemini request exceeded its deadline (hedged).")
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    _bump("hedge_wins")
+                return future.result()
+            error = future.exception()
+
+    raise error
+
+
+def _with_retries(attempt: Callable[[str, float], Any],
+                  record_success: bool = True,
+                  preferred_model: Optional[str] = None,
+                  cancel_event: Optional[threading.Event] = None) -> Tuple[str, Any]:
+    """
+    Run ``attempt(model_name, timeout)`` under the deadline / retry / breaker
+    policy. Returns (model name used, result). Setting ``cancel_event``
+    during a retry backoff raises RequestCancelled instead of retrying.
+    """
+    deadline = time.monotonic() + GEMINI_DEADLINE
+    delays = retry_policy.delays()
+
+    while True:
+        model_name = _choose_model(preferred_model)
+        timeout = _remaining(deadline)
+
+        start = time.perf_counter()
+        try:
+            result = attempt(model_name, timeout)
+        except Exception as e:
+            _record_outcome(model_name, e)
+            delay = next(delays, None)
+            if not is_retryable(e) or delay is None or time.monotonic() + delay >= deadline:
+                raise
+            print(f"[GEMINI RETRY] {e!r} — retrying in {delay:.2f}s")
+            _bump("retries")
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise RequestCancelled("Request was cancelled before a retry") from e
+            continue
+        except BaseException:
+            _abandon_outcome(model_name)
+            raise
+
+        if record_success:
+            _record_outcome(model_name, None, time.perf_counter() - start)
+        return model_name, result
+
+
+def _generate_with_resilience(prompt: str,
+                              system_instruction: Optional[str],
+                              preferred_model: Optional[str] = None) -> Any:
+
+    def attempt(model_name: str, timeout: float) -> Any:
+        model = get_model(model_name, system_instruction=system_instruction)
+        return _run_hedged(
+            lambda: model.generate_content(prompt, request_options={"timeout": timeout}),
+            timeout,
+        )
+
+    _, response = _with_retries(attempt, preferred_model=preferred_model)
+    return response
+
+
+async def _generate_with_resilience_async(prompt: str,
+                                          system_instruction: Optional[str],
+                                          preferred_model: Optional[str] = None) -> Any:
+    deadline = time.monotonic() + GEMINI_DEADLINE
+    delays = retry_policy.delays()
+
+    while True:
+        model_name = _choose_model(preferred_model)
+        timeout = _remaining(deadline)
+        model = get_model(model_name, system_instruction=system_instruction)
+
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                model.generate_content_async(prompt, request_options={"timeout": timeout}),
+                timeout,
+            )
+        except Exception as e:
+            _record_outcome(model_name, e)
+            delay = next(delays, None)
+            if not is_retryable(e) or delay is None or time.monotonic() + delay >= deadline:
+                raise
+            print(f"[GEMINI RETRY] {e!r} — retrying in {delay:.2f}s")
+            _bump("retries")
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # asyncio.CancelledError
+            _abandon_outcome(model_name)
+            raise
+
+        _record_outcome(model_name, None, time.perf_counter() - start)
+        return response
+
+
+def call_aias_model(prompt: str,
+                    system_instruction: Optional[str] = None,
+                    model_name: Optional[str] = None) -> AiasLLMResponse:
+    """
+    Calls Gemini and parses JSON manually.
+    Compatible with Streamlit Cloud (which uses older google-generativeai).
+    model_name overrides GEMINI_MODEL (routed tiers, see backend/router.py).
+    Raises TimeoutError / CircuitOpenError when the upstream cannot answer.
+    """
+
+    with span("upstream_total"):
+        response = _generate_with_resilience(prompt, system_instruction, model_name)
+
+    # Gemini returns text → we must parse JSON manually.
+    with span("parse"):
+        llm_resp = _parse_model_output(response.text, prompt, system_instruction)
+    llm_resp.usage = _usage_from_response(response)
+    return llm_resp
+
+
+# ASYNC SUPPORT
+#
+# asyncio.Semaphore is bound to the loop it is first awaited on, so keep one
+# per running loop. A server driving all requests from a single loop gets a
+# hard per-process cap of GEMINI_MAX_CONCURRENCY in-flight upstream calls.
+
+_async_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_async_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _async_semaphores.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        _async_semaphores[loop] = sem
+    return sem
+
+
+async def call_aias_model_async(prompt: str,
+                                system_instruction: Optional[str] = None,
+                                model_name: Optional[str] = None) -> AiasLLMResponse:
+    """
+    Non-blocking variant of call_aias_model.
+    Waits for a free concurrency slot before going upstream.
+    """
+
+    async with _get_async_semaphore():
+        with span("upstream_total"):
+            response = await _generate_with_resilience_async(prompt, system_instruction, model_name)
+
+    # Parsing may re-ask upstream (rarely) — keep it off the event loop
+    with span("parse"):
+        llm_resp = await asyncio.to_thread(
+            _parse_model_output, response.text, prompt, system_instruction
+        )
+    llm_resp.usage = _usage_from_response(response)
+    return llm_resp
+
+
+# STREAMING SUPPORT
+
+_JSON_ESCAPES = {
+    '"': '"', "\\": "\\", "/": "/",
+    "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t",
+}
+
+_REPLY_KEY_RE = re.compile(r'"assistant_reply_md"\s*:\s*"')
+_HEX4_RE = re.compile(r"[0-9A-Fa-f]{4}")
+
+
+def _hex4(text: str) -> Optional[int]:
+    """Code unit of a ``\\uXXXX`` escape's digits, or None if they are not hex."""
+    return int(text, 16) if _HEX4_RE.fullmatch(text) else None
+
+
+class ReplyStreamExtractor:
+    """
+    Incrementally pulls the ``assistant_reply_md`` string out of a JSON
+    document that arrives in arbitrary chunks.
+
+    ``feed`` returns only the newly decoded reply text, so callers can
+    display the reply while the rest of the JSON is still being generated.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos: Optional[int] = None   # index of next undecoded reply char
+        self.done = False
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = _REPLY_KEY_RE.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        out: List[str] = []
+        buf = self._buffer
+        i = self._pos
+
+        while i < len(buf):
+            ch = buf[i]
+
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+
+            # Escape sequence — wait for more input if it is incomplete
+            if i + 1 >= len(buf):
+                break
+            esc = buf[i + 1]
+
+            if esc != "u":
+                out.append(_JSON_ESCAPES.get(esc, esc))
+                i += 2
+                continue
+
+            if i + 6 > len(buf):
+                break
+            code = _hex4(buf[i + 2:i + 6])
+            if code is None:
+                # Not a valid escape: show it as written
+                out.append("\\u")
+                i += 2
+                continue
+
+            # Surrogate pair: needs the following \uXXXX as well
+            if 0xD800 <= code <= 0xDBFF:
+                tail = buf[i + 6:i + 12]
+                if len(tail) < 6 and "\\u".startswith(tail[:2]):
+                    break   # a low surrogate may still be on its way
+                low = _hex4(tail[2:]) if tail.startswith("\\u") else None
+                if low is not None and 0xDC00 <= low <= 0xDFFF:
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+
+            # A lone surrogate cannot be encoded for the page
+            out.append("\ufffd" if 0xD800 <= code <= 0xDFFF else chr(code))
+            i += 6
+
+        self._pos = i
+        return "".join(out)
+
+
+def stream_aias_model(prompt: str,
+                      system_instruction: Optional[str] = None,
+                      model_name: Optional[str] = None,
+                      cancel_event: Optional[threading.Event] = None
+                      ) -> Generator[str, None, AiasLLMResponse]:
+    """
+    Streams a Gemini response.
+
+    Yields chunks of ``assistant_reply_md`` as soon as they arrive and
+    returns the fully parsed AiasLLMResponse once the stream completes
+    (use ``yield from`` to receive it).
+
+    Retries only happen before the first chunk arrives; once text has been
+    shown to the student a failure is raised as-is.
+    """
+
+    def open_stream(model_name: str, timeout: float) -> Any:
+        model = get_model(model_name, system_instruction=system_instruction)
+        response = model.generate_content(
+            prompt, stream=True, request_options={"timeout": timeout}
+        )
+        chunks = iter(response)
+        return response, chunks, next(chunks, None)
+
+    started = time.perf_counter()
+
+    # Outcome is recorded once the whole stream has been consumed
+    used_model, (response, chunks, first_chunk) = _with_retries(
+        open_stream, record_success=False, preferred_model=model_name,
+        cancel_event=cancel_event,
+    )
+    observe("upstream_ttfb", time.perf_counter() - started)
+
+    extractor = ReplyStreamExtractor()
+    raw_parts: List[str] = []
+
+    def _all_chunks():
+        if first_chunk is not None:
+            yield first_chunk
+        yield from chunks
+
+    try:
+        for chunk in _all_chunks():
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. finish / safety metadata)
+                continue
+
+            raw_parts.append(text)
+
+            delta = extractor.feed(text)
+            if delta:
+                yield delta
+    except Exception as e:
+        _record_outcome(used_model, e)
+        raise
+    except BaseException:
+        # GeneratorExit: the consumer closed the stream (cancelled reply)
+        _abandon_outcome(used_model)
+        raise
+
+    _record_outcome(used_model, None)
+    # Includes time the consumer spent between chunks (i.e. rendering)
+    observe("upstream_total", time.perf_counter() - started)
+
+    with span("parse"):
+        llm_resp = _parse_model_output("".join(raw_parts), prompt, system_instruction)
+    llm_resp.usage = _usage_from_response(response)
+    return llm_resp
@@ -0,0 +1,161 @@
+# backend/history.py
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+from backend.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+
+class HistoryWindow(NamedTuple):
+    summary: str                      # compacted older turns ("" if none)
+    messages: List[Dict[str, str]]    # recent turns sent verbatim
+
+
+def _format_line(msg: Dict[str, str]) -> str:
+    return f"{msg.get('role', 'user').upper()}: {msg.get('content', '')}"
+
+
+def _fingerprint(msg: Dict[str, str]) -> str:
+    raw = f"{msg.get('role', '')}\x00{msg.get('content', '')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def _compact(msg: Dict[str, str], max_chars: int = 160) -> str:
+    """One summary line per message: role + first sentence, clipped."""
+    content = " ".join(msg.get("content", "").split())
+    first = _SENTENCE_END_RE.split(content, maxsplit=1)[0]
+    if len(first) > max_chars:
+        first = first[:max_chars].rstrip() + "…"
+    return f"{msg.get('role', 'user').upper()}: {first}"
+
+
+def _truncate_middle(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of an oversized message (e.g. pasted code)."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    half = max(max_chars // 2 - 20, 0)
+    return text[:half] + "\n[… message truncated …]\n" + text[-half:]
+
+
+class _RollingSummary:
+    def __init__(self, max_tokens: int) -> None:
+        self.max_tokens = max_tokens
+        self.folded = 0                       # messages folded in so far
+        self.last_fingerprint: Optional[str] = None
+        self.lines: Deque[str] = deque()
+        self.tokens = 0
+
+    def fold(self, messages: List[Dict[str, str]]) -> None:
+        for msg in messages:
+            line = _compact(msg)
+            self.lines.append(line)
+            self.tokens += estimate_tokens(line)
+            # Rolling: the oldest summary lines go first
+            while self.tokens > self.max_tokens and len(self.lines) > 1:
+                self.tokens -= estimate_tokens(self.lines.popleft())
+        if messages:
+            self.folded += len(messages)
+            self.last_fingerprint = _fingerprint(messages[-1])
+
+    def render(self) -> str:
+        return "\n".join(self.lines)
+
+
+class HistoryManager:
+    """
+    Chooses which part of a conversation goes into the prompt.
+
+    - Fills ``token_budget`` with the newest messages first.
+    - Drops a trailing copy of the current message, which is sent separately.
+    - Compacts everything older into a per-session rolling summary. The
+      summary is extractive (no extra model call) and only new messages are
+      folded in on each turn; it is rebuilt if the history was edited.
+    """
+
+    def __init__(self,
+                 token_budget: int = 2000,
+                 summary_token_budget: int = 300,
+                 max_sessions: int = 1000) -> None:
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_sessions = max_sessions
+
+        self._summaries: "OrderedDict[str, _RollingSummary]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def window(self,
+               history: List[Dict[str, str]],
+               user_message: str,
+               session_id: Optional[str] = None) -> HistoryWindow:
+
+        # Current turn is already sent as the latest message
+        if (history and history[-1].get("role") == "user"
+                and history[-1].get("content", "").strip() == user_message.strip()):
+            history = history[:-1]
+
+        if not history:
+            return HistoryWindow("", [])
+
+        # Newest → oldest until the budget is spent
+        used = 0
+        start = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            cost = estimate_tokens(_format_line(history[i]))
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            start = i
+
+        recent = list(history[start:])
+
+        # Nothing fits: keep a truncated copy of the newest message
+        if not recent:
+            newest = dict(history[-1])
+            newest["content"] = _truncate_middle(newest.get("content", ""), self.token_budget)
+            recent = [newest]
+            start = len(history) - 1
+
+        older = history[:start]
+        summary = self._summarize(older, session_id) if older else ""
+
+        return HistoryWindow(summary, recent)
+
+    def _summarize(self,
+                   older: List[Dict[str, str]],
+                   session_id: Optional[str]) -> str:
+        if session_id is None:
+            rolling = _RollingSummary(self.summary_token_budget)
+            rolling.fold(older)
+            return rolling.render()
+
+        with self._lock:
+            rolling = self._summaries.get(session_id)
+
+            # Reuse only if the already-folded prefix is unchanged
+            if (rolling is None
+                    or rolling.folded > len(older)
+                    or (rolling.folded and
+                        _fingerprint(older[rolling.folded - 1]) != rolling.last_fingerprint)):
+                rolling = _RollingSummary(self.summary_token_budget)
+
+            rolling.fold(older[rolling.folded:])
+
+            self._summaries[session_id] = rolling
+            self._summaries.move_to_end(session_id)
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+
+            return rolling.render()
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._summaries.pop(session_id, None)
@@ -0,0 +1,36 @@
+# backend/identity.py
+
+from __future__ import annotations
+
+import json
+import re
+import secrets
+from typing import Any, Optional
+
+# The user id is the only credential a student has: whoever holds it can
+# read their chats. It lives in a first-party cookie, never in the URL.
+USER_COOKIE = "legitai_user"
+USER_COOKIE_MAX_AGE = 400 * 24 * 3600   # browsers cap cookie lifetime at 400 days
+
+# Tokens are 43 url-safe characters (256 bits)
+_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+
+def new_user_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def valid_user_token(value: Any) -> Optional[str]:
+    """``value`` if it looks like a user token, else None."""
+    if isinstance(value, str) and _TOKEN_RE.match(value):
+        return value
+    return None
+
+
+def cookie_script(token: str, secure: bool) -> str:
+    """``<script>`` storing ``token`` in the user cookie (for st.html)."""
+    cookie = (
+        f"{USER_COOKIE}={token}; Max-Age={USER_COOKIE_MAX_AGE}; Path=/; SameSite=Strict"
+        + ("; Secure" if secure else "")
+    )
+    return f"<script>document.cookie = {json.dumps(cookie)};</script>"
@@ -0,0 +1,336 @@
+# backend/memory.py
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional
+
+
+# MESSAGES
+
+_FIELDS = ("id", "role", "content", "meta")
+
+
+def intern_role(role: str) -> str:
+    """One shared string per role, however many messages carry it."""
+    return sys.intern(role)
+
+
+class MessageRecord:
+    """
+    One chat message as held in session state. Slotted (no per-message
+    dict) with an interned role; reads like the message dicts the store
+    returns (``msg["role"]``, ``msg.get("meta")``) so the UI, engine and
+    history code take either.
+    """
+
+    __slots__ = _FIELDS
+
+    def __init__(self, id: int, role: str, content: str,
+                 meta: Optional[Dict[str, Any]] = None) -> None:
+        self.id = id
+        self.role = intern_role(role)
+        self.content = content
+        self.meta = meta or None
+
+    @classmethod
+    def from_dict(cls, msg: Mapping[str, Any]) -> "MessageRecord":
+        return cls(msg["id"], msg["role"], msg["content"], msg.get("meta"))
+
+    def keys(self) -> List[str]:
+        return [f for f in _FIELDS if f != "meta" or self.meta is not None]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELDS or (key == "meta" and self.meta is None):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.keys()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self) -> str:
+        return f"MessageRecord(id={self.id!r}, role={self.role!r}, content={self.content[:30]!r}…)"
+
+
+_RECORD_SIZE = sys.getsizeof(MessageRecord(0, "user", ""))
+
+
+def message_bytes(record: MessageRecord) -> int:
+    """Approximate heap bytes owned by one record (role strings are shared)."""
+    size = _RECORD_SIZE + sys.getsizeof(record.content) + sys.getsizeof(record.id)
+    if record.meta is not None:
+        size += sys.getsizeof(record.meta) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in record.meta.items()
+        )
+    return size
+
+
+class MessageLog(list):
+    """
+    A chat's loaded messages (oldest → newest), tracked by a MemoryGovernor.
+    While spilled it is empty; ``MemoryGovernor.load`` refills it in place.
+    """
+
+    __slots__ = ("chat_id", "user_id", "serial", "last_active", "__weakref__")
+
+
+# GOVERNOR
+
+class _Entry:
+    __slots__ = ("ref", "chat_id", "user_id", "nbytes", "spill_path", "spill_bytes")
+
+    def __init__(self, ref: "weakref.ref[MessageLog]", chat_id: str, user_id: str) -> None:
+        self.ref = ref
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.nbytes = 0
+        self.spill_path: Optional[str] = None
+        self.spill_bytes = 0
+
+
+class MemoryGovernor:
+    """
+    Accounts for the message bytes every browser session in the process
+    keeps in memory, per chat and per user. When the total crosses
+    ``max_bytes``, the least recently active chats are spilled to
+    zlib-compressed files until it is back under ``low_watermark`` of the
+    ceiling; ``load`` brings a spilled chat back the next time it is used.
+
+    Only chats idle for ``min_idle_seconds`` are spilled: a log is emptied
+    in place, so one that a script run is reading must not be touched.
+    Logs that are garbage collected (the tab was closed) stop counting and
+    lose their spill file. ``max_bytes=0`` keeps the accounting but never
+    spills.
+    """
+
+    def __init__(self,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 spill_dir: Optional[str] = None,
+                 min_idle_seconds: float = 120.0,
+                 low_watermark: float = 0.8,
+                 enabled: bool = True) -> None:
+        self.max_bytes = max_bytes
+        self.min_idle_seconds = min_idle_seconds
+        self.low_watermark = low_watermark
+        self.enabled = enabled
+        self._spill_dir = spill_dir
+        self._serials = itertools.count(1)
+        self._entries: Dict[int, _Entry] = {}
+        self._total = 0
+        self._lock = threading.RLock()
+        self._stats: Dict[str, int] = {
+            "spills": 0, "reloads": 0, "spill_errors": 0, "over_limit": 0,
+        }
+
+    # Tracking
+
+    def adopt(self, chat_id: str, user_id: str,
+              messages: Iterable[Mapping[str, Any]]) -> MessageLog:
+        """Track a chat's freshly loaded messages (store dicts or records)."""
+        log = MessageLog(_to_record(m) for m in messages)
+        log.chat_id = chat_id
+        log.user_id = user_id
+        log.serial = next(self._serials)
+        log.last_active = time.monotonic()
+
+        nbytes = sum(message_bytes(r) for r in log)
+        with self._lock:
+            entry = _Entry(weakref.ref(log, self._forget_callback(log.serial)), chat_id, user_id)
+            self._entries[log.serial] = entry
+            self._resize(entry, nbytes)
+        self._enforce()
+        return log
+
+    def append(self, log: MessageLog, msg_id: int, role: str, content: str,
+               meta: Optional[Dict[str, Any]] = None) -> MessageRecord:
+        record = MessageRecord(msg_id, role, content, meta)
+        with self._lock:
+            self.load(log)
+            log.append(record)
+            entry = self._entries.get(log.serial)
+            if entry is not None:
+                self._resize(entry, entry.nbytes + message_bytes(record))
+        self._enforce()
+        return record
+
+    def prepend(self, log: MessageLog, messages: Iterable[Mapping[str, Any]]) -> None:
+        """Add an older page of messages in front of the loaded ones."""
+        records = [_to_record(m) for m in messages]
+        with self._lock:
+            self.load(log)
+            log[:0] = records
+            entry = self._entries.get(log.serial)
+            if entry is not None:
+                self._resize(entry, entry.nbytes + sum(message_bytes(r) for r in records))
+        self._enforce()
+
+    def load(self, log: MessageLog) -> MessageLog:
+        """Mark the chat active, reading it back first if it was spilled."""
+        with self._lock:
+            log.last_active = time.monotonic()
+            entry = self._entries.get(log.serial)
+            if entry is None or entry.spill_path is None:
+                return log
+
+            with open(entry.spill_path, "rb") as f:
+                rows = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            log[:] = [MessageRecord(*row) for row in rows]
+            _remove(entry.spill_path)
+            entry.spill_path = None
+            entry.spill_bytes = 0
+            self._resize(entry, sum(message_bytes(r) for r in log))
+            self._stats["reloads"] += 1
+        return log
+
+    def discard(self, log: Optional[MessageLog]) -> None:
+        """Stop tracking a log the UI dropped (e.g. on leaving the chat)."""
+        if log is not None:
+            self._forget(log.serial)
+
+    def is_spilled(self, log: MessageLog) -> bool:
+        with self._lock:
+            entry = self._entries.get(log.serial)
+            return entry is not None and entry.spill_path is not None
+
+    def _forget_callback(self, serial: int):
+        # Closes over the serial only: holding the governor weakly as well
+        # keeps a dropped governor collectable
+        governor = weakref.ref(self)
+
+        def forget(_ref: Any) -> None:
+            live = governor()
+            if live is not None:
+                live._forget(serial)
+
+        return forget
+
+    def _forget(self, serial: int) -> None:
+        with self._lock:
+            entry = self._entries.pop(serial, None)
+            if entry is None:
+                return
+            self._total -= entry.nbytes
+            if entry.spill_path is not None:
+                _remove(entry.spill_path)
+
+    def _resize(self, entry: _Entry, nbytes: int) -> None:
+        self._total += nbytes - entry.nbytes
+        entry.nbytes = nbytes
+
+    # Eviction
+
+    def _enforce(self) -> None:
+        if not self.enabled or not self.max_bytes or self._total <= self.max_bytes:
+            return
+
+        with self._lock:
+            if self._total <= self.max_bytes:
+                return
+            target = self.max_bytes * self.low_watermark
+            idle_before = time.monotonic() - self.min_idle_seconds
+
+            candidates = []
+            for entry in self._entries.values():
+                log = entry.ref()
+                if (log is not None and entry.spill_path is None and entry.nbytes
+                        and log.last_active <= idle_before):
+                    candidates.append((log.last_active, log, entry))
+            candidates.sort(key=lambda c: c[0])
+
+            for _, log, entry in candidates:
+                if self._total <= target:
+                    break
+                self._spill(log, entry)
+
+            if self._total > self.max_bytes:
+                # Everything left was used recently: nothing safe to spill
+                self._stats["over_limit"] += 1
+
+    def _spill(self, log: MessageLog, entry: _Entry) -> None:
+        rows = [[r.id, r.role, r.content, r.meta] for r in log]
+        data = zlib.compress(json.dumps(rows, ensure_ascii=False).encode("utf-8"))
+        path = os.path.join(self.spill_dir, f"{log.serial}-{entry.chat_id}.z")
+        try:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print("[MEMORY SPILL ERROR]", repr(e))
+            self._stats["spill_errors"] += 1
+            return
+
+        log.clear()
+        entry.spill_path = path
+        entry.spill_bytes = len(data)
+        self._resize(entry, 0)
+        self._stats["spills"] += 1
+
+    @property
+    def spill_dir(self) -> str:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="legitai-spill-")
+        else:
+            os.makedirs(self._spill_dir, exist_ok=True)
+        return self._spill_dir
+
+    # Reporting
+
+    def session_bytes(self, chat_id: str) -> int:
+        """In-memory bytes of one chat (summed over tabs that have it open)."""
+        with self._lock:
+            return sum(e.nbytes for e in self._entries.values() if e.chat_id == chat_id)
+
+    def usage(self) -> Dict[str, int]:
+        """In-memory bytes per user."""
+        by_user: Dict[str, int] = {}
+        with self._lock:
+            for entry in self._entries.values():
+                by_user[entry.user_id] = by_user.get(entry.user_id, 0) + entry.nbytes
+        return by_user
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_user = self.usage()
+            spilled = [e for e in self._entries.values() if e.spill_path is not None]
+            return {
+                **self._stats,
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "chats": len(self._entries),
+                "users": len(by_user),
+                "largest_user_bytes": max(by_user.values(), default=0),
+                "spilled_chats": len(spilled),
+                "spilled_bytes": sum(e.spill_bytes for e in spilled),
+            }
+
+
+def _to_record(msg: Any) -> MessageRecord:
+    return msg if isinstance(msg, MessageRecord) else MessageRecord.from_dict(msg)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,232 @@
+# backend/metrics.py
+
+from __future__ import annotations
+
+import bisect
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from backend.config import METRICS_LOG
+
+
+# HISTOGRAMS
+
+# Seconds; covers microsecond-scale local stages up to slow upstream calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)   # last slot = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+
+_stage_histograms: Dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def _histogram(stage: str) -> Histogram:
+    hist = _stage_histograms.get(stage)
+    if hist is None:
+        with _histograms_lock:
+            hist = _stage_histograms.setdefault(stage, Histogram())
+    return hist
+
+
+# TURNS
+
+class TurnTimings:
+    """Per-stage timings for one chat turn (one prompt → one reply)."""
+
+    def __init__(self, session_id: Optional[str] = None) -> None:
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.stages: Dict[str, float] = {}
+        self.total: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def record(self, stage: str, seconds: float) -> None:
+        # A stage can run more than once per turn (e.g. retries): accumulate
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "turn_id": self.turn_id,
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "total_ms": round(self.total * 1000, 2) if self.total is not None else None,
+            "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+            "error": self.error,
+        }
+
+
+_current_turn: contextvars.ContextVar[Optional[TurnTimings]] = contextvars.ContextVar(
+    "legitai_current_turn", default=None
+)
+_recent_turns: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a duration measured elsewhere (histogram + current turn)."""
+    _histogram(stage).observe(seconds)
+    turn = _current_turn.get()
+    if turn is not None:
+        turn.record(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def turn(session_id: Optional[str] = None) -> Iterator[TurnTimings]:
+    """
+    Group the spans of one chat turn. On exit the breakdown is kept for the
+    debug panel and written as one JSON log line.
+    """
+    timings = TurnTimings(session_id)
+    token = _current_turn.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    except Exception as e:
+        timings.error = type(e).__name__
+        raise
+    finally:
+        timings.total = time.perf_counter() - start
+        _current_turn.reset(token)
+        _histogram("turn_total").observe(timings.total)
+
+        record = timings.as_dict()
+        _recent_turns.append(record)
+        if METRICS_LOG:
+            print("[METRICS]", json.dumps(record))
+
+
+def recent_turns(n: int = 10) -> List[Dict[str, Any]]:
+    """Newest first."""
+    return list(_recent_turns)[-n:][::-1]
+
+
+# COUNTER COLLECTORS
+# Modules with their own stats (cache, policy, parser, …) register a
+# callable returning flat {name: number}; values are exported as gauges.
+
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_collector(prefix: str, collect: Callable[[], Dict[str, Any]]) -> None:
+    _collectors[prefix] = collect
+
+
+def collect_stats() -> Dict[str, Dict[str, Any]]:
+    """Current values of every registered collector, keyed by prefix."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for prefix, collect in sorted(_collectors.items()):
+        try:
+            stats[prefix] = collect()
+        except Exception as e:
+            print(f"[METRICS] collector {prefix} failed:", repr(e))
+    return stats
+
+
+# PROMETHEUS EXPORT
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+def render_prometheus() -> str:
+    lines: List[str] = [
+        "# HELP legitai_stage_seconds Time spent per request stage.",
+        "# TYPE legitai_stage_seconds histogram",
+    ]
+
+    with _histograms_lock:
+        stages = sorted(_stage_histograms.items())
+
+    for stage, hist in stages:
+        snap = hist.snapshot()
+        for bound, count in zip(hist.buckets + (float("inf"),), snap["buckets"]):
+            lines.append(
+                f'legitai_stage_seconds_bucket{{stage="{stage}",le="{_fmt(bound)}"}} {count}'
+            )
+        lines.append(f'legitai_stage_seconds_sum{{stage="{stage}"}} {snap["sum"]}')
+        lines.append(f'legitai_stage_seconds_count{{stage="{stage}"}} {snap["count"]}')
+
+    for prefix, values in collect_stats().items():
+        for name, value in sorted(values.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f"legitai_{prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass   # scrapes every few seconds would flood the console
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on a daemon thread. Returns None if the port is taken."""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"[METRICS] cannot listen on {host}:{port}:", repr(e))
+        return None
+
+    threading.Thread(target=server.serve_forever, name="legitai-metrics", daemon=True).start()
+    return server
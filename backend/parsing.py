@@ -0,0 +1,179 @@
+# backend/parsing.py
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class ParseResult(NamedTuple):
+    data: Dict[str, Any]
+    status: str          # "ok" | "repaired" | "partial" | "failed"
+
+
+_FENCE_RE = re.compile(r"^\s*```(?:json|JSON)?\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+_decoder = json.JSONDecoder()
+
+# Escapes cut off at the end of truncated output: an incomplete \uXXXX, or
+# a high surrogate whose low half never arrived (group 1: the backslashes)
+_CUT_ESCAPE_RES = (
+    re.compile(r"(\\+)u[0-9A-Fa-f]{0,3}$"),
+    re.compile(r"(\\+)u[dD][89abAB][0-9A-Fa-f]{2}$"),
+)
+
+
+def _strip_fences(text: str) -> str:
+    match = _FENCE_RE.match(text)
+    return match.group(1) if match else text
+
+
+def _close_truncated(text: str) -> Optional[str]:
+    """
+    Complete a JSON object that was cut off mid-generation: close an open
+    string (dropping an escape cut in half), drop a dangling key / trailing
+    comma, then close every open bracket. Returns None if the text is not
+    a truncated object.
+    """
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    last_safe = -1        # index just after the last complete value / member
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack:
+                return None
+            stack.pop()
+            last_safe = i + 1
+        elif ch == ",":
+            last_safe = i
+
+    if not stack:
+        return None
+
+    if in_string:
+        if escaped:
+            text = text[:-1]
+        for pattern in _CUT_ESCAPE_RES:
+            match = pattern.search(text)
+            if match and len(match.group(1)) % 2:
+                text = text[:match.start() + len(match.group(1)) - 1]
+        candidate = text + '"' + "".join(reversed(stack))
+        try:
+            json.loads(candidate)
+            return candidate
+        except ValueError:
+            pass
+
+    # Fall back to the last point where a member was complete
+    if last_safe <= 0:
+        return None
+    cut = text[:last_safe].rstrip().rstrip(",")
+
+    # Recount open brackets for the cut text
+    stack = []
+    in_string = escaped = False
+    for ch in cut:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    return cut + "".join(reversed(stack))
+
+
+_FIELD_RES = {
+    "requested_level": re.compile(r'"requested_level"\s*:\s*(\d+)'),
+    "is_within_selected_level": re.compile(r'"is_within_selected_level"\s*:\s*(true|false)'),
+    "violation_reason": re.compile(r'"violation_reason"\s*:\s*(null|"(?:[^"\\]|\\.)*")'),
+}
+
+
+def _salvage_fields(text: str) -> Dict[str, Any]:
+    """Last resort: pull individual fields out of unparseable output."""
+    # Local import: gemini_client imports this module
+    from backend.gemini_client import ReplyStreamExtractor
+
+    data: Dict[str, Any] = {}
+
+    extractor = ReplyStreamExtractor()
+    reply = extractor.feed(text)
+    if reply:
+        data["assistant_reply_md"] = reply
+
+    for field, pattern in _FIELD_RES.items():
+        match = pattern.search(text)
+        if match:
+            try:
+                data[field] = json.loads(match.group(1))
+            except ValueError:
+                pass   # e.g. an invalid escape in the reason text
+
+    return data
+
+
+def parse_llm_json(raw_text: str) -> ParseResult:
+    """
+    Parse model output into a dict, repairing common defects:
+    code fences, text before/after the object, and truncated output.
+    """
+    text = raw_text.strip()
+
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return ParseResult(data, "ok")
+    except ValueError:
+        pass
+
+    text = _strip_fences(text)
+    start = text.find("{")
+    if start != -1:
+        text = text[start:]
+
+        # Leading / trailing chatter around a complete object
+        try:
+            data, _ = _decoder.raw_decode(text)
+            if isinstance(data, dict):
+                return ParseResult(data, "repaired")
+        except ValueError:
+            pass
+
+        # Truncated object
+        closed = _close_truncated(text)
+        if closed is not None:
+            try:
+                data = json.loads(closed)
+                if isinstance(data, dict):
+                    return ParseResult(data, "repaired")
+            except ValueError:
+                pass
+
+    try:
+        data = _salvage_fields(raw_text)
+    except ValueError:
+        return ParseResult({}, "failed")
+    return ParseResult(data, "partial" if data else "failed")
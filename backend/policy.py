@@ -0,0 +1,239 @@
+# backend/policy.py
+
+from __future__ import annotations
+
+import re
+import threading
+from enum import Enum
+from typing import Dict, NamedTuple, Optional
+
+from backend.gemini_client import AiasLLMResponse
+
+
+# INTENT PATTERNS
+# Mirrors INTENT_RULES in backend/engine.py. Everything is compiled into one
+# alternation so a message is scanned once, whatever the number of triggers.
+
+EXPLANATION_TRIGGERS = [
+    "explain", "explanation",
+    "describe", "walk me through",
+    "what does this do",
+    "how does this work",
+    "explain the code",
+]
+
+FIX_TRIGGERS = [
+    "fix", "debug", "improve", "refactor", "make this better",
+    "review", "check my", "what's wrong", "whats wrong",
+]
+
+# Only verbs that ask for the artifact itself: "give me", "make me" or
+# "solve" just as often ask for an outline, a plan or a hint
+GENERATION_VERBS = [
+    "write", "generate", "create", "build", "code up", "implement", "do my",
+]
+
+GENERATION_ARTIFACTS = [
+    "code", "program", "script", "function", "class", "app", "website",
+    "essay", "report", "assignment", "homework", "solution", "answer",
+    "paragraph", "implementation",
+]
+
+# Help every level allows (planning, outlining, studying). As the object of
+# the verb, or right after an artifact ("essay outline"), they count
+# against refusing.
+ALLOWED_ARTIFACTS = [
+    "outline", "plan", "summary", "timetable", "schedule", "structure",
+    "notes", "checklist", "study guide", "flashcards", "ideas", "brainstorm",
+    "feedback", "questions", "quiz", "rubric",
+]
+
+SCOPE_WORDS = [
+    "full", "complete", "entire", "whole", "from scratch", "all of",
+    "finished", "final",
+]
+
+# Words that end the verb's object: in "create a timetable for my final
+# assignment" the artifact belongs to "for", not to "create"
+_OBJECT_BREAKS = [
+    "for", "about", "on", "of", "to", "in", "into", "with", "from", "that",
+    "which", "and", "or", "but", "so", "because", "like", "using", "based",
+]
+
+
+def _alternation(words) -> str:
+    # Longest first so "explain the code" wins over "explain"
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_INTENT_RE = re.compile(
+    rf"(?P<explain>{_alternation(EXPLANATION_TRIGGERS)})"
+    rf"|(?P<fix>\b(?:{_alternation(FIX_TRIGGERS)})\b)",
+    re.IGNORECASE,
+)
+
+
+def _object_re(nouns, exclude_after=()) -> "re.Pattern[str]":
+    # Verb, up to four words of its object (never crossing a break word or
+    # punctuation), then the noun heading it
+    gap = rf"(?:\s+(?!(?:{_alternation(_OBJECT_BREAKS)})\b)[\w'-]+){{0,4}}?"
+    after = rf"(?!\s+(?:{_alternation(exclude_after)})\b)" if exclude_after else ""
+    return re.compile(
+        rf"\b(?:{_alternation(GENERATION_VERBS)})\b"
+        rf"(?P<object>{gap}\s+(?:{_alternation(nouns)})s?)\b{after}",
+        re.IGNORECASE,
+    )
+
+
+# "write my essay", but not "write an essay outline"
+_GENERATION_OBJECT_RE = _object_re(GENERATION_ARTIFACTS, exclude_after=ALLOWED_ARTIFACTS)
+_ALLOWED_OBJECT_RE = _object_re(ALLOWED_ARTIFACTS)
+
+_SCOPE_RE = re.compile(rf"\b(?:{_alternation(SCOPE_WORDS)})\b", re.IGNORECASE)
+
+# Generation requests usually open with the verb ("write …", "can you build …")
+_IMPERATIVE_RE = re.compile(
+    rf"^\s*(?:(?:please|pls|can you|could you|would you|i need you to)\s+)?"
+    rf"(?:{_alternation(GENERATION_VERBS)})\b",
+    re.IGNORECASE,
+)
+
+# Long messages usually carry the student's own work → likely fix/improve
+_LONG_MESSAGE_CHARS = 400
+
+
+class Intent(str, Enum):
+    EXPLANATION = "explanation"
+    FIX = "fix"
+    GENERATION = "generation"
+    UNCLEAR = "unclear"
+
+
+class IntentMatch(NamedTuple):
+    intent: Intent
+    confidence: float
+
+
+def is_explanation_request(user_message: str) -> bool:
+    lowered = user_message.lower()
+    return any(trigger in lowered for trigger in EXPLANATION_TRIGGERS)
+
+
+def classify_intent(user_message: str) -> IntentMatch:
+    """
+    Keyword-based intent classification with a rough confidence score.
+    Explanation wins over everything (see INTENT_RULES "CRITICAL RULE").
+
+    Generation needs a generation verb whose object is an artifact ("write
+    the full essay"); the artifact merely appearing somewhere is not enough.
+    """
+    found = {"explain": 0, "fix": 0}
+    for match in _INTENT_RE.finditer(user_message):
+        found[match.lastgroup] += 1
+
+    if found["explain"]:
+        return IntentMatch(Intent.EXPLANATION, 0.9)
+
+    generation = _GENERATION_OBJECT_RE.search(user_message)
+    if generation:
+        confidence = 0.8
+        if _SCOPE_RE.search(generation.group("object")):
+            confidence += 0.1   # "the complete essay", not "for my final assignment"
+        if _IMPERATIVE_RE.match(user_message):
+            confidence += 0.05
+        if found["fix"]:
+            confidence -= 0.4
+        if _ALLOWED_OBJECT_RE.search(user_message):
+            confidence -= 0.3
+        if len(user_message) > _LONG_MESSAGE_CHARS:
+            confidence -= 0.2
+        return IntentMatch(Intent.GENERATION, round(max(confidence, 0.0), 2))
+
+    if found["fix"]:
+        return IntentMatch(Intent.FIX, 0.7)
+
+    return IntentMatch(Intent.UNCLEAR, 0.0)
+
+
+# LOCAL SHORT-CIRCUIT
+
+GENERATION_MIN_LEVEL = 4
+
+GENERATION_VIOLATION_REASON = (
+    f"Generating new code or full solutions requires AIAS Level {GENERATION_MIN_LEVEL} or higher."
+)
+
+_ALTERNATIVES = {
+    1: (
+        "At this level I can help with study habits, planning your time, "
+        "staying focused, or explaining the AIAS rules themselves."
+    ),
+    2: (
+        "At this level I can help you brainstorm, outline an approach, or "
+        "explain the underlying concepts at a high level."
+    ),
+    3: (
+        "At this level I can review, debug or improve work **you** have "
+        "written — paste your draft or code and tell me what to look at."
+    ),
+}
+
+
+def _generation_refusal(selected_level: int) -> AiasLLMResponse:
+    reply = (
+        f"I can't write this for you at **AIAS Level {selected_level}** — "
+        f"producing new code or complete solutions is only allowed from "
+        f"Level {GENERATION_MIN_LEVEL}.\n\n"
+        f"{_ALTERNATIVES.get(selected_level, '')}"
+    )
+    return AiasLLMResponse(
+        requested_level=GENERATION_MIN_LEVEL,
+        is_within_selected_level=False,
+        violation_reason=GENERATION_VIOLATION_REASON,
+        assistant_reply_md=reply.strip(),
+    )
+
+
+class PolicyPrefilter:
+    """
+    Answers clear out-of-level requests locally instead of paying for a
+    Gemini call whose only outcome would be a violation notice.
+    Only generation requests below Level 4 are short-circuited, and only
+    when the classifier is at least ``threshold`` confident.
+    """
+
+    def __init__(self, threshold: float = 0.9, enabled: bool = True) -> None:
+        self.threshold = threshold
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"checked": 0, "short_circuited": 0}
+        for intent in Intent:
+            self._stats[f"intent_{intent.value}"] = 0
+
+    def check(self, selected_level: int, user_message: str) -> Optional[AiasLLMResponse]:
+        if not self.enabled:
+            return None
+
+        match = classify_intent(user_message)
+
+        short_circuit = (
+            match.intent is Intent.GENERATION
+            and match.confidence >= self.threshold
+            and selected_level < GENERATION_MIN_LEVEL
+        )
+
+        with self._lock:
+            self._stats["checked"] += 1
+            self._stats[f"intent_{match.intent.value}"] += 1
+            if short_circuit:
+                self._stats["short_circuited"] += 1
+
+        if short_circuit:
+            return _generation_refusal(selected_level)
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        """Counters, including how many upstream calls were saved."""
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,89 @@
+# backend/prewarm.py
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+from backend.config import GEMINI_MODEL, PREWARM_INTERVAL
+from backend.engine import generate_aias_response
+from backend.scheduler import Priority
+from backend.suggestions import LEVEL_SUGGESTIONS
+
+
+def prewarm_suggestions(refresh: bool = False,
+                        stop_event: Optional[threading.Event] = None) -> Dict[str, int]:
+    """
+    Generate and cache the first-turn answer for every (level, suggestion).
+
+    With ``refresh=False`` entries already in the response cache are left
+    alone, so this is cheap to run on every worker start. ``refresh=True``
+    regenerates everything (used by the periodic refresh).
+
+    Suggestions shown before a level is chosen are not warmed: clicking one
+    without a level only produces the "select a level" notice.
+    """
+    counts = {"warmed": 0, "failed": 0}
+
+    for level, suggestions in LEVEL_SUGGESTIONS.items():
+        for suggestion in suggestions:
+            if stop_event is not None and stop_event.is_set():
+                return counts
+            try:
+                generate_aias_response(
+                    level, suggestion, [], refresh_cache=refresh,
+                    user_id="prewarm", priority=Priority.PREWARM,
+                )
+                counts["warmed"] += 1
+            except Exception as e:
+                print(f"[PREWARM] L{level} {suggestion!r} failed:", repr(e))
+                counts["failed"] += 1
+
+    return counts
+
+
+class SuggestionPrewarmer:
+    """
+    Background job keeping suggestion answers hot in the response cache.
+
+    The first pass fills whatever is missing. After that every answer is
+    regenerated each ``interval`` seconds, which should be shorter than
+    RESPONSE_CACHE_TTL so entries never lapse. Cache keys include the model
+    name, so a worker started with a different GEMINI_MODEL finds no entries
+    and warms the new model on its first pass.
+    """
+
+    def __init__(self, interval: float = PREWARM_INTERVAL) -> None:
+        self.interval = interval
+        self.model_name = GEMINI_MODEL
+        self.last_run: Optional[float] = None
+        self.last_counts: Dict[str, int] = {}
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="legitai-prewarm", daemon=True
+        )
+
+    def start(self) -> "SuggestionPrewarmer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        refresh = False
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            self.last_counts = prewarm_suggestions(refresh=refresh, stop_event=self._stop)
+            self.last_run = time.time()
+
+            print(
+                f"[PREWARM] {self.last_counts['warmed']} suggestions ready for "
+                f"{self.model_name} in {time.perf_counter() - start:.1f}s "
+                f"({self.last_counts['failed']} failed)"
+            )
+
+            refresh = True
+            self._stop.wait(self.interval)
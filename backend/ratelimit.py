@@ -0,0 +1,99 @@
+# backend/ratelimit.py
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Classic token bucket: refills at ``rate`` tokens per second up to
+    ``capacity``. Used for requests-per-minute (1 token per call) and
+    tokens-per-minute (estimated prompt + output tokens per call) quotas.
+
+    A request larger than ``capacity`` is allowed once the bucket is full,
+    and leaves it in debt, so an oversized prompt is delayed instead of
+    rejected forever.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, limit: float, burst_seconds: float = 1.0) -> "TokenBucket":
+        """
+        Bucket for a per-minute quota. Capacity covers ``burst_seconds``
+        of traffic, which keeps throughput flat at the quota instead of a
+        full minute's burst followed by a stall.
+        """
+        rate = limit / 60.0
+        return cls(rate, capacity=max(1.0, rate * burst_seconds))
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take_or_wait(self, amount: float) -> float:
+        """Take ``amount`` and return 0, or return the seconds to wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            needed = min(amount, self.capacity)
+            if self._tokens >= needed:
+                self._tokens -= amount
+                return 0.0
+            return (needed - self._tokens) / self.rate
+
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        return self.take_or_wait(amount) == 0.0
+
+    def acquire(self, amount: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until ``amount`` tokens are taken. False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.take_or_wait(amount)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1.0) -> None:
+        while True:
+            wait = self.take_or_wait(amount)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
+
+    def refund(self, amount: float) -> None:
+        """Return tokens taken for an estimate that turned out too high."""
+        if amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def debit(self, amount: float) -> None:
+        """Charge tokens after the fact (estimate turned out too low)."""
+        if amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
@@ -0,0 +1,146 @@
+# backend/resilience.py
+
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Iterator, Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """Upstream is failing; the call was rejected without being attempted."""
+
+
+# RETRYABLE ERRORS
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Transient upstream failures: rate limiting, overload, timeouts and
+    dropped connections. Bad requests / auth errors are not retried.
+    """
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+
+    try:
+        from google.api_core import exceptions as gexc
+    except ImportError:
+        return False
+
+    return isinstance(exc, (
+        gexc.ResourceExhausted,      # 429
+        gexc.ServiceUnavailable,     # 503
+        gexc.InternalServerError,    # 500
+        gexc.DeadlineExceeded,       # 504
+        gexc.Aborted,
+    ))
+
+
+# RETRY POLICY
+
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0) -> None:
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delays(self) -> Iterator[float]:
+        for attempt in range(self.max_retries):
+            cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+            yield random.uniform(0, cap)
+
+
+# LATENCY TRACKING (for hedging)
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+# CIRCUIT BREAKER
+
+class CircuitBreaker:
+    """
+    closed → (``failure_threshold`` consecutive failures) → open
+    open → (after ``reset_timeout`` seconds) → half-open: one trial call
+    half-open → closed on success, open again on failure
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            # Half-open: let exactly one trial through
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """
+        The call was abandoned before it had an outcome (stream closed,
+        task cancelled): let the next caller make the half-open trial.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
@@ -0,0 +1,382 @@
+# backend/router.py
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import threading
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from backend.cache import normalize_message
+from backend.policy import Intent, classify_intent
+from backend.resilience import LatencyTracker
+from backend.tokens import estimate_tokens
+
+
+# TIERS
+
+class ModelTier(NamedTuple):
+    name: str
+    model: Optional[str]              # None = answered locally
+    input_cost_per_mtok: float = 0.0
+    output_cost_per_mtok: float = 0.0
+
+    @property
+    def local(self) -> bool:
+        return self.model is None
+
+
+LOCAL_TIER = ModelTier("local", None)
+
+
+def parse_tiers(spec: str) -> List[ModelTier]:
+    """Parse "name=model@input/output,..." (USD per 1M tokens), cheapest tier first."""
+    tiers = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, rest = item.partition("=")
+        model, _, prices = rest.partition("@")
+        cost_in, _, cost_out = prices.partition("/")
+        tiers.append(ModelTier(
+            name.strip(), model.strip(), float(cost_in or 0), float(cost_out or 0)
+        ))
+    if not tiers:
+        raise ValueError("ROUTER_TIERS must name at least one model tier")
+    return tiers
+
+
+# FEATURES
+
+class RouteFeatures(NamedTuple):
+    level: int
+    intent: Intent
+    chars: int
+    has_code: bool
+    history_messages: int
+    history_tokens: int
+
+
+_CODE_RE = re.compile(
+    r"```"
+    r"|^(?: {4}|\t)\S"                                   # indented block
+    r"|\b(?:def|class|return|import|lambda|function|public|static|#include|SELECT)\b"
+    r"|[{};]\s*$"
+    r"|\w+\([^()\n]*\)\s*(?:\{|:)\s*$",                   # call / signature line
+    re.MULTILINE,
+)
+
+
+def extract_features(level: int,
+                     message: str,
+                     history: Sequence[Dict[str, str]]) -> RouteFeatures:
+    return RouteFeatures(
+        level=level,
+        intent=classify_intent(message).intent,
+        chars=len(message),
+        has_code=bool(_CODE_RE.search(message)),
+        history_messages=len(history),
+        history_tokens=sum(estimate_tokens(m.get("content", "")) for m in history),
+    )
+
+
+# Contribution of each feature to the complexity score (0 ≈ trivial, ~1 hard)
+LEVEL_WEIGHT = {1: 0.0, 2: 0.05, 3: 0.15, 4: 0.25, 5: 0.3}
+INTENT_WEIGHT = {
+    Intent.UNCLEAR: 0.05,
+    Intent.EXPLANATION: 0.1,
+    Intent.FIX: 0.25,
+    Intent.GENERATION: 0.3,
+}
+CODE_WEIGHT = 0.35
+LENGTH_WEIGHT, LENGTH_SCALE = 0.2, 1200        # chars for full weight
+HISTORY_WEIGHT, HISTORY_SCALE = 0.15, 1500     # tokens for full weight
+
+
+def complexity_score(features: RouteFeatures) -> float:
+    score = LEVEL_WEIGHT.get(features.level, 0.15) + INTENT_WEIGHT[features.intent]
+    if features.has_code:
+        score += CODE_WEIGHT
+    score += LENGTH_WEIGHT * min(features.chars / LENGTH_SCALE, 1.0)
+    score += HISTORY_WEIGHT * min(features.history_tokens / HISTORY_SCALE, 1.0)
+    return round(score, 3)
+
+
+# LOCAL TIER: CANNED ANSWERS
+# Level-independent questions with one right answer, only on a first turn
+# (follow-ups depend on the conversation). Keys are normalize_message()d.
+
+_AIAS_OVERVIEW = """The **AI Assessment Scale (AIAS)** sets how much AI help is acceptable for an assignment:
+
+- **Level 1 – No AI:** general study help only, nothing assignment-specific.
+- **Level 2 – Planning:** brainstorming, outlining and concept explanations.
+- **Level 3 – Collaboration:** feedback and improvements on work *you* wrote.
+- **Level 4 – Full AI with critical evaluation:** AI can develop content, you evaluate and own it.
+- **Level 5 – AI exploration:** unrestricted, creative use of AI.
+
+Your instructor picks the level per assignment — check the brief, then choose it above. Learn more at [aiassessmentscale.com](https://aiassessmentscale.com/)."""
+
+_STUDY_TIPS = """Some habits that reliably help:
+
+1. **Plan short sessions** — 25–50 minutes of focus, then a real break.
+2. **Test yourself** instead of re-reading: flashcards, past questions, explaining aloud.
+3. **Space it out** — revisit material after a day, then a few days, then a week.
+4. **Start assignments early** with a rough outline, even if it's messy.
+5. **Protect your focus** — phone in another room, one tab per task.
+6. **Sleep** — memory consolidation happens overnight, so all-nighters backfire.
+
+Tell me what you're studying and I can help you build a plan at your AIAS level."""
+
+CANNED_ANSWERS: Dict[str, str] = {
+    normalize_message(question): answer
+    for questions, answer in [
+        (["What is the AIAS scale?", "What is AIAS?", "What is the AIAS?",
+          "Explain the AIAS scale", "What are the AIAS levels?"], _AIAS_OVERVIEW),
+        (["Give me study tips", "Study tips", "Any study tips?",
+          "How should I study?"], _STUDY_TIPS),
+    ]
+    for question in questions
+}
+
+
+class Route(NamedTuple):
+    tier: ModelTier
+    score: float
+    features: RouteFeatures
+    canned_reply: Optional[str] = None
+
+
+# ROUTER
+
+class _TierStats:
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.latency = LatencyTracker(window=500)
+
+
+class ModelRouter:
+    """
+    Sends each request to the cheapest tier that can handle it, judged from
+    cheap features only (no model call):
+
+      local → canned answer for a few fixed first-turn questions
+      lite  → small model for short, code-free, low-level questions
+      full  → the last (most capable) tier for everything else
+
+    ``thresholds[i]`` is the complexity score below which ``tiers[i]`` is
+    used. Tune them offline with ``python -m backend.router``.
+    """
+
+    def __init__(self,
+                 tiers: Sequence[ModelTier],
+                 thresholds: Sequence[float] = (),
+                 local_enabled: bool = True,
+                 enabled: bool = True) -> None:
+        if len(thresholds) != len(tiers) - 1:
+            raise ValueError(
+                f"{len(tiers)} model tiers need {len(tiers) - 1} threshold(s), "
+                f"got {len(thresholds)}"
+            )
+        if list(thresholds) != sorted(thresholds):
+            raise ValueError("router thresholds must be ascending")
+
+        self.tiers = list(tiers)
+        self.thresholds = list(thresholds)
+        self.local_enabled = local_enabled
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _TierStats] = {
+            tier.name: _TierStats() for tier in [LOCAL_TIER, *self.tiers]
+        }
+
+    @property
+    def default_tier(self) -> ModelTier:
+        return self.tiers[-1]
+
+    def route(self, level: int, message: str, history: Sequence[Dict[str, str]]) -> Route:
+        features = extract_features(level, message, history)
+
+        if not self.enabled:
+            return Route(self.default_tier, 0.0, features)
+
+        if self.local_enabled and not history:
+            canned = CANNED_ANSWERS.get(normalize_message(message))
+            if canned is not None:
+                return Route(LOCAL_TIER, 0.0, features, canned)
+
+        score = complexity_score(features)
+        for tier, upper in zip(self.tiers, self.thresholds):
+            if score < upper:
+                return Route(tier, score, features)
+        return Route(self.default_tier, score, features)
+
+    def record(self, tier: ModelTier, elapsed: float,
+               input_tokens: int = 0, output_tokens: int = 0) -> None:
+        with self._lock:
+            stats = self._stats[tier.name]
+            stats.requests += 1
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost_usd += (
+                input_tokens * tier.input_cost_per_mtok + output_tokens * tier.output_cost_per_mtok
+            ) / 1e6
+        stats.latency.record(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Flat per-tier counters (exported by backend.metrics)."""
+        out: Dict[str, Any] = {}
+        with self._lock:
+            for name, stats in self._stats.items():
+                out[f"{name}_requests"] = stats.requests
+                out[f"{name}_input_tokens"] = stats.input_tokens
+                out[f"{name}_output_tokens"] = stats.output_tokens
+                out[f"{name}_cost_usd"] = round(stats.cost_usd, 6)
+                out[f"{name}_latency_p50"] = stats.latency.percentile(50)
+                out[f"{name}_latency_p95"] = stats.latency.percentile(95)
+        return out
+
+
+# OFFLINE REPLAY
+
+class ReplayTurn(NamedTuple):
+    level: int
+    message: str
+    history: List[Dict[str, str]]
+    reply: str
+    violation: bool
+
+
+def turns_from_store(path: str) -> Iterator[ReplayTurn]:
+    """Every answered user turn in a session store, with the history before it."""
+    from backend.storage import open_session_store
+
+    store = open_session_store(path)
+    for session in store.iter_sessions():
+        if not session["level"]:
+            continue
+        history: List[Dict[str, str]] = []
+        pending: Optional[Dict[str, Any]] = None
+        for msg in store.iter_messages(session["id"]):
+            if msg["role"] == "user":
+                pending = msg
+            elif pending is not None:
+                meta = msg.get("meta") or {}
+                yield ReplayTurn(
+                    session["level"], pending["content"], list(history), msg["content"],
+                    meta.get("is_within_selected_level") is False,
+                )
+                pending = None
+            history.append({"role": msg["role"], "content": msg["content"]})
+
+
+def turns_from_jsonl(path: str) -> Iterator[ReplayTurn]:
+    """backend.batch input (level, message, history), optionally with its output joined in."""
+    import json
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield ReplayTurn(
+                int(record["level"]), record["message"], record.get("history", []),
+                record.get("assistant_reply", "") or "",
+                record.get("is_within_selected_level") is False,
+            )
+
+
+def replay(turns: Sequence[ReplayTurn],
+           tiers: Sequence[ModelTier],
+           threshold_sets: Sequence[Sequence[float]],
+           static_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Route every logged turn under each threshold set. Reports the traffic
+    share and estimated cost per tier, plus how many turns that ended in a
+    level violation would have gone to a cheaper tier (those need the full
+    model's judgement, so this is the number to keep low).
+    """
+    rows = []
+    for thresholds in threshold_sets:
+        router = ModelRouter(tiers, thresholds)
+        counts = {t.name: 0 for t in [LOCAL_TIER, *tiers]}
+        cost = 0.0
+        violations_downgraded = 0
+
+        for turn in turns:
+            route = router.route(turn.level, turn.message, turn.history)
+            counts[route.tier.name] += 1
+            if route.tier.local:
+                continue
+            input_tokens = (
+                static_tokens + estimate_tokens(turn.message) + route.features.history_tokens
+            )
+            output_tokens = estimate_tokens(turn.reply)
+            cost += (input_tokens * route.tier.input_cost_per_mtok
+                     + output_tokens * route.tier.output_cost_per_mtok) / 1e6
+            if turn.violation and route.tier != router.default_tier:
+                violations_downgraded += 1
+
+        total = max(len(turns), 1)
+        rows.append({
+            "thresholds": list(thresholds),
+            "share": {name: round(n / total, 3) for name, n in counts.items()},
+            "estimated_cost_usd": round(cost, 4),
+            "violations_downgraded": violations_downgraded,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from backend.config import ROUTER_THRESHOLDS, ROUTER_TIERS, SESSION_DB_PATH
+    from backend.engine import STATIC_PROMPT_TOKENS
+
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.router",
+        description="Replay logged chats through the model router to tune thresholds.",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default=None, help=f"session store (default: {SESSION_DB_PATH})")
+    source.add_argument("--jsonl", help="records in backend.batch input format")
+    parser.add_argument("--tiers", default=ROUTER_TIERS, help="tier spec (default: ROUTER_TIERS)")
+    parser.add_argument("--thresholds", action="append", default=[],
+                        help="comma-separated thresholds; repeat to compare sets")
+    args = parser.parse_args(argv)
+
+    try:
+        tiers = parse_tiers(args.tiers)
+        threshold_sets: List[Tuple[float, ...]] = [
+            tuple(float(v) for v in spec.split(",") if v.strip()) for spec in args.thresholds
+        ] or [tuple(ROUTER_THRESHOLDS)]
+    except ValueError as e:
+        parser.error(str(e))
+    for thresholds in threshold_sets:
+        if len(thresholds) != len(tiers) - 1:
+            parser.error(
+                f"--thresholds {','.join(map(str, thresholds)) or '(none)'}: {len(tiers)} tier(s) "
+                f"need {len(tiers) - 1} threshold(s), got {len(thresholds)}; "
+                f"pass matching --tiers (default: ROUTER_TIERS)"
+            )
+        if list(thresholds) != sorted(thresholds):
+            parser.error(f"--thresholds {','.join(map(str, thresholds))} must be ascending")
+
+    turns = list(turns_from_jsonl(args.jsonl) if args.jsonl
+                 else turns_from_store(args.db or SESSION_DB_PATH))
+    print(f"{len(turns)} turns, tiers: {', '.join(t.name for t in tiers)}")
+
+    static_tokens = max(STATIC_PROMPT_TOKENS.values())
+    for row in replay(turns, tiers, threshold_sets, static_tokens):
+        share = "  ".join(f"{name} {value:.0%}" for name, value in row["share"].items())
+        print(f"{row['thresholds']}: {share}  cost ${row['estimated_cost_usd']:.4f}  "
+              f"violations on cheaper tiers: {row['violations_downgraded']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
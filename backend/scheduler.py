@@ -0,0 +1,313 @@
+# backend/scheduler.py
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from backend.ratelimit import TokenBucket
+
+
+class Priority(IntEnum):
+    """Lanes, served strictly in this order."""
+    INTERACTIVE = 0   # a student waiting on the page
+    PREWARM = 1       # suggestion cache warming
+    BATCH = 2         # offline runs (backend.batch)
+
+
+PositionCallback = Callable[[int], None]
+
+# Queued requests with a cancel_event re-check it at least this often
+CANCEL_POLL_SECONDS = 0.1
+
+
+class RequestCancelled(Exception):
+    """The caller set its cancel_event while the request was still queued."""
+
+
+class Ticket:
+    """One upstream request waiting for (or holding) an admission."""
+
+    _ids = itertools.count()
+
+    def __init__(self, user_id: str, priority: Priority, tokens: int) -> None:
+        self.id = next(self._ids)
+        self.user_id = user_id
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+
+    @property
+    def waited(self) -> float:
+        end = self.admitted_at if self.admitted_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+
+class _Lane:
+    """
+    Per-user FIFO queues served round-robin: each user gets one request
+    admitted per turn, however many they have queued.
+    """
+
+    def __init__(self) -> None:
+        self.queues: "OrderedDict[str, Deque[Ticket]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def push(self, ticket: Ticket) -> None:
+        self.queues.setdefault(ticket.user_id, deque()).append(ticket)
+
+    def head(self) -> Optional[Ticket]:
+        for queue in self.queues.values():
+            return queue[0]
+        return None
+
+    def pop_head(self) -> Ticket:
+        user_id, queue = next(iter(self.queues.items()))
+        ticket = queue.popleft()
+        # Served user moves to the back of the rotation
+        del self.queues[user_id]
+        if queue:
+            self.queues[user_id] = queue
+        return ticket
+
+    def remove(self, ticket: Ticket) -> None:
+        queue = self.queues.get(ticket.user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(ticket)
+        except ValueError:
+            return
+        if not queue:
+            del self.queues[ticket.user_id]
+
+    def position(self, ticket: Ticket) -> int:
+        """Requests this lane admits before ``ticket`` under round-robin."""
+        users = list(self.queues)
+        queue = self.queues[ticket.user_id]
+        rank = users.index(ticket.user_id)
+        depth = queue.index(ticket)
+
+        ahead = depth
+        for i, user in enumerate(users):
+            if user == ticket.user_id:
+                continue
+            # Users earlier in the rotation get depth + 1 turns first
+            ahead += min(len(self.queues[user]), depth + (1 if i < rank else 0))
+        return ahead
+
+
+class RequestScheduler:
+    """
+    Process-wide admission control in front of the Gemini client.
+
+    Every upstream call takes a ticket. Tickets are admitted in priority
+    order, round-robin between users inside a lane, and only when the RPM
+    and TPM buckets can pay for them. The buckets refill continuously with a
+    small burst allowance, so a backlog drains at the quota rate instead of
+    bursting into 429s and then idling.
+
+    With neither limit configured the scheduler is a pass-through.
+    """
+
+    def __init__(self,
+                 rpm: int = 0,
+                 tpm: int = 0,
+                 max_wait: float = 60.0,
+                 burst_seconds: float = 1.0) -> None:
+        self.requests = TokenBucket.per_minute(rpm, burst_seconds) if rpm > 0 else None
+        self.tokens = TokenBucket.per_minute(tpm, burst_seconds) if tpm > 0 else None
+        self.max_wait = max_wait
+
+        self._lanes: Dict[Priority, _Lane] = {p: _Lane() for p in Priority}
+        self._cond = threading.Condition()
+        self._stats: Dict[str, float] = {
+            "admitted": 0, "timed_out": 0, "cancelled": 0,
+            "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    # Admission
+
+    def _head(self) -> Optional[Ticket]:
+        for priority in Priority:
+            ticket = self._lanes[priority].head()
+            if ticket is not None:
+                return ticket
+        return None
+
+    def _position(self, ticket: Ticket) -> int:
+        ahead = sum(len(self._lanes[p]) for p in Priority if p < ticket.priority)
+        return ahead + self._lanes[ticket.priority].position(ticket)
+
+    def _take_budget(self, ticket: Ticket) -> float:
+        """Charge both buckets and return 0, or return the seconds to wait."""
+        if self.requests:
+            wait = self.requests.take_or_wait(1)
+            if wait:
+                return wait
+        if self.tokens and ticket.tokens:
+            wait = self.tokens.take_or_wait(ticket.tokens)
+            if wait:
+                if self.requests:
+                    self.requests.refund(1)
+                return wait
+        return 0.0
+
+    def _poll(self, ticket: Ticket) -> Tuple[bool, float, int]:
+        """(admitted, seconds to wait before polling again, queue position)."""
+        if self._head() is not ticket:
+            return False, self.max_wait, self._position(ticket)
+
+        wait = self._take_budget(ticket)
+        if wait:
+            return False, wait, 0
+
+        self._lanes[ticket.priority].pop_head()
+        ticket.admitted_at = time.monotonic()
+        self._stats["admitted"] += 1
+        self._stats["wait_seconds_total"] += ticket.waited
+        self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], ticket.waited)
+        return True, 0.0, 0
+
+    def _abandon(self, ticket: Ticket, reason: str = "timed_out") -> None:
+        self._lanes[ticket.priority].remove(ticket)
+        self._stats[reason] += 1
+
+    def _pass_through(self, user_id: str, priority: Priority, tokens: int) -> Ticket:
+        ticket = Ticket(user_id or "anonymous", priority, tokens)
+        ticket.admitted_at = ticket.enqueued_at
+        with self._cond:
+            self._stats["admitted"] += 1
+        return ticket
+
+    def _enqueue(self, user_id: str, priority: Priority, tokens: int) -> Ticket:
+        ticket = Ticket(user_id or "anonymous", priority, tokens)
+        with self._cond:
+            self._lanes[priority].push(ticket)
+        return ticket
+
+    def acquire(self,
+                user_id: str,
+                priority: Priority = Priority.INTERACTIVE,
+                tokens: int = 0,
+                on_position: Optional[PositionCallback] = None,
+                timeout: Optional[float] = None,
+                cancel_event: Optional[threading.Event] = None) -> Ticket:
+        """
+        Block until admitted. ``on_position`` is called from this thread
+        whenever the number of requests ahead changes (0 = next in line).
+        Raises TimeoutError after ``timeout`` (default max_wait) seconds, and
+        RequestCancelled once ``cancel_event`` is set.
+        """
+        if not self.enabled:
+            return self._pass_through(user_id, priority, tokens)
+
+        ticket = self._enqueue(user_id, priority, tokens)
+        deadline = ticket.enqueued_at + (self.max_wait if timeout is None else timeout)
+        last_position = None
+
+        while True:
+            with self._cond:
+                admitted, wait, position = self._poll(ticket)
+                if admitted:
+                    self._cond.notify_all()   # next head may be admissible now
+                    return ticket
+
+                if cancel_event is not None and cancel_event.is_set():
+                    self._abandon(ticket, "cancelled")
+                    self._cond.notify_all()
+                    raise RequestCancelled("Request was cancelled while queued")
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._abandon(ticket)
+                    self._cond.notify_all()
+                    raise TimeoutError(f"Waited {ticket.waited:.1f}s for a Gemini request slot")
+
+                if cancel_event is not None:
+                    wait = min(wait, CANCEL_POLL_SECONDS)
+                if position == last_position or on_position is None:
+                    self._cond.wait(min(wait, remaining))
+                    continue
+
+            # Callback outside the lock: it may render UI
+            last_position = position
+            on_position(position)
+
+    async def acquire_async(self,
+                            user_id: str,
+                            priority: Priority = Priority.INTERACTIVE,
+                            tokens: int = 0,
+                            on_position: Optional[PositionCallback] = None,
+                            timeout: Optional[float] = None,
+                            cancel_event: Optional[threading.Event] = None) -> Ticket:
+        """acquire() for event loops: polls instead of blocking a thread."""
+        if not self.enabled:
+            return self._pass_through(user_id, priority, tokens)
+
+        ticket = self._enqueue(user_id, priority, tokens)
+        deadline = ticket.enqueued_at + (self.max_wait if timeout is None else timeout)
+        last_position = None
+
+        while True:
+            with self._cond:
+                admitted, wait, position = self._poll(ticket)
+                if admitted:
+                    self._cond.notify_all()
+                    return ticket
+
+                if cancel_event is not None and cancel_event.is_set():
+                    self._abandon(ticket, "cancelled")
+                    self._cond.notify_all()
+                    raise RequestCancelled("Request was cancelled while queued")
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._abandon(ticket)
+                    self._cond.notify_all()
+                    raise TimeoutError(f"Waited {ticket.waited:.1f}s for a Gemini request slot")
+
+            if on_position is not None and position != last_position:
+                last_position = position
+                on_position(position)
+            # Sync waiters are woken by notify; async ones re-check often
+            await asyncio.sleep(min(wait, remaining, 0.05))
+
+    def settle(self, ticket: Ticket, actual_tokens: Optional[int]) -> None:
+        """Correct the TPM bucket once the real token count is known."""
+        if self.tokens is None or actual_tokens is None:
+            return
+        if actual_tokens > ticket.tokens:
+            self.tokens.debit(actual_tokens - ticket.tokens)
+        else:
+            self.tokens.refund(ticket.tokens - actual_tokens)
+        with self._cond:
+            self._cond.notify_all()
+
+    # Introspection
+
+    def queued(self) -> Dict[str, int]:
+        with self._cond:
+            return {p.name.lower(): len(self._lanes[p]) for p in Priority}
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            stats = dict(self._stats)
+            waiting: List[int] = [len(self._lanes[p]) for p in Priority]
+        for priority, count in zip(Priority, waiting):
+            stats[f"queued_{priority.name.lower()}"] = count
+        admitted = stats["admitted"]
+        stats["wait_seconds_mean"] = stats["wait_seconds_total"] / admitted if admitted else 0.0
+        return stats
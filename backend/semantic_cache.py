@@ -0,0 +1,429 @@
+# backend/semantic_cache.py
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import sys
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.cache import history_hash
+
+
+# EMBEDDINGS
+#
+# Hashed TF-IDF: words, word bigrams and character 4-grams hashed into a
+# fixed number of buckets, sublinear term frequency, IDF fitted on the
+# indexed questions. CPU-only, deterministic across processes (crc32, not
+# hash()), and microseconds per message.
+
+# Words that change the phrasing of a question but not the answer. Action
+# verbs ("write", "fix", "explain") are kept; the scope already separates
+# intents, but they still weigh in within one.
+STOPWORDS = frozenset("""
+a an the and or of to in on for with about into is are was were be been am
+i me my you your we our it its this that these those there here
+what whats how why which who when where do does did can could would should will
+please pls just really simply simple briefly quick quickly basically actually
+conceptually concept idea mean meaning tell give show let help
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:[+#]+|'[a-z]+)?")
+
+# Relative weight of each feature family (before IDF)
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+CHAR_WEIGHT = 0.2
+
+
+def _tokens(text: str) -> List[str]:
+    words = (w.replace("'", "") for w in _WORD_RE.findall(text.casefold().replace("\u2019", "'")))
+    return [w for w in words if w not in STOPWORDS]
+
+
+def _bucket(feature: str, dim: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % dim
+
+
+class HashedTfidfEmbedder:
+    """Sparse hashed term frequencies; IDF and normalisation are applied by the index."""
+
+    def __init__(self, dim: int = 1024) -> None:
+        self.dim = dim
+
+    def features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(bucket indices, sublinear term weights), indices unique."""
+        counts: Dict[int, float] = {}
+
+        def add(feature: str, weight: float) -> None:
+            index = _bucket(feature, self.dim)
+            counts[index] = counts.get(index, 0.0) + weight
+
+        words = _tokens(text)
+        for word in words:
+            add("w:" + word, WORD_WEIGHT)
+            if len(word) >= 5:
+                padded = f"<{word}>"
+                for i in range(len(padded) - 3):
+                    add("c:" + padded[i:i + 4], CHAR_WEIGHT)
+        for first, second in zip(words, words[1:]):
+            add(f"b:{first} {second}", BIGRAM_WEIGHT)
+
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        return indices, np.log1p(weights)
+
+
+# INDEX
+
+class SemanticQuery(NamedTuple):
+    scope: str      # requests may only match inside the same scope
+    text: str
+
+
+def make_scope(model_name: str,
+               level: int,
+               intent: str,
+               history_window: List[Dict[str, str]],
+               history_summary: str = "") -> str:
+    """
+    Model + selected level + detected intent + exact history window. First
+    turns all share the empty window; later turns only match a conversation
+    with the same window.
+    """
+    raw = json.dumps(
+        [model_name, int(level), intent, history_hash(history_window, history_summary)]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """
+    Near-duplicate lookup in front of the exact-match response cache.
+
+    Maps a question to the exact cache key of an earlier, similar question
+    in the same scope, so "explain big-O notation simply" can reuse the
+    answer stored for "explain big O notation", and "what's a linked list"
+    the one for "What is a linked list?". Phrasings the policy classifier
+    reads as different intents never match ("explain recursion" is an
+    explanation request, "what is recursion?" is not), and neither do
+    questions that only share their wording ("explain recursion" / "explain
+    tail recursion"). Responses themselves stay in ResponseCache; a match
+    whose response has since been evicted there is simply a miss.
+
+    Vectors live in one preallocated float32 matrix and are searched with a
+    single matrix-vector product. Entries expire after ``ttl_seconds``; when
+    full, the least recently matched entry is replaced. IDF is refitted
+    once a quarter of the entries are newer than the last fit.
+
+    Only short single-line questions are indexed: code and drafts differ in
+    details that similarity cannot see.
+    """
+
+    def __init__(self,
+                 threshold: float = 0.9,
+                 max_entries: int = 2048,
+                 ttl_seconds: float = 3600,
+                 dim: int = 1024,
+                 max_chars: int = 300,
+                 enabled: bool = True) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_chars = max_chars
+        self.enabled = enabled
+        self.embedder = HashedTfidfEmbedder(dim)
+
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._scopes = np.full(max_entries, -1, dtype=np.int64)   # -1 = free slot
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._values: List[Optional[str]] = [None] * max_entries
+        self._slots: Dict[str, int] = {}                              # value → slot
+        self._features: List[Optional[Tuple[np.ndarray, np.ndarray]]] = [None] * max_entries
+
+        self._scope_ids: Dict[str, int] = {}
+        self._doc_freq = np.zeros(dim, dtype=np.float32)
+        self._idf = np.ones(dim, dtype=np.float32)
+        self._docs = 0
+        self._inserts_since_fit = 0
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "lookups": 0, "hits": 0, "misses": 0, "stale": 0,
+            "inserts": 0, "evictions": 0, "expired": 0, "refits": 0,
+        }
+
+    def query(self, scope: str, message: str) -> Optional[SemanticQuery]:
+        """The lookup for ``message``, or None when it is not eligible."""
+        if not self.enabled:
+            return None
+        text = message.strip()
+        if not text or "\n" in text or len(text) > self.max_chars or not _tokens(text):
+            return None
+        return SemanticQuery(scope, text)
+
+    # Vectors
+
+    def _embed(self, features: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        indices, weights = features
+        vector = np.zeros(self.embedder.dim, dtype=np.float32)
+        vector[indices] = weights * self._idf[indices]
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _refit(self) -> None:
+        self._idf = (np.log((1 + self._docs) / (1 + self._doc_freq)) + 1).astype(np.float32)
+        for slot, features in enumerate(self._features):
+            if features is not None:
+                self._vectors[slot] = self._embed(features)
+        self._inserts_since_fit = 0
+        self._stats["refits"] += 1
+
+    def _expire(self, now: float) -> None:
+        expired = np.flatnonzero(
+            (self._scopes >= 0) & (self._created <= now - self.ttl_seconds)
+        )
+        for slot in expired:
+            self._free(int(slot))
+        self._stats["expired"] += len(expired)
+
+    def _free(self, slot: int) -> None:
+        indices, _ = self._features[slot]
+        self._doc_freq[indices] -= 1
+        self._docs -= 1
+        self._scopes[slot] = -1
+        del self._slots[self._values[slot]]
+        self._values[slot] = None
+        self._features[slot] = None
+
+    # Public API
+
+    def lookup(self, query: SemanticQuery) -> Optional[str]:
+        """Value stored for the most similar question in scope, if similar enough."""
+        now = time.time()
+        features = self.embedder.features(query.text)
+
+        with self._lock:
+            self._stats["lookups"] += 1
+            scope_id = self._scope_ids.get(query.scope)
+            if scope_id is None or not self._docs:
+                self._stats["misses"] += 1
+                return None
+
+            self._expire(now)
+            sims = self._vectors @ self._embed(features)
+            sims[self._scopes != scope_id] = -1.0
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold:
+                self._stats["misses"] += 1
+                return None
+
+            self._last_used[slot] = now
+            self._stats["hits"] += 1
+            return self._values[slot]
+
+    def add(self, query: SemanticQuery, value: str) -> None:
+        now = time.time()
+        features = self.embedder.features(query.text)
+
+        with self._lock:
+            self._expire(now)
+
+            # Re-adding a value (refreshed answer) replaces its old entry
+            if value in self._slots:
+                self._free(self._slots[value])
+
+            free = np.flatnonzero(self._scopes < 0)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._free(slot)
+                self._stats["evictions"] += 1
+
+            scope_id = self._scope_ids.setdefault(query.scope, len(self._scope_ids))
+            self._scopes[slot] = scope_id
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._values[slot] = value
+            self._slots[value] = slot
+            self._features[slot] = features
+            self._doc_freq[features[0]] += 1
+            self._docs += 1
+            self._inserts_since_fit += 1
+            self._stats["inserts"] += 1
+
+            if self._inserts_since_fit > max(8, self._docs // 4):
+                self._refit()
+            else:
+                self._vectors[slot] = self._embed(features)
+
+    def discard(self, value: str) -> None:
+        """Forget the entry pointing at ``value`` (its response is gone)."""
+        with self._lock:
+            slot = self._slots.get(value)
+            if slot is not None:
+                self._free(slot)
+                self._stats["stale"] += 1
+
+    def similarity(self, a: str, b: str) -> float:
+        """Cosine similarity of two texts under the current IDF."""
+        with self._lock:
+            va = self._embed(self.embedder.features(a))
+            vb = self._embed(self.embedder.features(b))
+        return float(va @ vb)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["entries"] = self._docs
+            stats["scopes"] = len(self._scope_ids)
+        lookups = stats["lookups"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# OFFLINE EVALUATION
+
+class LoggedTurn(NamedTuple):
+    scope: str
+    message: str
+    reply: str
+
+
+def turns_from_store(path: str) -> Iterator[LoggedTurn]:
+    """Answered user turns in a session store, scoped like the engine does."""
+    from backend.config import GEMINI_MODEL
+    from backend.engine import history_window
+    from backend.policy import classify_intent
+    from backend.storage import open_session_store
+
+    store = open_session_store(path)
+    for session in store.iter_sessions():
+        if not session["level"]:
+            continue
+        history: List[Dict[str, str]] = []
+        pending: Optional[str] = None
+        for msg in store.iter_messages(session["id"]):
+            if msg["role"] == "user":
+                pending = msg["content"]
+            elif pending is not None:
+                window = history_window(history, pending)
+                scope = make_scope(
+                    GEMINI_MODEL, session["level"], classify_intent(pending).intent.value,
+                    window.messages, window.summary,
+                )
+                yield LoggedTurn(scope, pending, msg["content"])
+                pending = None
+            history.append({"role": msg["role"], "content": msg["content"]})
+
+
+def replay(turns: Sequence[LoggedTurn],
+           thresholds: Sequence[float],
+           reply_threshold: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Feed logged traffic through a fresh index per threshold. A hit whose
+    stored reply is dissimilar (below ``reply_threshold``) to the reply
+    actually logged for the turn counts as a suspected false hit.
+    """
+    rows = []
+    for threshold in thresholds:
+        cache = SemanticCache(threshold=threshold, max_entries=max(len(turns), 1),
+                              ttl_seconds=math.inf)
+        eligible = hits = false_hits = 0
+        for i, turn in enumerate(turns):
+            query = cache.query(turn.scope, turn.message)
+            if query is None:
+                continue
+            eligible += 1
+            match = cache.lookup(query)
+            if match is None:
+                cache.add(query, str(i))
+                continue
+            hits += 1
+            if cache.similarity(turns[int(match)].reply, turn.reply) < reply_threshold:
+                false_hits += 1
+        rows.append({
+            "threshold": threshold,
+            "eligible": eligible,
+            "hit_rate": round(hits / eligible, 4) if eligible else 0.0,
+            "suspected_false_hit_rate": round(false_hits / hits, 4) if hits else 0.0,
+        })
+    return rows
+
+
+def evaluate_pairs(path: str, thresholds: Sequence[float]) -> List[Dict[str, Any]]:
+    """
+    Labelled pairs, one JSON object per line: {"a": ..., "b": ..., "same": bool}
+    ("same" = one answer serves both). Reports hit and false-hit rates.
+    """
+    with open(path, encoding="utf-8") as f:
+        pairs = [json.loads(line) for line in f if line.strip()]
+
+    # Fit IDF on every question in the file
+    cache = SemanticCache(max_entries=max(2 * len(pairs), 1), ttl_seconds=math.inf)
+    for i, pair in enumerate(pairs):
+        for side in ("a", "b"):
+            cache.add(SemanticQuery("eval", pair[side]), f"{i}{side}")
+    cache._refit()
+    sims = [cache.similarity(p["a"], p["b"]) for p in pairs]
+
+    rows = []
+    for threshold in thresholds:
+        predicted = [s >= threshold for s in sims]
+        same = sum(1 for p in pairs if p["same"])
+        true_hits = sum(1 for hit, p in zip(predicted, pairs) if hit and p["same"])
+        false_hits = sum(1 for hit, p in zip(predicted, pairs) if hit and not p["same"])
+        rows.append({
+            "threshold": threshold,
+            "hit_rate": round(true_hits / same, 4) if same else 0.0,
+            "false_hit_rate": (
+                round(false_hits / (true_hits + false_hits), 4) if true_hits + false_hits else 0.0
+            ),
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from backend.config import SESSION_DB_PATH
+
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.semantic_cache",
+        description="Measure semantic cache hit and false-hit rates offline.",
+    )
+    parser.add_argument("--db", default=SESSION_DB_PATH, help="session store to replay")
+    parser.add_argument("--pairs", help="labelled question pairs (JSONL) instead of a replay")
+    parser.add_argument("--thresholds", default="0.8,0.85,0.9,0.95",
+                        help="comma-separated similarity thresholds")
+    args = parser.parse_args(argv)
+
+    thresholds = [float(v) for v in args.thresholds.split(",") if v.strip()]
+
+    if args.pairs:
+        for row in evaluate_pairs(args.pairs, thresholds):
+            print(f"{row['threshold']:.2f}: hit rate {row['hit_rate']:.1%}  "
+                  f"false hits {row['false_hit_rate']:.1%}")
+        return 0
+
+    turns = list(turns_from_store(args.db))
+    print(f"{len(turns)} turns")
+    for row in replay(turns, thresholds):
+        print(f"{row['threshold']:.2f}: {row['eligible']} eligible  "
+              f"hit rate {row['hit_rate']:.1%}  "
+              f"suspected false hits {row['suspected_false_hit_rate']:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# backend/session_index.py
+
+from __future__ import annotations
+
+import bisect
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(title: str) -> Set[str]:
+    return {word.casefold() for word in _WORD_RE.findall(title)}
+
+
+class SessionIndex:
+    """
+    Incrementally maintained index over a user's chat sessions.
+
+    - Recency order: sorted by last update, newest first, so the sidebar can
+      show the first N without sorting every rerun.
+    - Title words: a sorted (word, session_id) list for prefix search via
+      bisect. A multi-word query matches chats that have a word starting
+      with each query word.
+    - Level: optional filter on top of either.
+
+    Every operation touches only the entries of the session that changed.
+    """
+
+    def __init__(self) -> None:
+        self._meta: Dict[str, Tuple[str, Optional[int], float]] = {}   # sid → (title, level, updated_at)
+        self._recency: List[Tuple[float, str]] = []                    # (-updated_at, sid)
+        self._words: List[Tuple[str, str]] = []                        # (word, sid)
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._meta
+
+    # MAINTENANCE
+
+    def add(self, sid: str, title: str, level: Optional[int], updated_at: float) -> None:
+        if sid in self._meta:
+            self.remove(sid)
+        self._meta[sid] = (title, level, updated_at)
+        bisect.insort(self._recency, (-updated_at, sid))
+        for word in _tokens(title):
+            bisect.insort(self._words, (word, sid))
+
+    def remove(self, sid: str) -> None:
+        title, _, updated_at = self._meta.pop(sid)
+        self._discard(self._recency, (-updated_at, sid))
+        for word in _tokens(title):
+            self._discard(self._words, (word, sid))
+
+    def update(self, sid: str,
+               title: Optional[str] = None,
+               level: Optional[int] = None,
+               updated_at: Optional[float] = None) -> None:
+        old_title, old_level, old_updated = self._meta[sid]
+        self.add(
+            sid,
+            old_title if title is None else title,
+            old_level if level is None else level,
+            old_updated if updated_at is None else updated_at,
+        )
+
+    @staticmethod
+    def _discard(items: list, item: tuple) -> None:
+        i = bisect.bisect_left(items, item)
+        if i < len(items) and items[i] == item:
+            del items[i]
+
+    # QUERIES
+
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        start = bisect.bisect_left(self._words, (prefix,))
+        matches: Set[str] = set()
+        for word, sid in self._words[start:]:
+            if not word.startswith(prefix):
+                break
+            matches.add(sid)
+        return matches
+
+    def search(self,
+               query: str = "",
+               level: Optional[int] = None,
+               limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Session ids matching ``query`` (title word prefixes) and ``level``,
+        newest first. Returns (first ``limit`` ids, total number of matches).
+        """
+        candidates: Optional[Set[str]] = None
+        for word in _tokens(query):
+            matches = self._prefix_matches(word)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return [], 0
+
+        result: List[str] = []
+        total = 0
+        for _, sid in self._recency:
+            if candidates is not None and sid not in candidates:
+                continue
+            if level is not None and self._meta[sid][1] != level:
+                continue
+            total += 1
+            if limit is None or len(result) < limit:
+                result.append(sid)
+
+        return result, total
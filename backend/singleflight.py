@@ -0,0 +1,298 @@
+# backend/singleflight.py
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import (
+    Any, Awaitable, Callable, Dict, Generator, Generic, Hashable, List, Optional, Tuple, Type,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+# Followers with a cancel_event re-check it at least this often
+CANCEL_POLL_SECONDS = 0.1
+
+
+class _Flight:
+    """One in-flight call and everyone waiting on it."""
+
+    def __init__(self) -> None:
+        # concurrent.futures.Future can be waited on from any thread and,
+        # via asyncio.wrap_future, from any event loop
+        self.future: Future = Future()
+        self.waiters = 0
+
+        # Streaming calls: chunks produced so far, for followers to replay
+        self.chunks: List[str] = []
+        self.cond = threading.Condition()
+
+
+class LeaderAbandoned(RuntimeError):
+    """The streaming caller that owned the shared call stopped reading it."""
+
+
+class FollowerCancelled(RuntimeError):
+    """A follower's cancel_event was set while it waited on the shared call."""
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent identical calls: the first caller for a key (the
+    leader) does the work, callers arriving while it runs wait for its
+    outcome instead of repeating it. Exceptions reach every waiter.
+
+    Followers receive ``copy_result(result)`` so they can mutate it freely.
+    Past ``max_waiters`` followers on one key, new callers make their own
+    call rather than queueing behind a single slow request.
+
+    Only overlapping calls are shared; nothing is kept once the leader
+    finishes (that is the response cache's job).
+
+    If the leader gives up (an ``abandoned`` exception: its caller went away
+    or cancelled) before followers received anything, a follower takes
+    over and makes the call itself. A streaming leader whose reader goes
+    away mid-stream finishes the call in the background for the followers
+    still reading along; it is only abandoned once none are left.
+    """
+
+    def __init__(self,
+                 max_waiters: int = 100,
+                 copy_result: Callable[[T], T] = copy.deepcopy,
+                 enabled: bool = True,
+                 abandoned: Tuple[Type[BaseException], ...] = ()) -> None:
+        self.max_waiters = max_waiters
+        self.copy_result = copy_result
+        self.enabled = enabled
+        self.abandoned = (LeaderAbandoned, *abandoned)
+
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "leaders": 0, "coalesced": 0, "overflow": 0, "errors": 0, "takeovers": 0,
+            "handoffs": 0,
+        }
+
+    def _join(self, key: Hashable) -> Tuple[Optional[_Flight], bool]:
+        """(flight, is_leader); flight is None when the waiter cap is hit."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._stats["leaders"] += 1
+                return flight, True
+            if flight.waiters >= self.max_waiters:
+                self._stats["overflow"] += 1
+                return None, False
+            flight.waiters += 1
+            self._stats["coalesced"] += 1
+            return flight, False
+
+    def _take_over(self) -> None:
+        with self._lock:
+            self._stats["takeovers"] += 1
+
+    def _leave(self, flight: _Flight) -> None:
+        with self._lock:
+            flight.waiters -= 1
+
+    def _orphan(self, key: Hashable, flight: _Flight) -> bool:
+        """Unregister ``flight`` and return True if no follower is attached."""
+        with self._lock:
+            if flight.waiters:
+                return False
+            # Nobody can join from here on: a new caller starts a fresh call
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            return True
+
+    def _land(self, key: Hashable, flight: _Flight,
+              result: Any = None, error: Optional[BaseException] = None) -> None:
+        # Unregister first: a caller arriving now starts a fresh call
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if error is not None:
+                self._stats["errors"] += 1
+            waiters = flight.waiters
+
+        if error is not None:
+            flight.future.set_exception(error)
+        else:
+            # Followers copy from a private snapshot, since the leader goes
+            # on to use (and possibly mutate) its own result
+            flight.future.set_result(self.copy_result(result) if waiters else result)
+        with flight.cond:
+            flight.cond.notify_all()
+
+    # Plain calls
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """Run ``fn`` or join the identical call in flight. Returns (result, shared)."""
+        if not self.enabled:
+            return fn(), False
+
+        while True:
+            flight, leader = self._join(key)
+            if flight is None:
+                return fn(), False
+            if leader:
+                break
+            try:
+                return self.copy_result(flight.future.result()), True
+            except self.abandoned:
+                self._take_over()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result)
+        return result, False
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Async ``do``. Followers may be on any event loop or thread."""
+        if not self.enabled:
+            return await fn(), False
+
+        while True:
+            flight, leader = self._join(key)
+            if flight is None:
+                return await fn(), False
+            if leader:
+                break
+            try:
+                result = await asyncio.wrap_future(flight.future)
+                return self.copy_result(result), True
+            except self.abandoned:
+                self._take_over()
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result)
+        return result, False
+
+    # Streaming calls
+
+    def stream(self,
+               key: Hashable,
+               fn: Callable[[], Generator[str, None, T]],
+               cancel_event: Optional[threading.Event] = None
+               ) -> Generator[str, None, Tuple[T, bool]]:
+        """
+        Streaming ``do``: ``fn()`` is a generator yielding text chunks and
+        returning the final result. Followers replay the chunks produced so
+        far, then follow along live. Use ``yield from``; returns (result, shared).
+
+        A follower whose ``cancel_event`` is set stops waiting for the next
+        chunk and raises FollowerCancelled (a leader cancels through ``fn``).
+        """
+        if not self.enabled:
+            return (yield from fn()), False
+
+        while True:
+            flight, leader = self._join(key)
+            if flight is None:
+                return (yield from fn()), False
+            if leader:
+                return (yield from self._lead(key, flight, fn)), False
+
+            try:
+                return (yield from self._follow(flight, cancel_event)), True
+            except self.abandoned:
+                if flight.chunks:
+                    raise   # already passed on part of the reply
+                self._take_over()
+            except (GeneratorExit, FollowerCancelled):
+                self._leave(flight)
+                raise
+
+    def _lead(self, key: Hashable, flight: _Flight,
+              fn: Callable[[], Generator[str, None, T]]) -> Generator[str, None, T]:
+        gen = fn()
+        try:
+            while True:
+                try:
+                    chunk = next(gen)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+                self._publish(flight, chunk)
+                yield chunk
+        except GeneratorExit:
+            # Our reader went away mid-stream (page closed / rerun)
+            if self._orphan(key, flight):
+                gen.close()
+                self._land(key, flight, error=LeaderAbandoned("shared request was cancelled"))
+            else:
+                with self._lock:
+                    self._stats["handoffs"] += 1
+                threading.Thread(
+                    target=self._drain, args=(key, flight, gen),
+                    name="legitai-singleflight", daemon=True,
+                ).start()
+            raise
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+
+        self._land(key, flight, result)
+        return result
+
+    def _drain(self, key: Hashable, flight: _Flight, gen: Generator[str, None, T]) -> None:
+        """Finish an abandoned leader's stream for the followers still reading."""
+        try:
+            while True:
+                if self._orphan(key, flight):
+                    gen.close()
+                    self._land(key, flight, error=LeaderAbandoned("shared request was cancelled"))
+                    return
+                try:
+                    chunk = next(gen)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+                self._publish(flight, chunk)
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            return
+        self._land(key, flight, result)
+
+    @staticmethod
+    def _publish(flight: _Flight, chunk: str) -> None:
+        with flight.cond:
+            flight.chunks.append(chunk)
+            flight.cond.notify_all()
+
+    def _follow(self, flight: _Flight,
+                cancel_event: Optional[threading.Event] = None) -> Generator[str, None, T]:
+        sent = 0
+        poll = CANCEL_POLL_SECONDS if cancel_event is not None else None
+        while True:
+            with flight.cond:
+                while sent == len(flight.chunks) and not flight.future.done():
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise FollowerCancelled("cancelled while waiting on a shared request")
+                    flight.cond.wait(poll)
+                pending = flight.chunks[sent:]
+                finished = flight.future.done()
+            for chunk in pending:
+                yield chunk
+            sent += len(pending)
+            if finished and sent == len(flight.chunks):
+                break
+        return self.copy_result(flight.future.result())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        return stats
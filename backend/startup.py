@@ -0,0 +1,106 @@
+# backend/startup.py
+
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from backend.metrics import register_collector
+
+# Reference point for mark_ready: app.py imports this module first thing,
+# so this is roughly when the worker started loading the app
+_PROCESS_T0 = time.perf_counter()
+
+_timings: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def timed(label: str) -> Iterator[None]:
+    """
+    Record how long a one-off startup step took (first occurrence wins).
+    Labels are exported as legitai_startup_<label>, so keep them snake_case.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _timings.setdefault(label, elapsed)
+        print(f"[STARTUP] {label}: {elapsed * 1000:.1f} ms")
+
+
+def mark_ready(label: str = "app_ready") -> None:
+    """Record the time from process start to ``label``."""
+    with _lock:
+        _timings.setdefault(label, time.perf_counter() - _PROCESS_T0)
+
+
+def startup_timings() -> Dict[str, float]:
+    """Seconds per recorded step; exported by backend.metrics."""
+    with _lock:
+        return dict(_timings)
+
+
+register_collector("startup", startup_timings)
+
+
+# IMPORT-TIME REPORT
+#
+# `python -X importtime` prints one line per imported module:
+#   import time: self [us] | cumulative | imported package
+# Running it in a fresh interpreter is the only way to see what a cold
+# worker really pays, since every module is imported once per process.
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+DEFAULT_MODULES = ("backend.engine", "backend.gemini_client", "google.generativeai", "streamlit")
+
+
+def measure_imports(module: str) -> List[Tuple[str, float, float, int]]:
+    """(module, self seconds, cumulative seconds, depth) for a cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return rows
+
+
+def import_report(modules: Sequence[str] = DEFAULT_MODULES, top: int = 15) -> str:
+    lines = []
+    for module in modules:
+        rows = measure_imports(module)
+        total = next((r[2] for r in rows if r[0] == module), 0.0)
+        lines.append(f"{module}: {total * 1000:.0f} ms cold import")
+
+        # Heaviest direct and indirect dependencies by cumulative time
+        for name, self_s, cumulative_s, depth in sorted(rows, key=lambda r: -r[2])[1:top + 1]:
+            lines.append(f"  {cumulative_s * 1000:8.1f} ms cum  {self_s * 1000:7.1f} ms self  {name}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    modules = list(argv if argv is not None else sys.argv[1:]) or list(DEFAULT_MODULES)
+    print(import_report(modules))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
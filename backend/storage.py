@@ -0,0 +1,278 @@
+# backend/storage.py
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+
+# Session fields persisted by every backend. UI-only state (rerun guard,
+# last clicked suggestion) stays in st.session_state.
+SESSION_FIELDS = ("title", "level", "message_count", "created_at", "updated_at")
+
+
+class SessionStore(ABC):
+    """
+    Storage backend for chat sessions and their messages.
+
+    Session metadata is small and listed eagerly; message bodies are only
+    read for the chat being viewed, newest page first. Messages are
+    append-only: they are never rewritten once stored.
+    """
+
+    @abstractmethod
+    def create_session(self, user_id: str, session_id: str,
+                       title: str = "New Chat", level: Optional[int] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def list_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+        """Metadata only, most recently updated first."""
+
+    @abstractmethod
+    def iter_sessions(self) -> Iterator[Dict[str, Any]]:
+        """Metadata of every session, all users, oldest first (offline tools)."""
+
+    @abstractmethod
+    def update_session(self, session_id: str, **fields: Any) -> None:
+        """Update title and/or level."""
+
+    @abstractmethod
+    def append_message(self, session_id: str, role: str, content: str,
+                       meta: Optional[Dict[str, Any]] = None) -> int:
+        """Store one message, returns its id (ids increase with time)."""
+
+    @abstractmethod
+    def load_messages(self, session_id: str, limit: Optional[int] = 50,
+                      before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Newest ``limit`` messages older than ``before_id`` (all if limit is
+        None), returned oldest → newest.
+        """
+
+    def iter_messages(self, session_id: str, batch_size: int = 200) -> Iterator[Dict[str, Any]]:
+        """All messages oldest → newest, read in batches."""
+        pages: List[List[Dict[str, Any]]] = []
+        before_id = None
+        while True:
+            page = self.load_messages(session_id, limit=batch_size, before_id=before_id)
+            if not page:
+                break
+            pages.append(page)
+            before_id = page[0]["id"]
+        for page in reversed(pages):
+            yield from page
+
+
+# SQLITE BACKEND
+
+class SQLiteSessionStore(SessionStore):
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._conn()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                level INTEGER,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_user
+                ON sessions (user_id, updated_at DESC);
+
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL REFERENCES sessions (id),
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                meta TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_session
+                ON messages (session_id, id);
+            """
+        )
+        conn.commit()
+
+    @staticmethod
+    def _session_row(row: sqlite3.Row) -> Dict[str, Any]:
+        session = {"id": row["id"]}
+        for field in SESSION_FIELDS:
+            session[field] = row[field]
+        return session
+
+    def create_session(self, user_id: str, session_id: str,
+                       title: str = "New Chat", level: Optional[int] = None) -> Dict[str, Any]:
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO sessions (id, user_id, title, level, message_count, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 0, ?, ?)",
+            (session_id, user_id, title, level, now, now),
+        )
+        conn.commit()
+        return {"id": session_id, "title": title, "level": level,
+                "message_count": 0, "created_at": now, "updated_at": now}
+
+    def list_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            f"SELECT id, {', '.join(SESSION_FIELDS)} FROM sessions "
+            "WHERE user_id = ? ORDER BY updated_at DESC",
+            (user_id,),
+        ).fetchall()
+        return [self._session_row(row) for row in rows]
+
+    def iter_sessions(self) -> Iterator[Dict[str, Any]]:
+        cursor = self._conn().execute(
+            f"SELECT id, {', '.join(SESSION_FIELDS)} FROM sessions ORDER BY created_at"
+        )
+        for row in cursor:
+            yield self._session_row(row)
+
+    def update_session(self, session_id: str, **fields: Any) -> None:
+        allowed = {k: v for k, v in fields.items() if k in ("title", "level")}
+        if not allowed:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in allowed)
+        conn = self._conn()
+        conn.execute(
+            f"UPDATE sessions SET {assignments}, updated_at = ? WHERE id = ?",
+            (*allowed.values(), time.time(), session_id),
+        )
+        conn.commit()
+
+    def append_message(self, session_id: str, role: str, content: str,
+                       meta: Optional[Dict[str, Any]] = None) -> int:
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO messages (session_id, role, content, meta, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, role, content, json.dumps(meta) if meta else None, now),
+            )
+            conn.execute(
+                "UPDATE sessions SET message_count = message_count + 1, updated_at = ? "
+                "WHERE id = ?",
+                (now, session_id),
+            )
+        return cur.lastrowid
+
+    def load_messages(self, session_id: str, limit: Optional[int] = 50,
+                      before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT id, role, content, meta FROM messages WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if before_id is not None:
+            sql += " AND id < ?"
+            params.append(before_id)
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        rows = self._conn().execute(sql, params).fetchall()
+
+        messages = []
+        for row in reversed(rows):
+            msg = {"id": row["id"], "role": row["role"], "content": row["content"]}
+            if row["meta"]:
+                msg["meta"] = json.loads(row["meta"])
+            messages.append(msg)
+        return messages
+
+
+# IN-MEMORY BACKEND (tests, benchmarks, ephemeral deployments)
+
+class MemorySessionStore(SessionStore):
+
+    def __init__(self) -> None:
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._owners: Dict[str, str] = {}
+        self._messages: Dict[str, List[Dict[str, Any]]] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def create_session(self, user_id: str, session_id: str,
+                       title: str = "New Chat", level: Optional[int] = None) -> Dict[str, Any]:
+        now = time.time()
+        session = {"id": session_id, "title": title, "level": level,
+                   "message_count": 0, "created_at": now, "updated_at": now}
+        with self._lock:
+            self._sessions[session_id] = session
+            self._owners[session_id] = user_id
+            self._messages[session_id] = []
+        return dict(session)
+
+    def list_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            sessions = [dict(s) for sid, s in self._sessions.items()
+                        if self._owners[sid] == user_id]
+        return sorted(sessions, key=lambda s: s["updated_at"], reverse=True)
+
+    def iter_sessions(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            sessions = [dict(s) for s in self._sessions.values()]
+        yield from sorted(sessions, key=lambda s: s["created_at"])
+
+    def update_session(self, session_id: str, **fields: Any) -> None:
+        with self._lock:
+            session = self._sessions[session_id]
+            for key in ("title", "level"):
+                if key in fields:
+                    session[key] = fields[key]
+            session["updated_at"] = time.time()
+
+    def append_message(self, session_id: str, role: str, content: str,
+                       meta: Optional[Dict[str, Any]] = None) -> int:
+        with self._lock:
+            msg_id = self._next_id
+            self._next_id += 1
+            msg: Dict[str, Any] = {"id": msg_id, "role": role, "content": content}
+            if meta:
+                msg["meta"] = dict(meta)
+            self._messages[session_id].append(msg)
+            session = self._sessions[session_id]
+            session["message_count"] += 1
+            session["updated_at"] = time.time()
+        return msg_id
+
+    def load_messages(self, session_id: str, limit: Optional[int] = 50,
+                      before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            messages = self._messages.get(session_id, [])
+            if before_id is not None:
+                messages = [m for m in messages if m["id"] < before_id]
+            if limit is not None:
+                messages = messages[-limit:] if limit else []
+            return [dict(m) for m in messages]
+
+
+def open_session_store(path: str) -> SessionStore:
+    """":memory:" gives a process-local store, anything else a SQLite file."""
+    if path == ":memory:":
+        return MemorySessionStore()
+    return SQLiteSessionStore(path)
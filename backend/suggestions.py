@@ -0,0 +1,57 @@
+# backend/suggestions.py
+
+from typing import Dict, List, Optional
+
+
+# LEVEL-BASED SUGGESTION LISTS
+# Shown as pills in the chat UI and pre-generated by backend/prewarm.py.
+
+DEFAULT_SUGGESTIONS: List[str] = [
+    "What is the AIAS scale?",
+    "Give me study tips",
+    "What counts as academic misconduct?",
+    "How to plan my assignment?",
+    "How to improve my focus?",
+]
+
+LEVEL_SUGGESTIONS: Dict[int, List[str]] = {
+    1: [
+        "What is the AIAS scale?",
+        "Give me study tips",
+        "What counts as academic misconduct?",
+        "How to plan my assignment?",
+        "How to improve my focus?",
+    ],
+    2: [
+        "Explain recursion conceptually",
+        "Give me a high-level outline",
+        "Brainstorm essay ideas",
+        "Summarize a topic briefly",
+        "Explain gradient descent simply",
+    ],
+    3: [
+        "Improve my draft",
+        "Rewrite this paragraph",
+        "Debug this code snippet",
+        "Suggest better structure",
+        "Check clarity of my writing",
+    ],
+    4: [
+        "Give a worked recursion example",
+        "Show a sample Python function",
+        "Explain this algorithm step-by-step",
+        "Break down this math problem",
+        "Help refine a partially written solution",
+    ],
+    5: [
+        "Write a complete Python example program",
+        "Explain this topic in full depth",
+        "Generate a full solution from scratch",
+        "Optimize this code or algorithm",
+        "Solve this complex problem fully",
+    ],
+}
+
+
+def suggestions_for_level(level: Optional[int]) -> List[str]:
+    return LEVEL_SUGGESTIONS.get(level, DEFAULT_SUGGESTIONS)
@@ -0,0 +1,12 @@
+# backend/tokens.py
+
+
+# Rough token estimate for budgeting and reporting.
+# Gemini averages ~4 characters per token on English prose and code.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
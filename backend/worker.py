@@ -0,0 +1,231 @@
+# backend/worker.py
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generator, Hashable, List, Optional
+
+
+class GenerationHandle:
+    """
+    One reply being generated in the background. The UI polls ``text`` /
+    ``queue_position`` while it runs, then ``claim()``s the outcome exactly
+    once. A cancelled or superseded handle can never be claimed, so a late
+    result is dropped instead of landing in the wrong chat.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    _ids = itertools.count(1)
+
+    def __init__(self, key: Hashable) -> None:
+        self.id = next(self._ids)
+        self.key = key
+        self.state = self.PENDING
+        self.queue_position: Optional[int] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.submitted_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+        # Passed to the engine: aborts waits for a scheduler slot, a shared
+        # call's next chunk or a retry backoff
+        self.cancel_event = threading.Event()
+
+        self._chunks: List[str] = []
+        self._done = threading.Event()
+        self._claimed = False
+        self._lock = threading.Lock()
+
+    @property
+    def text(self) -> str:
+        """Reply streamed so far."""
+        with self._lock:
+            return "".join(self._chunks)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def claimed(self) -> bool:
+        return self._claimed
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True once finished (successfully, with an error, or cancelled)."""
+        return self._done.wait(timeout)
+
+    def set_queue_position(self, ahead: int) -> None:
+        self.queue_position = ahead
+
+    def cancel(self) -> bool:
+        """Request cancellation. False if the handle had already finished."""
+        with self._lock:
+            if self._done.is_set():
+                self._claimed = True   # finished but unclaimed: drop it
+                return False
+            self.cancel_event.set()
+        return True
+
+    def claim(self) -> bool:
+        """
+        True exactly once, for a finished handle that was not cancelled;
+        the caller then owns ``result`` / ``error``.
+        """
+        with self._lock:
+            if not self._done.is_set() or self._claimed or self.cancel_event.is_set():
+                return False
+            self._claimed = True
+            return True
+
+    # Worker side
+
+    def _append(self, chunk: str) -> None:
+        with self._lock:
+            self._chunks.append(chunk)
+        self.queue_position = None
+
+    def _finish(self, state: str, result: Any = None,
+                error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.state = state
+            self.result = result
+            self.error = error
+            self.finished_at = time.monotonic()
+        self._done.set()
+
+
+# Job: given its handle, yields reply chunks and returns the final result.
+# Closing it (on cancel) must abandon the upstream call.
+GenerationJob = Callable[[GenerationHandle], Generator[str, None, Any]]
+
+
+class GenerationPool:
+    """
+    Shared worker threads for reply generation, with one current handle per
+    key (a chat session). Submitting for a key cancels the request it
+    already has running; ``cancel(key)`` is used when the user leaves the
+    chat. A cancelled job stops at its next chunk, or as soon as it notices
+    the handle's cancel_event while waiting (for a quota slot, a shared
+    call or a retry); its generator is then closed, which abandons the
+    upstream stream. Only the wait for the first upstream byte cannot be
+    interrupted, and it is bounded by the request timeout.
+
+    Finished handles nobody claims (the tab was closed) are dropped after
+    ``keep_seconds``.
+    """
+
+    def __init__(self, max_workers: int = 16, keep_seconds: float = 600.0) -> None:
+        self.keep_seconds = keep_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="legitai-generate"
+        )
+        self._current: Dict[Hashable, GenerationHandle] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "discarded": 0,
+        }
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _purge(self, now: float) -> None:
+        for key, handle in list(self._current.items()):
+            if handle.finished_at is not None and now - handle.finished_at > self.keep_seconds:
+                del self._current[key]
+
+    def submit(self, key: Hashable, job: GenerationJob) -> GenerationHandle:
+        handle = GenerationHandle(key)
+        with self._lock:
+            self._purge(time.monotonic())
+            previous = self._current.get(key)
+            self._current[key] = handle
+            self._stats["submitted"] += 1
+        if previous is not None:
+            self._cancel(previous)
+        self._executor.submit(self._run, handle, job)
+        return handle
+
+    def get(self, key: Hashable) -> Optional[GenerationHandle]:
+        """The key's current handle, unless it was already claimed."""
+        with self._lock:
+            handle = self._current.get(key)
+        if handle is None or handle.claimed:
+            return None
+        return handle
+
+    def cancel(self, key: Hashable) -> bool:
+        with self._lock:
+            handle = self._current.pop(key, None)
+        return handle is not None and self._cancel(handle)
+
+    def _cancel(self, handle: GenerationHandle) -> bool:
+        cancelled = handle.cancel()
+        if not cancelled and handle.state != GenerationHandle.CANCELLED:
+            self._bump("discarded")   # finished, but nobody will read it now
+        return cancelled
+
+    def release(self, handle: GenerationHandle) -> None:
+        """Forget a claimed handle (keeps ``get`` cheap)."""
+        with self._lock:
+            if self._current.get(handle.key) is handle:
+                del self._current[handle.key]
+
+    def _run(self, handle: GenerationHandle, job: GenerationJob) -> None:
+        if handle.cancelled:
+            handle._finish(GenerationHandle.CANCELLED)
+            self._bump("cancelled")
+            return
+
+        handle.state = GenerationHandle.RUNNING
+        chunks = None
+        try:
+            chunks = job(handle)
+            while True:
+                if handle.cancelled:
+                    chunks.close()
+                    handle._finish(GenerationHandle.CANCELLED)
+                    self._bump("cancelled")
+                    return
+                try:
+                    chunk = next(chunks)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+                handle._append(chunk)
+        except BaseException as e:
+            if chunks is not None:
+                chunks.close()
+            state = GenerationHandle.CANCELLED if handle.cancelled else GenerationHandle.FAILED
+            handle._finish(state, error=e)
+            self._bump("cancelled" if handle.cancelled else "failed")
+            return
+
+        handle._finish(GenerationHandle.DONE, result)
+        self._bump("completed")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = sum(1 for h in self._current.values() if not h.done)
+        return stats
+
+    def shutdown(self) -> None:
+        with self._lock:
+            handles = list(self._current.values())
+            self._current.clear()
+        for handle in handles:
+            handle.cancel()
+        self._executor.shutdown(wait=False)
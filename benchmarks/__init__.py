@@ -0,0 +1,24 @@
+# benchmarks/__init__.py
+#
+# Offline benchmarks for LegitAI. Nothing here talks to Gemini: upstream
+# calls are replaced by benchmarks.fake_backend (or, for the load test, by
+# the local HTTP stand-in in benchmarks.mock_gemini).
+#
+#   python -m benchmarks run                 # all suites → benchmarks/results/
+#   python -m benchmarks run --only prompt,cache --quick
+#   python -m benchmarks compare OLD.json NEW.json
+#   python -m benchmarks.loadtest --users 1,10,25   # concurrent users → results/
+
+import os
+import tempfile
+
+# backend.config reads these at import time, so they must be set before any
+# backend module is imported. Real values from the environment still win.
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+os.environ.setdefault("GEMINI_WARMUP", "0")
+os.environ.setdefault("GEMINI_CONTEXT_CACHE", "0")
+os.environ.setdefault("PREWARM_SUGGESTIONS", "0")
+os.environ.setdefault("METRICS_LOG", "0")
+os.environ.setdefault(
+    "SESSION_DB_PATH", os.path.join(tempfile.gettempdir(), "legitai_bench_sessions.db")
+)
@@ -0,0 +1,179 @@
+# benchmarks/__main__.py
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+import benchmarks  # noqa: F401  (sets the fake environment before backend imports)
+from benchmarks._timing import latency_spec
+from benchmarks.fake_backend import FakeGemini, Latency
+
+SUITES = ("prompt", "throughput", "cache", "app")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suites(args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeGemini(
+        latency=Latency.parse(args.latency),
+        failure_rate=args.failure_rate,
+        reply_chars=args.reply_chars,
+        seed=args.seed,
+    )
+    quick = args.quick
+    results: Dict[str, Any] = {}
+
+    for suite in args.only:
+        print(f"[BENCH] {suite} …", file=sys.stderr)
+
+        if suite == "prompt":
+            from benchmarks import bench_prompt
+            results[suite] = bench_prompt.run(
+                history_sizes=(0, 10, 100) if quick else (0, 10, 50, 200, 1000),
+                repeat=30 if quick else 200,
+            )
+        elif suite == "throughput":
+            from benchmarks import bench_throughput
+            results[suite] = bench_throughput.run(
+                fake,
+                concurrency_levels=(1, 8) if quick else (1, 4, 16, 64),
+                requests_per_level=20 if quick else 200,
+            )
+        elif suite == "cache":
+            from benchmarks import bench_cache
+            results[suite] = bench_cache.run(repeat=30 if quick else 300)
+        elif suite == "app":
+            from benchmarks import bench_app
+            results[suite] = bench_app.run(
+                fake,
+                session_counts=(1, 20) if quick else (1, 20, 200),
+                message_counts=(10, 100) if quick else (10, 100, 1000),
+                reruns=2 if quick else 5,
+            )
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "fake_backend": fake.config(),
+        },
+        "results": results,
+    }
+
+
+# COMPARISON
+
+def _flatten(value: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """Numeric leaves keyed by path; list rows are labelled by their first field."""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _flatten(child, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, list):
+        for i, child in enumerate(value):
+            label = str(i)
+            if isinstance(child, dict) and child:
+                first_key, first_value = next(iter(child.items()))
+                label = f"{first_key}={first_value}"
+                if "mode" in child and "concurrency" in child:
+                    label = f"{child['mode']}@{child['concurrency']}"
+            yield from _flatten(child, f"{prefix}[{label}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """Print metrics that moved by more than ``threshold``; exit 1 on any timing or throughput regression."""
+    with open(old_path, encoding="utf-8") as f:
+        old = dict(_flatten(json.load(f)["results"]))
+    with open(new_path, encoding="utf-8") as f:
+        new = dict(_flatten(json.load(f)["results"]))
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        if not before:
+            continue
+        change = (after - before) / before
+        if abs(change) < threshold:
+            continue
+
+        # Timings: higher is worse. Throughput: lower is worse.
+        if key.endswith(("_ms", "_s")):
+            worse = change > 0
+        elif key.endswith("_rps"):
+            worse = change < 0
+        else:
+            continue   # sizes / counts, not performance
+        regressions += worse
+        marker = "▲ worse" if worse else "▼ better"
+        print(f"{key:<70} {before:>12.3f} → {after:>12.3f}  {change:+.1%}  {marker}")
+
+    print(f"\n{regressions} regression(s) above {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Offline LegitAI benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="run benchmark suites and save JSON results")
+    run_p.add_argument("--only", default=",".join(SUITES),
+                       help=f"comma-separated subset of {', '.join(SUITES)}")
+    run_p.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    run_p.add_argument("--quick", action="store_true", help="small sizes for a fast smoke run")
+    run_p.add_argument("--latency", type=latency_spec, default="lognormal:0.05,0.5",
+                       help="fake upstream latency, e.g. constant:0.2, uniform:0.1,0.05, lognormal:0.8,0.5")
+    run_p.add_argument("--failure-rate", type=float, default=0.0)
+    run_p.add_argument("--reply-chars", type=int, default=800)
+    run_p.add_argument("--seed", type=int, default=1234)
+
+    cmp_p = sub.add_parser("compare", help="diff two result files")
+    cmp_p.add_argument("old")
+    cmp_p.add_argument("new")
+    cmp_p.add_argument("--threshold", type=float, default=0.10,
+                       help="relative change to report (default 0.10)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        return compare(args.old, args.new, args.threshold)
+
+    args.only = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(args.only) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    report = run_suites(args)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['meta']['commit']}.json")
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] results written to {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# benchmarks/_timing.py
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted sample list."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, Any]:
+    """Seconds in → milliseconds out, rounded for readable JSON."""
+    if not samples:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 4),
+        "min_ms": round(min(samples) * 1000, 4),
+        "p50_ms": round(percentile(samples, 50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 99) * 1000, 4),
+    }
+
+
+def time_calls(fn: Callable[[], Any], repeat: int, warmup: int = 3) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# LATENCY DISTRIBUTIONS
+
+LATENCY_KINDS = ("constant", "uniform", "exponential", "lognormal")
+
+
+@dataclass
+class Latency:
+    """
+    Upstream latency model, in seconds.
+
+    - ``constant``:    always ``mean``
+    - ``uniform``:     mean ± spread
+    - ``exponential``: memoryless, mean ``mean``
+    - ``lognormal``:   long right tail; ``spread`` is sigma of the log
+    """
+    kind: str = "constant"
+    mean: float = 0.0
+    spread: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        """``"lognormal:0.8,0.5"`` → Latency("lognormal", 0.8, 0.5)."""
+        kind, _, params = spec.partition(":")
+        if kind not in LATENCY_KINDS:
+            raise ValueError(
+                f"unknown latency distribution {kind!r} (expected one of {', '.join(LATENCY_KINDS)})"
+            )
+        try:
+            values = [float(v) for v in params.split(",") if v.strip()]
+        except ValueError:
+            raise ValueError(f"latency parameters must be numbers, got {params!r}") from None
+        if len(values) > 2 or any(v < 0 or not math.isfinite(v) for v in values):
+            raise ValueError(f"expected {kind}:MEAN[,SPREAD] with non-negative seconds, got {spec!r}")
+        return cls(kind, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.kind == "constant":
+            return self.mean
+        if self.kind == "uniform":
+            return max(0.0, rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.mean)
+        if self.kind == "lognormal":
+            # Parametrised so the distribution mean is ``mean``
+            mu = math.log(self.mean) - self.spread ** 2 / 2
+            return rng.lognormvariate(mu, self.spread)
+        raise ValueError(f"Unknown latency distribution: {self.kind!r}")
+
+
+def latency_spec(spec: str) -> str:
+    """argparse ``type=`` for latency options: validates, keeps the string."""
+    try:
+        Latency.parse(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    return spec
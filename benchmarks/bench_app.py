@@ -0,0 +1,83 @@
+# benchmarks/bench_app.py
+
+from __future__ import annotations
+
+import os
+import statistics
+import time
+import uuid
+from typing import Any, Dict, Sequence
+
+from backend.config import SESSION_DB_PATH
+from backend.storage import open_session_store
+from benchmarks.bench_prompt import make_history
+from benchmarks.fake_backend import FakeGemini, installed
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def seed_user(n_sessions: int, n_messages: int) -> str:
+    """
+    Create a fresh user with ``n_sessions`` chats. The most recent chat (the
+    one the app opens) holds ``n_messages`` messages, the others two each.
+    The app shares the store through SESSION_DB_PATH.
+    """
+    store = open_session_store(SESSION_DB_PATH)
+    user_id = f"bench-{uuid.uuid4().hex}"
+
+    for i in range(n_sessions):
+        session_id = str(uuid.uuid4())
+        store.create_session(user_id, session_id, title=f"Chat {i}", level=(i % 5) + 1)
+        count = n_messages if i == n_sessions - 1 else 2
+        for msg in make_history(count, message_chars=200):
+            store.append_message(session_id, msg["role"], msg["content"])
+
+    return user_id
+
+
+def _time_app(user_id: str, reruns: int) -> Dict[str, Any]:
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.session_state["user_id"] = user_id   # what the cookie would restore
+
+    start = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception}")
+
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - start)
+
+    return {
+        "first_run_ms": round(first * 1000, 2),
+        "rerun_median_ms": round(statistics.median(samples) * 1000, 2),
+        "rerun_max_ms": round(max(samples) * 1000, 2),
+        "chat_messages_rendered": len(at.chat_message),
+        "sidebar_buttons": len(at.sidebar.button),
+    }
+
+
+def run(fake: FakeGemini,
+        session_counts: Sequence[int] = (1, 20, 200),
+        message_counts: Sequence[int] = (10, 100, 1000),
+        reruns: int = 5) -> Dict[str, Any]:
+    """
+    Streamlit script time for a returning user, swept separately over the
+    number of chats (sidebar) and messages in the open chat (main area).
+    First run includes loading session state; reruns are what every widget
+    interaction costs.
+    """
+    by_sessions, by_messages = [], []
+
+    with installed(fake):
+        for n in session_counts:
+            by_sessions.append({"sessions": n, **_time_app(seed_user(n, 10), reruns)})
+        for n in message_counts:
+            by_messages.append({"messages": n, **_time_app(seed_user(1, n), reruns)})
+
+    return {"reruns": reruns, "by_sessions": by_sessions, "by_messages": by_messages}
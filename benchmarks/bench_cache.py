@@ -0,0 +1,76 @@
+# benchmarks/bench_cache.py
+
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Any, Dict
+
+from backend import engine
+from backend.cache import ResponseCache
+from backend.semantic_cache import SemanticCache
+from benchmarks._timing import summarize, time_calls
+from benchmarks.fake_backend import FakeGemini, Latency, installed
+
+# Short-circuited locally by the policy pre-filter below Level 4
+POLICY_MESSAGE = "Write the entire essay for my assignment"
+
+
+def run(repeat: int = 300) -> Dict[str, Any]:
+    """
+    chat_with_aias latency per cache path, with a zero-latency fake so only
+    local overhead is measured:
+
+    - miss:        new message, fake upstream call, cache store
+    - memory_hit:  repeated message, in-process LRU
+    - semantic_hit: rephrased message, exact miss then near-duplicate match
+    - disk_hit:    repeated message, SQLite tier only (fresh memory tier)
+    - policy_local: answered by the pre-filter, cache never consulted
+    """
+    fake = FakeGemini(latency=Latency("constant", 0.0))
+    saved_cache = engine.response_cache
+    saved_semantic = engine.semantic_cache
+    counter = iter(range(10 ** 9))
+    results: Dict[str, Any] = {}
+
+    with installed(fake):
+        engine.response_cache = ResponseCache(max_entries=repeat * 4)
+        engine.semantic_cache = SemanticCache(max_entries=repeat * 4)
+        try:
+            results["miss"] = summarize(time_calls(
+                lambda: engine.chat_with_aias(3, f"Outline section {next(counter)} for me", []),
+                repeat,
+            ))
+
+            engine.chat_with_aias(3, "Outline my introduction", [])
+            results["memory_hit"] = summarize(time_calls(
+                lambda: engine.chat_with_aias(3, "Outline my introduction", []), repeat
+            ))
+            results["semantic_hit"] = summarize(time_calls(
+                lambda: engine.chat_with_aias(3, "Please outline the introduction", []), repeat
+            ))
+
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, "bench_cache.db")
+                engine.response_cache = ResponseCache(sqlite_path=db_path)
+                engine.chat_with_aias(3, "Outline my conclusion", [])
+
+                def disk_hit() -> None:
+                    # New instance = empty memory tier; construction is not timed
+                    engine.chat_with_aias(3, "Outline my conclusion", [])
+
+                samples = []
+                for _ in range(repeat):
+                    engine.response_cache = ResponseCache(sqlite_path=db_path)
+                    samples.extend(time_calls(disk_hit, 1, warmup=0))
+                results["disk_hit"] = summarize(samples)
+
+            results["policy_local"] = summarize(time_calls(
+                lambda: engine.chat_with_aias(2, POLICY_MESSAGE, []), repeat
+            ))
+        finally:
+            engine.response_cache = saved_cache
+            engine.semantic_cache = saved_semantic
+
+    results["upstream_calls"] = fake.calls
+    return {"repeat": repeat, "paths": results}
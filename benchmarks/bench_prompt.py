@@ -0,0 +1,49 @@
+# benchmarks/bench_prompt.py
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence
+
+from backend.engine import AiasLevel, _prepare_prompt, build_aias_prompt
+from benchmarks._timing import summarize, time_calls
+
+
+def make_history(n_messages: int, message_chars: int = 300) -> List[Dict[str, str]]:
+    base = "I tried rewriting the introduction but the argument still feels weak. "
+    body = (base * (message_chars // len(base) + 1))[:message_chars]
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"[{i}] {body}"}
+        for i in range(n_messages)
+    ]
+
+
+def run(history_sizes: Sequence[int] = (0, 10, 50, 200, 1000),
+        repeat: int = 200,
+        message_chars: int = 300) -> Dict[str, Any]:
+    """
+    Prompt construction cost against history length.
+
+    ``build_aias_prompt`` is timed on the full history (worst case) and
+    ``_prepare_prompt`` on the path the engine takes per request: history
+    windowing + explanation override + prompt build + cache key.
+    """
+    level = AiasLevel.LEVEL_3
+    message = "Can you explain what a thesis statement should do?"
+    results = []
+
+    for size in history_sizes:
+        history = make_history(size, message_chars)
+        prompt = build_aias_prompt(level, message, history)
+
+        results.append({
+            "history_messages": size,
+            "full_prompt_chars": len(prompt),
+            "build_aias_prompt": summarize(time_calls(
+                lambda: build_aias_prompt(level, message, history), repeat
+            )),
+            "prepare_prompt": summarize(time_calls(
+                lambda: _prepare_prompt(level.value, message, history, None), repeat
+            )),
+        })
+
+    return {"repeat": repeat, "message_chars": message_chars, "sizes": results}
@@ -0,0 +1,92 @@
+# benchmarks/bench_throughput.py
+
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+from backend import engine
+from benchmarks._timing import summarize
+from benchmarks.fake_backend import FakeGemini, installed
+
+
+def _message(i: int) -> str:
+    # Unique per request so every call misses the response cache
+    return f"Can you help me plan the structure of report section {i}?"
+
+
+def _thread_round(concurrency: int, requests: int, offset: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: List[str] = []   # list.append is atomic, += on an int is not
+
+    def one(i: int) -> None:
+        start = time.perf_counter()
+        try:
+            engine.chat_with_aias(3, _message(offset + i), [])
+        except Exception as e:
+            errors.append(type(e).__name__)
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    return {"wall_s": round(wall, 4), "errors": len(errors), "latency": summarize(latencies),
+            "throughput_rps": round(len(latencies) / wall, 2) if wall else None}
+
+
+def _async_round(concurrency: int, requests: int, offset: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def main() -> None:
+        nonlocal errors
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    await engine.chat_with_aias_async(3, _message(offset + i), [])
+                except Exception:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one(i) for i in range(requests)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    wall = time.perf_counter() - start
+
+    return {"wall_s": round(wall, 4), "errors": errors, "latency": summarize(latencies),
+            "throughput_rps": round(len(latencies) / wall, 2) if wall else None}
+
+
+def run(fake: FakeGemini,
+        concurrency_levels: Sequence[int] = (1, 4, 16, 64),
+        requests_per_level: int = 200,
+        modes: Sequence[str] = ("threads", "async")) -> Dict[str, Any]:
+    """
+    End-to-end chat_with_aias / chat_with_aias_async throughput with N
+    concurrent callers, every request going "upstream" to the fake.
+    """
+    rounds = {"threads": _thread_round, "async": _async_round}
+    results = []
+    offset = 0
+
+    engine.response_cache.clear()
+    with installed(fake):
+        for mode in modes:
+            for concurrency in concurrency_levels:
+                row = rounds[mode](concurrency, requests_per_level, offset)
+                offset += requests_per_level
+                results.append({"mode": mode, "concurrency": concurrency, **row})
+    engine.response_cache.clear()
+
+    return {"requests_per_level": requests_per_level, "rounds": results}
@@ -0,0 +1,139 @@
+# benchmarks/fake_backend.py
+
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Generator, Iterator, Optional
+
+from backend import engine
+from backend.gemini_client import AiasLLMResponse, TokenUsage
+from backend.tokens import estimate_tokens
+from benchmarks._timing import Latency
+
+
+class FakeUpstreamError(RuntimeError):
+    """Injected upstream failure."""
+
+
+# FAKE GEMINI
+
+_FILLER = (
+    "Start by restating the question in your own words, then list what you "
+    "already know and what is still unclear. "
+)
+
+
+@dataclass
+class FakeGemini:
+    """
+    Stand-in for the Gemini calls made by backend.engine.
+
+    Replies are valid AiasLLMResponse objects of roughly ``reply_chars``
+    characters; ``failure_rate`` of calls raise FakeUpstreamError after the
+    sampled latency. Streaming splits the latency into time-to-first-chunk
+    (``ttfb_share``) and an even spread over the remaining chunks.
+    """
+    latency: Latency = field(default_factory=Latency)
+    failure_rate: float = 0.0
+    reply_chars: int = 800
+    chunk_chars: int = 40
+    ttfb_share: float = 0.3
+    seed: Optional[int] = 1234
+
+    def __post_init__(self) -> None:
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()   # random.Random is not thread-safe
+        self.calls = 0
+        self.failures = 0
+
+    def config(self) -> Dict[str, object]:
+        return {
+            "latency": {"kind": self.latency.kind, "mean": self.latency.mean, "spread": self.latency.spread},
+            "failure_rate": self.failure_rate,
+            "reply_chars": self.reply_chars,
+            "chunk_chars": self.chunk_chars,
+        }
+
+    def _draw(self) -> tuple:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency.sample(self._rng)
+            fail = self._rng.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        return delay, fail
+
+    def _reply(self, prompt: str) -> AiasLLMResponse:
+        text = (_FILLER * (self.reply_chars // len(_FILLER) + 1))[:self.reply_chars]
+        return AiasLLMResponse(
+            requested_level=1,
+            is_within_selected_level=True,
+            violation_reason=None,
+            assistant_reply_md=text,
+            usage=TokenUsage(
+                prompt_tokens=estimate_tokens(prompt),
+                output_tokens=estimate_tokens(text),
+            ),
+        )
+
+    # Signatures mirror backend.gemini_client
+
+    def call(self, prompt: str,
+             system_instruction: Optional[str] = None,
+             model_name: Optional[str] = None) -> AiasLLMResponse:
+        delay, fail = self._draw()
+        time.sleep(delay)
+        if fail:
+            raise FakeUpstreamError("injected failure")
+        return self._reply(prompt)
+
+    async def call_async(self, prompt: str,
+                         system_instruction: Optional[str] = None,
+                         model_name: Optional[str] = None) -> AiasLLMResponse:
+        delay, fail = self._draw()
+        await asyncio.sleep(delay)
+        if fail:
+            raise FakeUpstreamError("injected failure")
+        return self._reply(prompt)
+
+    def stream(self, prompt: str,
+               system_instruction: Optional[str] = None,
+               model_name: Optional[str] = None
+               ) -> Generator[str, None, AiasLLMResponse]:
+        delay, fail = self._draw()
+        reply = self._reply(prompt)
+        text = reply.assistant_reply_md
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+        time.sleep(delay * self.ttfb_share)
+        if fail:
+            raise FakeUpstreamError("injected failure")
+
+        per_chunk = delay * (1 - self.ttfb_share) / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(per_chunk)
+            yield chunk
+        return reply
+
+
+@contextmanager
+def installed(fake: FakeGemini) -> Iterator[FakeGemini]:
+    """
+    Route backend.engine's upstream calls to ``fake`` for the duration of
+    the block. The engine looks these names up at call time, so the app and
+    everything built on the engine goes through the fake as well.
+    """
+    saved = (engine.call_aias_model, engine.call_aias_model_async, engine.stream_aias_model)
+    engine.call_aias_model = fake.call
+    engine.call_aias_model_async = fake.call_async
+    engine.stream_aias_model = fake.stream
+    try:
+        yield fake
+    finally:
+        engine.call_aias_model, engine.call_aias_model_async, engine.stream_aias_model = saved
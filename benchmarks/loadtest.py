@@ -0,0 +1,409 @@
+# benchmarks/loadtest.py
+#
+# Concurrent-user load test. Starts benchmarks.mock_gemini in a subprocess,
+# points the backend at it, then drives N simulated students through the
+# real app.py (one streamlit.testing AppTest per student) for each N:
+#
+#   python -m benchmarks.loadtest --users 1,10,25,50 --turns 5
+#   python -m benchmarks.loadtest --users 20 --latency lognormal:1.5,0.6 --error-rate 0.05
+#
+# Every AppTest runs in this process and shares its st.cache_resource
+# objects (engine, caches, scheduler, generation pool), so the numbers are
+# those of a single Streamlit worker. AppTest swaps a process-global
+# runtime on each run, so script runs take turns on a lock (the GIL
+# serializes a real worker's script threads much the same way); replies
+# are still generated concurrently on the generation pool. Scaling stops
+# at the first N that misses --slo-p95 or --max-error-rate (unless
+# --no-stop).
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks import mock_gemini
+from benchmarks._timing import summarize
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Replies app.py shows when the backend call failed (see error_message)
+ERROR_PREFIXES = ("⚠️ Error contacting backend", "⚠️ The AI service")
+
+_QUESTIONS = (
+    "Can you explain {topic} in simple terms?",
+    "How should I structure an essay about {topic}?",
+    "What are common mistakes students make with {topic}?",
+    "Give me a study plan for learning {topic} this week.",
+    "Is my understanding of {topic} correct if I think of it as a trade-off?",
+    "Write a short example that shows {topic} in practice.",
+    "Which sources would you recommend for {topic}?",
+    "How would an examiner test my knowledge of {topic}?",
+)
+
+# One AppTest script run at a time (see top of file)
+_script_lock = threading.Lock()
+
+_TOPICS = (
+    "photosynthesis", "supply and demand", "recursion", "the French Revolution",
+    "linear regression", "cell division", "Keynesian economics", "binary search",
+    "plate tectonics", "the causes of World War I", "enzyme kinetics",
+    "object-oriented design", "climate feedback loops", "Bayes' theorem",
+)
+
+
+# SERVER MEMORY
+
+def rss_bytes() -> int:
+    """Resident set size of this process (peak RSS where current is unavailable)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:   # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemorySampler:
+    """Tracks the RSS peak on a daemon thread while a load level runs."""
+
+    def __init__(self, interval: float = 0.25) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "MemorySampler":
+        self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._run, name="legitai-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+
+# SIMULATED USERS
+
+@dataclass
+class UserStats:
+    turns: List[float] = field(default_factory=list)         # prompt → reply shown, seconds
+    script_runs: List[float] = field(default_factory=list)   # every rerun the user triggered
+    script_waits: List[float] = field(default_factory=list)  # queued behind other users' runs
+    errors: Dict[str, int] = field(default_factory=dict)
+    actions: Dict[str, int] = field(default_factory=dict)
+
+    def count(self, bucket: Dict[str, int], name: str) -> None:
+        bucket[name] = bucket.get(name, 0) + 1
+
+
+class SimulatedUser:
+    """
+    One student with a fresh user id: picks a level, asks ``turns``
+    questions (typed, or a suggestion pill), and between turns sometimes
+    opens a new chat or switches back to an older one. Replies are polled
+    every ``poll`` seconds, like the page's pending-reply fragment.
+    """
+
+    def __init__(self, index: int, turns: int, think: float, poll: float,
+                 turn_timeout: float, pill_rate: float, switch_rate: float,
+                 seed: int) -> None:
+        self.index = index
+        self.turns = turns
+        self.think = think
+        self.poll = poll
+        self.turn_timeout = turn_timeout
+        self.pill_rate = pill_rate
+        self.switch_rate = switch_rate
+        self.rng = random.Random(seed)
+        self.stats = UserStats()
+        self.at = None
+
+    def run(self) -> UserStats:
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_PATH, default_timeout=self.turn_timeout)
+        self.at.session_state["user_id"] = f"load-{self.index}-{uuid.uuid4().hex}"
+        try:
+            self._run(self.at.run)
+            for turn in range(self.turns):
+                time.sleep(self.rng.uniform(0, 2 * self.think))
+                if turn and self.rng.random() < self.switch_rate:
+                    self._switch_chat()
+                self._ensure_level()
+                self._ask()
+        except Exception as e:
+            # The simulated browser itself broke (e.g. a script run timed out)
+            self.stats.count(self.stats.errors, type(e).__name__)
+        return self.stats
+
+    # App state
+
+    def _chat(self) -> Dict[str, Any]:
+        state = self.at.session_state
+        return state["sessions"][state["active_session"]]
+
+    def _run(self, action) -> None:
+        queued = time.perf_counter()
+        with _script_lock:
+            start = time.perf_counter()
+            action()
+            self.stats.script_runs.append(time.perf_counter() - start)
+        self.stats.script_waits.append(start - queued)
+        if self.at.exception:
+            self.stats.count(self.stats.errors, "exception")
+
+    # Actions
+
+    def _ensure_level(self) -> None:
+        if self._chat()["level"] is None:
+            level = self.rng.randint(1, 5)
+            self._run(self.at.selectbox(key="aias_level_box").select_index(level).run)
+            self.stats.count(self.stats.actions, "select_level")
+
+    def _switch_chat(self) -> None:
+        state = self.at.session_state
+        others = [sid for sid in state["sessions"] if sid != state["active_session"]]
+        if others and self.rng.random() < 0.5:
+            sid = self.rng.choice(others)
+            button = self.at.sidebar.button(key=f"session_{sid}")
+            self.stats.count(self.stats.actions, "switch_chat")
+        else:
+            button = next(b for b in self.at.sidebar.button if b.label == "➕ New Chat")
+            self.stats.count(self.stats.actions, "new_chat")
+        self._run(button.click().run)
+
+    def _ask(self) -> None:
+        chat = self._chat()
+        before = chat["message_count"]
+        pills = [p for p in self.at.pills if p.key == f"suggestions_bar_{chat['id']}"]
+        options = [o for o in pills[0].options if o != chat["last_suggestion_choice"]] if pills else []
+
+        start = time.perf_counter()
+        if options and self.rng.random() < self.pill_rate:
+            self.stats.count(self.stats.actions, "pill")
+            self._run(pills[0].set_value(self.rng.choice(options)).run)
+        else:
+            self.stats.count(self.stats.actions, "message")
+            question = self.rng.choice(_QUESTIONS).format(topic=self.rng.choice(_TOPICS))
+            self._run(self.at.chat_input[0].set_value(question).run)
+
+        # User message + reply
+        while self._chat()["message_count"] < before + 2:
+            if time.perf_counter() - start > self.turn_timeout:
+                self.stats.count(self.stats.errors, "timeout")
+                return
+            time.sleep(self.poll)
+            self._run(self.at.run)
+        self.stats.turns.append(time.perf_counter() - start)
+
+        reply = self._chat()["messages"][-1]["content"]
+        if reply.startswith(ERROR_PREFIXES):
+            self.stats.count(self.stats.errors, "backend")
+
+
+# LOAD LEVELS
+
+def _upstream_stats(url: str) -> Dict[str, int]:
+    with urllib.request.urlopen(url + "/stats", timeout=5) as resp:
+        return json.load(resp)
+
+
+def run_level(users: int, args: argparse.Namespace, mock_url: str) -> Dict[str, Any]:
+    """Run ``users`` simulated students at once; one result row."""
+    from backend import metrics
+
+    upstream_before = _upstream_stats(mock_url)
+    simulated = [
+        SimulatedUser(
+            index=i, turns=args.turns, think=args.think, poll=args.poll,
+            turn_timeout=args.turn_timeout, pill_rate=args.pill_rate,
+            switch_rate=args.switch_rate, seed=args.seed * 1000 + i,
+        )
+        for i in range(users)
+    ]
+
+    def start(user: SimulatedUser) -> UserStats:
+        # Spread arrivals over the ramp instead of a thundering herd
+        time.sleep(args.ramp * user.index / users)
+        return user.run()
+
+    wall_start = time.perf_counter()
+    with MemorySampler() as memory, ThreadPoolExecutor(max_workers=users) as pool:
+        results = list(pool.map(start, simulated))
+    wall = time.perf_counter() - wall_start
+
+    turns = [t for r in results for t in r.turns]
+    script_runs = [t for r in results for t in r.script_runs]
+    script_waits = [t for r in results for t in r.script_waits]
+    errors: Dict[str, int] = {}
+    actions: Dict[str, int] = {}
+    for r in results:
+        for name, n in r.errors.items():
+            errors[name] = errors.get(name, 0) + n
+        for name, n in r.actions.items():
+            actions[name] = actions.get(name, 0) + n
+
+    attempted = actions.get("message", 0) + actions.get("pill", 0)
+    upstream_after = _upstream_stats(mock_url)
+    app_stats = metrics.collect_stats()
+
+    return {
+        "users": users,
+        "turns": len(turns),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(turns) / wall, 3) if wall else 0.0,
+        "error_rate": round(sum(errors.values()) / max(attempted, 1), 4),
+        "turn": summarize(turns),
+        "script_run": summarize(script_runs),
+        "script_wait": summarize(script_waits),
+        "errors": errors,
+        "actions": actions,
+        "rss_peak_mb": round(memory.peak / 2 ** 20, 1),
+        "rss_end_mb": round(rss_bytes() / 2 ** 20, 1),
+        "session_messages_mb": round(app_stats.get("memory", {}).get("bytes", 0) / 2 ** 20, 2),
+        "upstream": {
+            name: upstream_after[name] - upstream_before.get(name, 0)
+            for name in ("calls", "errors", "disconnects")
+        },
+        "upstream_peak_in_flight": upstream_after["peak_in_flight"],
+    }
+
+
+def _breaks(row: Dict[str, Any], args: argparse.Namespace) -> bool:
+    p95 = row["turn"].get("p95_ms", 0) / 1000
+    return row["error_rate"] > args.max_error_rate or p95 > args.slo_p95
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_mock_server(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    """benchmarks.mock_gemini on a free port; returns the process and its URL."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_gemini", "--port", "0", *mock_gemini.server_argv(args)],
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    url = proc.stdout.readline().strip()
+    if not url:
+        proc.kill()
+        raise RuntimeError("mock Gemini server did not start")
+    return proc, url
+
+
+def run(args: argparse.Namespace, user_counts: Sequence[int]) -> Dict[str, Any]:
+    proc, url = start_mock_server(args)
+    try:
+        # backend.config reads these on first import (the first app run)
+        os.environ["GEMINI_API_ENDPOINT"] = url
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+
+        rows: List[Dict[str, Any]] = []
+        breaking_point = None
+        print(f"{'users':>6} {'turns':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'errors':>7} {'rss MB':>8}", file=sys.stderr)
+        for users in user_counts:
+            row = run_level(users, args, url)
+            rows.append(row)
+            turn = row["turn"]
+            print(f"{users:>6} {row['turns']:>6} {row['throughput_rps']:>7.2f} "
+                  f"{turn.get('p50_ms', 0):>9.0f} {turn.get('p95_ms', 0):>9.0f} "
+                  f"{turn.get('p99_ms', 0):>9.0f} {row['error_rate']:>7.1%} "
+                  f"{row['rss_peak_mb']:>8.1f}", file=sys.stderr)
+            if _breaks(row, args):
+                breaking_point = users
+                if not args.no_stop:
+                    break
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    return {"levels": rows, "breaking_point_users": breaking_point}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest",
+                                     description="Concurrent-user load test against a mock Gemini.")
+    parser.add_argument("--users", default="1,5,10,25",
+                        help="comma-separated simulated user counts, run in order")
+    parser.add_argument("--turns", type=int, default=5, help="questions per user")
+    parser.add_argument("--think", type=float, default=1.0,
+                        help="mean seconds between a reply and the next question")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which users arrive")
+    parser.add_argument("--poll", type=float, default=0.3, help="seconds between reruns while waiting")
+    parser.add_argument("--turn-timeout", type=float, default=120.0)
+    parser.add_argument("--pill-rate", type=float, default=0.25,
+                        help="share of questions asked by clicking a suggestion")
+    parser.add_argument("--switch-rate", type=float, default=0.2,
+                        help="chance of opening a new / older chat before a question")
+    parser.add_argument("--slo-p95", type=float, default=10.0,
+                        help="turn p95 (seconds) above which a level counts as failing")
+    parser.add_argument("--max-error-rate", type=float, default=0.05)
+    parser.add_argument("--no-stop", action="store_true",
+                        help="keep scaling past the first failing level")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/loadtest-<time>.json)")
+    mock_gemini.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    user_counts = [int(n) for n in args.users.split(",") if n.strip()]
+    started = datetime.datetime.now()
+    results = run(args, user_counts)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": started.isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "results": {"loadtest": results},
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"loadtest-{started:%Y%m%d-%H%M%S}-{report['meta']['commit']}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if results["breaking_point_users"] is not None:
+        print(f"[LOADTEST] first failing level: {results['breaking_point_users']} users", file=sys.stderr)
+    print(f"[LOADTEST] results written to {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
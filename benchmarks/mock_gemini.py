@@ -0,0 +1,307 @@
+# benchmarks/mock_gemini.py
+#
+# Local HTTP stand-in for the Gemini REST API, for load tests. Speaks just
+# enough of v1beta for backend.gemini_client over the SDK's REST transport:
+#
+#   python -m benchmarks.mock_gemini --port 8765 --latency lognormal:0.8,0.5
+#   GEMINI_API_ENDPOINT=http://127.0.0.1:8765 GEMINI_TRANSPORT=rest streamlit run app.py
+#
+# Does not import backend: it runs as its own process so it never competes
+# with the app under test for the GIL.
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks._timing import Latency, latency_spec
+
+_FILLER = (
+    "Start by restating the question in your own words, then list what you "
+    "already know and what is still unclear. "
+)
+
+_STATUS_NAMES = {
+    400: "INVALID_ARGUMENT",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+_LEVEL_RE = re.compile(r"selected AIAS level:\s*(\d)")
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    """
+    Answers generateContent / streamGenerateContent / countTokens with a
+    valid AIAS JSON reply of about ``reply_chars`` characters.
+
+    Every generation samples ``latency``; streaming spends ``ttfb_share``
+    of it before the first chunk and spreads the rest over the others.
+    ``error_rate`` of calls fail with one of ``error_codes`` (after the
+    time-to-first-byte); ``disconnect_rate`` of streams are cut off
+    halfway, after text was already sent. ``/stats`` reports counters.
+    """
+
+    daemon_threads = True
+
+    def __init__(self,
+                 address: tuple,
+                 latency: Latency = Latency(),
+                 error_rate: float = 0.0,
+                 error_codes: Sequence[int] = (503,),
+                 disconnect_rate: float = 0.0,
+                 reply_chars: int = 800,
+                 chunk_chars: int = 40,
+                 ttfb_share: float = 0.3,
+                 seed: Optional[int] = None) -> None:
+        super().__init__(address, _MockGeminiHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.disconnect_rate = disconnect_rate
+        self.reply_chars = reply_chars
+        self.chunk_chars = chunk_chars
+        self.ttfb_share = ttfb_share
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats: Dict[str, int] = {
+            "calls": 0, "streams": 0, "errors": 0, "disconnects": 0,
+            "count_tokens": 0, "peak_in_flight": 0,
+        }
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self, stream: bool) -> tuple:
+        """(delay, error code or None, disconnect?) for one call."""
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["streams"] += stream
+            delay = self.latency.sample(self._rng)
+            code = None
+            if self._rng.random() < self.error_rate:
+                code = self._rng.choice(self.error_codes)
+                self._stats["errors"] += 1
+            disconnect = stream and code is None and self._rng.random() < self.disconnect_rate
+            self._stats["disconnects"] += disconnect
+        return delay, code, disconnect
+
+    def enter(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+            self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+
+    def leave(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "in_flight": self._in_flight}
+
+    def reply_text(self, request: Dict[str, Any]) -> str:
+        """The JSON document the model is asked for (see AiasReplySchema)."""
+        instruction = _request_text(request.get("systemInstruction") or request.get("system_instruction"))
+        match = _LEVEL_RE.search(instruction)
+        body = (_FILLER * (self.reply_chars // len(_FILLER) + 1))[:self.reply_chars]
+        return json.dumps({
+            "requested_level": int(match.group(1)) if match else 1,
+            "is_within_selected_level": True,
+            "violation_reason": None,
+            "assistant_reply_md": body,
+        })
+
+
+def _request_text(content: Any) -> str:
+    """All text parts of a Content (or list of them) in a request body."""
+    if not content:
+        return ""
+    if isinstance(content, list):
+        return "\n".join(_request_text(c) for c in content)
+    return "\n".join(p.get("text", "") for p in content.get("parts", []))
+
+
+def _response(text: str, prompt_tokens: int = 0, output_tokens: int = 0,
+              final: bool = True) -> Dict[str, Any]:
+    candidate: Dict[str, Any] = {
+        "content": {"parts": [{"text": text}], "role": "model"},
+        "index": 0,
+    }
+    body: Dict[str, Any] = {"candidates": [candidate]}
+    if final:
+        candidate["finishReason"] = "STOP"
+        body["usageMetadata"] = {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        }
+    return body
+
+
+class _MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+    server: MockGeminiServer
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/stats":
+            self._send_error(404, "not found")
+            return
+        self._send_json(200, self.server.stats())
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_error(400, "invalid JSON body")
+            return
+
+        method = self.path.split("?")[0].rsplit(":", 1)[-1]
+        if method == "countTokens":
+            self.server.count("count_tokens")
+            tokens = len(_request_text(request.get("contents"))) // 4
+            self._send_json(200, {"totalTokens": tokens})
+        elif method in ("generateContent", "streamGenerateContent"):
+            self.server.enter()
+            try:
+                self._generate(request, stream=method == "streamGenerateContent")
+            finally:
+                self.server.leave()
+        else:
+            self._send_error(404, f"unsupported method {method!r}")
+
+    def _generate(self, request: Dict[str, Any], stream: bool) -> None:
+        server = self.server
+        delay, code, disconnect = server.draw(stream)
+        ttfb = delay * server.ttfb_share if stream else delay
+        time.sleep(ttfb)
+
+        if code is not None:
+            self._send_error(code, "injected failure")
+            return
+
+        text = server.reply_text(request)
+        prompt_tokens = len(_request_text(request.get("contents"))) // 4
+        output_tokens = len(text) // 4
+
+        if not stream:
+            self._send_json(200, _response(text, prompt_tokens, output_tokens))
+            return
+
+        # REST streaming: one JSON array, written element by element
+        pieces = [text[i:i + server.chunk_chars] for i in range(0, len(text), server.chunk_chars)]
+        gap = (delay - ttfb) / max(len(pieces) - 1, 1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(gap)
+            if disconnect and i == len(pieces) // 2:
+                self.close_connection = True
+                return   # no terminating chunk: the client sees a broken stream
+            final = i == len(pieces) - 1
+            element = json.dumps(_response(piece, prompt_tokens, output_tokens, final))
+            self._write_chunk(("[" if i == 0 else ",\n") + element + ("]" if final else ""))
+        self._write_chunk("")
+
+    def _write_chunk(self, data: str) -> None:
+        raw = data.encode("utf-8")
+        self.wfile.write(f"{len(raw):X}\r\n".encode("ascii") + raw + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": {
+            "code": status,
+            "message": message,
+            "status": _STATUS_NAMES.get(status, "UNKNOWN"),
+        }})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass   # one line per request would drown the load-test output
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Server options, shared with benchmarks.loadtest."""
+    parser.add_argument("--latency", type=latency_spec, default="lognormal:0.8,0.5",
+                        help="upstream latency, e.g. constant:0.2, uniform:0.1,0.05, lognormal:0.8,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of calls answered with an error status")
+    parser.add_argument("--error-codes", default="503",
+                        help="comma-separated statuses to inject, e.g. 503,429")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0,
+                        help="share of streams cut off after the first half")
+    parser.add_argument("--reply-chars", type=int, default=800)
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1234)
+
+
+def server_argv(args: argparse.Namespace) -> List[str]:
+    """``add_arguments`` options back as a command line."""
+    return [
+        "--latency", args.latency,
+        "--error-rate", str(args.error_rate),
+        "--error-codes", args.error_codes,
+        "--disconnect-rate", str(args.disconnect_rate),
+        "--reply-chars", str(args.reply_chars),
+        "--chunk-chars", str(args.chunk_chars),
+        "--seed", str(args.seed),
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.mock_gemini",
+                                     description="Local Gemini API stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 = any free port")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockGeminiServer(
+        (args.host, args.port),
+        latency=Latency.parse(args.latency),
+        error_rate=args.error_rate,
+        error_codes=[int(c) for c in args.error_codes.split(",") if c.strip()],
+        disconnect_rate=args.disconnect_rate,
+        reply_chars=args.reply_chars,
+        chunk_chars=args.chunk_chars,
+        seed=args.seed,
+    )
+    # First stdout line: how benchmarks.loadtest finds the port
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
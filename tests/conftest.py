@@ -0,0 +1,19 @@
+# tests/conftest.py
+#
+# Unit tests for the backend. Nothing here talks to Gemini.
+#
+#   python -m pytest -q
+
+import os
+import tempfile
+
+# backend.config reads these at import time, so they must be set before any
+# backend module is imported. Real values from the environment still win.
+os.environ.setdefault("GEMINI_API_KEY", "test-fake-key")
+os.environ.setdefault("GEMINI_WARMUP", "0")
+os.environ.setdefault("GEMINI_CONTEXT_CACHE", "0")
+os.environ.setdefault("PREWARM_SUGGESTIONS", "0")
+os.environ.setdefault("METRICS_LOG", "0")
+os.environ.setdefault(
+    "SESSION_DB_PATH", os.path.join(tempfile.gettempdir(), "legitai_test_sessions.db")
+)
@@ -0,0 +1,72 @@
+# tests/test_batch.py
+
+import json
+
+import pytest
+
+from backend import batch
+from backend.batch import _validate, read_records
+from backend.gemini_client import AiasLLMResponse, TokenUsage
+
+
+def _records(tmp_path, text):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text(text, encoding="utf-8")
+    return list(read_records(str(path)))
+
+
+def test_ids_default_to_the_line_number(tmp_path):
+    records = _records(tmp_path, '{"level": 1, "message": "hi"}\n\n{"id": "q2", "level": 2, "message": "yo"}\n')
+    assert [r["id"] for r in records] == ["1", "q2"]
+    assert all(r["history"] == [] and _validate(r) is None for r in records)
+
+
+def test_malformed_lines_are_reported_with_their_line_number(tmp_path):
+    records = _records(tmp_path, '{"level": 1,\n[1, 2]\n"text"\n42\nnull\n{"level": 1, "message": "ok"}\n')
+    assert [r["id"] for r in records] == ["1", "2", "3", "4", "5", "6"]
+    assert records[0]["error"].startswith("invalid JSON")
+    assert all(_validate(r) == "line must be a JSON object" for r in records[1:5])
+    assert _validate(records[5]) is None
+
+
+@pytest.mark.parametrize("history", [
+    ["x"],
+    [None],
+    [{"role": "user"}],
+    [{"role": "user", "content": ["not", "text"]}],
+    {"role": "user", "content": "not a list"},
+])
+def test_history_entries_must_be_role_content_objects(history):
+    record = {"id": "1", "level": 2, "message": "hi", "history": history}
+    assert _validate(record) == "history must be a list of {role, content} objects"
+
+
+def _answer(level, message, history, **kwargs):
+    return AiasLLMResponse(
+        requested_level=level, is_within_selected_level=True, violation_reason=None,
+        assistant_reply_md="ok", usage=TokenUsage(prompt_tokens=10, output_tokens=5),
+    )
+
+
+async def _answer_async(*args, **kwargs):
+    return _answer(*args, **kwargs)
+
+
+@pytest.mark.parametrize("mode", ["thread", "async"])
+def test_bad_records_become_error_rows_without_stopping_the_run(tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(batch, "generate_aias_response", _answer)
+    monkeypatch.setattr(batch, "generate_aias_response_async", _answer_async)
+    corpus = tmp_path / "prompts.jsonl"
+    corpus.write_text(
+        '{"id": "good", "level": 2, "message": "hi"}\n'
+        '{"id": "bad", "level": 2, "message": "hi", "history": ["x"]}\n'
+        '{"id": "also-good", "level": 3, "message": "hey", "history": [{"role": "user", "content": "a"}]}\n',
+        encoding="utf-8",
+    )
+    output = tmp_path / "results.jsonl"
+
+    assert batch.main([str(corpus), "-o", str(output), "--mode", mode, "--tpm", "100000"]) == 1
+    rows = {row["id"]: row for row in map(json.loads, output.read_text(encoding="utf-8").splitlines())}
+    assert set(rows) == {"good", "bad", "also-good"}
+    assert rows["bad"]["error"] == "history must be a list of {role, content} objects"
+    assert rows["good"]["error"] is None and rows["good"]["output_tokens"] == 5
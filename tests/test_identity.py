@@ -0,0 +1,22 @@
+# tests/test_identity.py
+
+from backend.identity import USER_COOKIE, cookie_script, new_user_token, valid_user_token
+
+
+def test_new_tokens_are_long_random_and_valid():
+    tokens = {new_user_token() for _ in range(100)}
+    assert len(tokens) == 100
+    assert all(len(t) == 43 and valid_user_token(t) == t for t in tokens)
+
+
+def test_invalid_values_are_rejected():
+    for value in (None, "", "short", "x" * 200, "a b" * 20, "<script>" * 5, 12345, ["x" * 43],
+                  "2685de34-6f24-4572-949e-dd030dc78e31"):
+        assert valid_user_token(value) is None
+
+
+def test_cookie_script_sets_a_strict_cookie():
+    script = cookie_script("abc", secure=True)
+    assert f'"{USER_COOKIE}=abc;' in script
+    assert "SameSite=Strict" in script and "Secure" in script
+    assert "Secure" not in cookie_script("abc", secure=False)
@@ -0,0 +1,23 @@
+# tests/test_latency.py
+
+import argparse
+import random
+
+import pytest
+
+from benchmarks._timing import Latency, latency_spec
+
+
+@pytest.mark.parametrize("spec", ["constant:0.2", "uniform:0.1,0.05", "exponential:1", "lognormal:0.8,0.5"])
+def test_known_distributions_parse_and_sample(spec):
+    latency = Latency.parse(spec)
+    assert latency.sample(random.Random(1)) >= 0
+    assert latency_spec(spec) == spec
+
+
+@pytest.mark.parametrize("spec", ["fixed:0.2", "lognormal:x", "uniform:0.1,0.2,0.3", "constant:-1", ""])
+def test_bad_specs_are_rejected_up_front(spec):
+    with pytest.raises(ValueError):
+        Latency.parse(spec)
+    with pytest.raises(argparse.ArgumentTypeError):
+        latency_spec(spec)
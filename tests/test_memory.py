@@ -0,0 +1,122 @@
+# tests/test_memory.py
+
+import gc
+import os
+
+import pytest
+
+from backend.memory import MemoryGovernor, MessageRecord, message_bytes
+
+
+def _messages(count, size=1000, start=1):
+    return [
+        {"id": i, "role": "user" if i % 2 else "assistant", "content": "x" * size}
+        for i in range(start, start + count)
+    ]
+
+
+def _idle(*logs):
+    for log in logs:
+        log.last_active -= 3600
+
+
+@pytest.fixture
+def governor(tmp_path):
+    return MemoryGovernor(max_bytes=50_000, spill_dir=str(tmp_path), min_idle_seconds=60)
+
+
+def test_records_read_like_message_dicts():
+    record = MessageRecord(1, "assistant", "hi", {"is_within_selected_level": True})
+    assert record["role"] == "assistant" and record.get("meta") == {"is_within_selected_level": True}
+    assert record.to_dict() == {"id": 1, "role": "assistant", "content": "hi",
+                                "meta": {"is_within_selected_level": True}}
+    plain = MessageRecord(2, "user", "hello")
+    assert "meta" not in plain and plain.get("meta") is None
+    with pytest.raises(KeyError):
+        plain["meta"]
+    assert plain.role is MessageRecord(3, "user", "again").role    # interned
+    assert not hasattr(plain, "__dict__")
+
+
+def test_bytes_are_accounted_per_chat_and_user(governor):
+    a = governor.adopt("chat-a", "alice", _messages(5))
+    b = governor.adopt("chat-b", "bob", _messages(2))
+    record = governor.append(a, 6, "user", "one more")
+
+    expected_a = sum(message_bytes(r) for r in a)
+    assert governor.session_bytes("chat-a") == expected_a
+    assert governor.usage() == {"alice": expected_a, "bob": sum(message_bytes(r) for r in b)}
+    assert a[-1] is record
+
+    governor.discard(b)
+    assert governor.stats()["users"] == 1
+
+
+def test_idle_chats_spill_to_disk_and_come_back(governor, tmp_path):
+    old = governor.adopt("old", "alice", _messages(30))
+    _idle(old)
+    before = [r.to_dict() for r in old]
+
+    recent = governor.adopt("recent", "bob", _messages(30))
+    assert governor.is_spilled(old) and len(old) == 0
+    assert not governor.is_spilled(recent)
+    assert governor.stats()["bytes"] <= governor.max_bytes
+    assert len(os.listdir(tmp_path)) == 1
+
+    governor.load(old)
+    assert [r.to_dict() for r in old] == before
+    assert not governor.is_spilled(old)
+    assert os.listdir(tmp_path) == []
+    assert governor.stats()["reloads"] == 1
+
+
+def test_least_recently_active_chats_spill_first(governor):
+    logs = [governor.adopt(f"chat-{i}", "alice", _messages(15)) for i in range(3)]
+    for i, log in enumerate(logs):
+        log.last_active -= 3600 - i               # chat-0 is the oldest
+    governor.adopt("new", "bob", _messages(15))
+    assert governor.is_spilled(logs[0])
+    assert not governor.is_spilled(logs[2])
+
+
+def test_chats_in_use_are_never_spilled(governor):
+    busy = governor.adopt("busy", "alice", _messages(40))
+    more = governor.adopt("more", "bob", _messages(40))
+    assert not governor.is_spilled(busy) and not governor.is_spilled(more)
+    assert len(busy) == 40
+    assert governor.stats()["over_limit"] >= 1
+
+
+def test_appending_to_a_spilled_chat_reloads_it_first(governor):
+    log = governor.adopt("chat", "alice", _messages(30))
+    _idle(log)
+    governor.adopt("other", "bob", _messages(30))
+    assert governor.is_spilled(log)
+
+    governor.append(log, 31, "user", "back again")
+    assert [r.id for r in log] == list(range(1, 32))
+
+    governor.prepend(log, _messages(2, start=-1))
+    assert log[0].id == -1 and len(log) == 33
+
+
+def test_collected_logs_stop_counting_and_lose_their_spill_file(governor, tmp_path):
+    log = governor.adopt("chat", "alice", _messages(30))
+    _idle(log)
+    other = governor.adopt("other", "bob", _messages(30))
+    assert os.listdir(tmp_path)
+
+    del log
+    gc.collect()
+    assert governor.stats()["chats"] == 1
+    assert governor.usage() == {"bob": governor.session_bytes(other.chat_id)}
+    assert os.listdir(tmp_path) == []
+
+
+def test_disabled_governor_only_accounts(tmp_path):
+    governor = MemoryGovernor(max_bytes=1000, spill_dir=str(tmp_path), enabled=False)
+    log = governor.adopt("chat", "alice", _messages(10))
+    _idle(log)
+    governor.adopt("other", "bob", _messages(10))
+    assert not governor.is_spilled(log)
+    assert governor.stats()["bytes"] > 1000
@@ -0,0 +1,125 @@
+# tests/test_parsing.py
+
+import json
+
+import pytest
+
+from backend import gemini_client
+from backend.gemini_client import PARSE_ERROR_REASON, ReplyStreamExtractor
+from backend.parsing import parse_llm_json
+
+REPLY_KEY = '{"requested_level": 1, "assistant_reply_md": "'
+
+
+def _stream(*parts):
+    extractor = ReplyStreamExtractor()
+    return "".join(extractor.feed(part) for part in parts), extractor.done
+
+
+# STREAMED REPLY
+
+def test_reply_is_decoded_across_arbitrary_chunk_boundaries():
+    doc = json.dumps({"requested_level": 1, "assistant_reply_md": 'Tab\there, "quoted", é and 😀'})
+    for size in (1, 2, 3, 7):
+        text, done = _stream(*(doc[i:i + size] for i in range(0, len(doc), size)))
+        assert text == 'Tab\there, "quoted", é and 😀'
+        assert done
+
+
+def test_surrogate_pair_split_between_chunks():
+    assert _stream(REPLY_KEY + "a\\ud83d", "\\", "ude", "00b\"") == ("a😀b", True)
+
+
+@pytest.mark.parametrize("escaped", [
+    "a\\ud83d\\u0041b",     # high surrogate followed by an ordinary escape
+    "a\\ud83dAb",           # ... by plain text
+    "a\\ude00Ab",           # low surrogate on its own
+])
+def test_lone_surrogates_become_replacement_characters(escaped):
+    assert _stream(REPLY_KEY + escaped + '"') == ("a\ufffdAb", True)
+
+
+def test_lone_surrogate_at_the_end_of_the_reply():
+    assert _stream(REPLY_KEY + 'a\\ud83d"') == ("a\ufffd", True)
+
+
+def test_invalid_unicode_escape_is_shown_as_written():
+    assert _stream(REPLY_KEY + "see \\uZZ12", " here\"") == ("see \\uZZ12 here", True)
+    assert _stream(REPLY_KEY + "\\u+1a2\"") == ("\\u+1a2", True)
+
+
+# WHOLE DOCUMENTS
+
+DOC = {
+    "requested_level": 2,
+    "is_within_selected_level": True,
+    "violation_reason": None,
+    "assistant_reply_md": "Start with an outline.",
+}
+
+
+@pytest.mark.parametrize("raw,status", [
+    (json.dumps(DOC), "ok"),
+    ("```json\n" + json.dumps(DOC) + "\n```", "repaired"),
+    ("```\n" + json.dumps(DOC, indent=2) + "\n```", "repaired"),
+    ("Here you go:\n" + json.dumps(DOC) + "\nHope that helps!", "repaired"),
+])
+def test_complete_documents(raw, status):
+    assert parse_llm_json(raw) == (DOC, status)
+
+
+def test_truncated_inside_the_reply_keeps_what_arrived():
+    raw = json.dumps(DOC)[:-8]
+    result = parse_llm_json(raw)
+    assert result.status == "repaired"
+    assert result.data["assistant_reply_md"] == "Start with an ou"
+    assert result.data["requested_level"] == 2
+
+
+def test_truncated_after_a_member_drops_the_dangling_key():
+    raw = '{"requested_level": 2, "is_within_selected_level": true, "violation_'
+    assert parse_llm_json(raw) == (
+        {"requested_level": 2, "is_within_selected_level": True}, "repaired",
+    )
+
+
+@pytest.mark.parametrize("tail", ["\\", "\\u", "\\u00", "\\ud83d", "\\ud83d\\", "\\ud83d\\ude0"])
+def test_truncated_inside_an_escape(tail):
+    result = parse_llm_json('{"requested_level": 2, "assistant_reply_md": "smile ' + tail)
+    assert result.data == {"requested_level": 2, "assistant_reply_md": "smile "}
+
+
+def test_escaped_backslash_before_u_is_not_an_escape():
+    result = parse_llm_json('{"requested_level": 2, "assistant_reply_md": "C:\\\\u12')
+    assert result.data["assistant_reply_md"] == "C:\\u12"
+
+
+def test_complete_surrogate_pair_survives_truncation():
+    result = parse_llm_json('{"requested_level": 2, "assistant_reply_md": "smile \\ud83d\\ude00 and')
+    assert result.data["assistant_reply_md"] == "smile \U0001F600 and"
+
+
+@pytest.mark.parametrize("raw", [
+    '{"assistant_reply_md": "see \\uZZ12 here',
+    '"assistant_reply_md": "see \\uZZ12 here", "requested_level": 2',
+    '"violation_reason": "bad \\uZZ", "assistant_reply_md": "hi", "requested_level": 3',
+])
+def test_invalid_escapes_do_not_raise(raw):
+    result = parse_llm_json(raw)
+    assert result.status in ("partial", "failed")
+
+
+def test_fields_are_salvaged_from_unparseable_output():
+    raw = 'requested_level: "requested_level": 4, "assistant_reply_md": "Here is \\"the\\" draft'
+    result = parse_llm_json(raw)
+    assert result == ({"assistant_reply_md": 'Here is "the" draft', "requested_level": 4}, "partial")
+
+
+def test_unparseable_output_without_fields_fails():
+    assert parse_llm_json("Sorry, I can't help with that.") == ({}, "failed")
+
+
+def test_model_output_that_cannot_be_used_falls_back_to_the_safe_reply():
+    resp = gemini_client._parse_model_output("I refuse to answer in JSON \\uZZ12")
+    assert resp.violation_reason == PARSE_ERROR_REASON
+    assert not resp.is_within_selected_level
@@ -0,0 +1,91 @@
+# tests/test_policy.py
+
+import pytest
+
+from backend.policy import (
+    GENERATION_MIN_LEVEL,
+    Intent,
+    PolicyPrefilter,
+    classify_intent,
+)
+
+
+# (level, message): answered by Gemini, never refused locally
+ALLOWED = [
+    (1, "Create a complete revision timetable for my final assignment"),
+    (1, "Make me a study schedule for the whole term"),
+    (2, "Can you give me a complete outline for my essay?"),
+    (2, "Give me a full summary of the essay structure"),
+    (2, "Write a complete essay outline"),
+    (2, "Write a plan for my essay on climate change"),
+    (2, "Create flashcards for the whole chapter"),
+    (2, "Explain how to write a complete essay"),
+    (3, "Solve this step with me, I think my answer is wrong"),
+    (3, "Fix my code, then write the full function"),
+    (3, "Review my final report and check my structure"),
+    (3, "Produce feedback on my complete draft"),
+    # Level 4+ may generate
+    (4, "Write the full essay for me"),
+    (5, "Generate the entire code for my app from scratch"),
+]
+
+# (level, message): clear out-of-level generation, refused without a call
+REFUSED = [
+    (1, "Can you write my complete assignment?"),
+    (2, "Please build a complete website for my project"),
+    (2, "Write a complete solution"),
+    (3, "Write the full essay for me"),
+    (3, "Generate the entire code for my app from scratch"),
+    (3, "write the whole program for the assignment"),
+]
+
+
+@pytest.mark.parametrize("level, message", ALLOWED)
+def test_allowed_requests_reach_the_model(level, message):
+    assert PolicyPrefilter(threshold=0.9).check(level, message) is None
+
+
+@pytest.mark.parametrize("level, message", REFUSED)
+def test_out_of_level_generation_is_refused(level, message):
+    resp = PolicyPrefilter(threshold=0.9).check(level, message)
+    assert resp is not None
+    assert resp.is_within_selected_level is False
+    assert resp.requested_level == GENERATION_MIN_LEVEL
+
+
+@pytest.mark.parametrize("message", [
+    "Create a complete revision timetable for my final assignment",
+    "Give me a full summary of the essay structure",
+    "Can you give me a complete outline for my essay?",
+])
+def test_artifact_outside_the_verb_object_is_not_generation(message):
+    assert classify_intent(message).intent is not Intent.GENERATION
+
+
+def test_allowed_noun_after_artifact_is_not_generation():
+    assert classify_intent("Write an essay outline").intent is Intent.UNCLEAR
+
+
+def test_explanation_wins():
+    assert classify_intent("Explain the code and then write the full program").intent is Intent.EXPLANATION
+
+
+def test_scope_word_raises_confidence_only_inside_the_object():
+    plain = classify_intent("Write my essay").confidence
+    scoped = classify_intent("Write my complete essay").confidence
+    outside = classify_intent("Write my essay for the final deadline").confidence
+    assert scoped > plain
+    assert outside == plain
+
+
+def test_disabled_prefilter_never_refuses():
+    assert PolicyPrefilter(enabled=False).check(1, "Write the full essay for me") is None
+
+
+def test_stats_count_short_circuits():
+    prefilter = PolicyPrefilter()
+    prefilter.check(1, "Write the full essay for me")
+    prefilter.check(1, "Give me a study plan")
+    stats = prefilter.stats()
+    assert stats["checked"] == 2
+    assert stats["short_circuited"] == 1
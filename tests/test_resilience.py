@@ -0,0 +1,186 @@
+# tests/test_resilience.py
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from backend import gemini_client
+from backend.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, is_retryable
+from backend.scheduler import RequestCancelled
+
+
+# CIRCUIT BREAKER
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_lets_exactly_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()        # the trial
+    assert not breaker.allow()    # everyone else waits for its outcome
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    breaker._opened_at -= 60      # reset window elapsed
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_released_trial_can_be_retried():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release_trial()
+    assert breaker.allow()
+
+
+# RETRIES
+
+def test_retry_delays_are_bounded_and_counted():
+    delays = list(RetryPolicy(max_retries=4, base_delay=0.5, max_delay=1.0).delays())
+    assert len(delays) == 4
+    assert all(0 <= d <= 1.0 for d in delays)
+
+
+def test_is_retryable():
+    assert is_retryable(TimeoutError())
+    assert is_retryable(ConnectionResetError())
+    assert not is_retryable(ValueError())
+
+
+@pytest.fixture
+def fresh_client_state(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    monkeypatch.setattr(gemini_client, "circuit_breaker", breaker)
+    monkeypatch.setattr(gemini_client, "retry_policy", RetryPolicy(max_retries=2, base_delay=0))
+    monkeypatch.setattr(gemini_client, "GEMINI_FALLBACK_MODEL", None)
+    return breaker
+
+
+def test_transient_errors_are_retried(fresh_client_state):
+    calls = []
+
+    def attempt(model_name, timeout):
+        calls.append(model_name)
+        if len(calls) < 2:
+            raise TimeoutError("slow")
+        return "ok"
+
+    fresh_client_state.failure_threshold = 3
+    assert gemini_client._with_retries(attempt) == (gemini_client.GEMINI_MODEL, "ok")
+    assert len(calls) == 2
+
+
+def test_non_transient_errors_are_not_retried(fresh_client_state):
+    calls = []
+
+    def attempt(model_name, timeout):
+        calls.append(model_name)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        gemini_client._with_retries(attempt)
+    assert len(calls) == 1
+
+
+def test_cancel_during_a_retry_backoff_stops_retrying(fresh_client_state, monkeypatch):
+    monkeypatch.setattr(gemini_client, "retry_policy", RetryPolicy(max_retries=3, base_delay=5, max_delay=5))
+    fresh_client_state.failure_threshold = 5
+    cancel = threading.Event()
+    calls = []
+
+    def attempt(model_name, timeout):
+        calls.append(model_name)
+        cancel.set()                              # e.g. the student switched chats
+        raise TimeoutError("slow")
+
+    started = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        gemini_client._with_retries(attempt, cancel_event=cancel)
+    assert len(calls) == 1
+    assert time.monotonic() - started < 1
+
+
+def test_open_breaker_rejects_without_calling(fresh_client_state):
+    fresh_client_state.reset_timeout = 60
+    fresh_client_state.record_failure()
+    with pytest.raises(CircuitOpenError):
+        gemini_client._with_retries(lambda model_name, timeout: pytest.fail("called"))
+
+
+# STREAMS
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StreamingModel:
+    def generate_content(self, prompt, stream=False, request_options=None):
+        doc = json.dumps({
+            "requested_level": 1, "is_within_selected_level": True,
+            "violation_reason": None, "assistant_reply_md": "a reply long enough to arrive in pieces",
+        })
+        return iter([_Chunk(doc[i:i + 10]) for i in range(0, len(doc), 10)])
+
+
+def test_closed_trial_stream_releases_the_half_open_trial(fresh_client_state, monkeypatch):
+    monkeypatch.setattr(gemini_client, "get_model", lambda *a, **k: _StreamingModel())
+    fresh_client_state.record_failure()               # open; reset_timeout=0 → half-open
+
+    stream = gemini_client.stream_aias_model("hello")
+    next(stream)                                      # this stream is the trial
+    assert not fresh_client_state.allow()
+    stream.close()                                    # e.g. the student switched chats
+
+    assert fresh_client_state.allow()                 # the next request gets to try
+
+
+def test_finished_stream_closes_the_breaker(fresh_client_state, monkeypatch):
+    monkeypatch.setattr(gemini_client, "get_model", lambda *a, **k: _StreamingModel())
+    fresh_client_state.record_failure()
+
+    chunks = []
+    stream = gemini_client.stream_aias_model("hello")
+    with pytest.raises(StopIteration) as stop:
+        while True:
+            chunks.append(next(stream))
+    assert "".join(chunks) == stop.value.value.assistant_reply_md
+    assert fresh_client_state.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_async_trial_releases_the_half_open_trial(fresh_client_state, monkeypatch):
+    class SlowModel:
+        async def generate_content_async(self, prompt, request_options=None):
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(gemini_client, "get_model", lambda *a, **k: SlowModel())
+    fresh_client_state.record_failure()
+
+    async def run():
+        task = asyncio.ensure_future(gemini_client._generate_with_resilience_async("hello", None))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert fresh_client_state.allow()
@@ -0,0 +1,32 @@
+# tests/test_router.py
+
+import pytest
+
+from backend.router import main
+
+TIERS = "lite=gemini-2.0-flash-lite@0.075/0.30,full=gemini-2.0-flash@0.10/0.40"
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text('{"level": 2, "message": "what is recursion?"}\n', encoding="utf-8")
+    return str(path)
+
+
+def test_threshold_sets_are_replayed(corpus, capsys):
+    assert main(["--jsonl", corpus, "--tiers", TIERS, "--thresholds", "0.25", "--thresholds", "0.45"]) == 0
+    out = capsys.readouterr().out
+    assert "[0.25]" in out and "[0.45]" in out
+
+
+@pytest.mark.parametrize("argv", [
+    ["--tiers", "full=gemini-2.0-flash", "--thresholds", "0.35"],
+    ["--tiers", TIERS, "--thresholds", "0.2,0.4"],
+    ["--tiers", TIERS, "--thresholds", "high"],
+])
+def test_mismatched_thresholds_are_a_usage_error(corpus, capsys, argv):
+    with pytest.raises(SystemExit) as exit_:
+        main(["--jsonl", corpus, *argv])
+    assert exit_.value.code == 2
+    assert "error:" in capsys.readouterr().err
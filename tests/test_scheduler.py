@@ -0,0 +1,125 @@
+# tests/test_scheduler.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.scheduler import Priority, RequestCancelled, RequestScheduler
+
+
+def _scheduler(**kwargs):
+    # 10 requests/s with room for one at a time: admissions 0.1s apart
+    return RequestScheduler(rpm=600, burst_seconds=0.1, **kwargs)
+
+
+def _wait_queued(scheduler, count):
+    deadline = time.monotonic() + 2
+    while sum(scheduler.queued().values()) < count:
+        assert time.monotonic() < deadline, "ticket never queued"
+        time.sleep(0.005)
+
+
+def _acquire_in_thread(scheduler, order, user_id, priority):
+    def run():
+        scheduler.acquire(user_id, priority)
+        order.append((user_id, priority))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_without_quota_it_is_a_pass_through():
+    scheduler = RequestScheduler()
+    assert not scheduler.enabled
+    for _ in range(100):
+        assert scheduler.acquire("u").waited == 0
+    assert scheduler.stats()["admitted"] == 100
+
+
+def test_interactive_requests_overtake_queued_batch_work():
+    scheduler = _scheduler()
+    scheduler.requests.debit(3)                    # empty for ~0.4s
+    order = []
+    threads = [_acquire_in_thread(scheduler, order, "batch", Priority.BATCH)]
+    _wait_queued(scheduler, 1)
+    threads.append(_acquire_in_thread(scheduler, order, "student", Priority.INTERACTIVE))
+    for thread in threads:
+        thread.join(5)
+    assert order == [("student", Priority.INTERACTIVE), ("batch", Priority.BATCH)]
+
+
+def test_users_in_a_lane_take_turns():
+    scheduler = _scheduler()
+    scheduler.requests.debit(3)
+    order = []
+    threads = []
+    for user_id in ("a", "a", "a", "b"):
+        threads.append(_acquire_in_thread(scheduler, order, user_id, Priority.INTERACTIVE))
+        _wait_queued(scheduler, len(threads))
+    for thread in threads:
+        thread.join(5)
+    assert [user_id for user_id, _ in order] == ["a", "b", "a", "a"]
+
+
+def test_queue_positions_are_reported():
+    scheduler = _scheduler()
+    scheduler.requests.debit(3)
+    blocker = _acquire_in_thread(scheduler, [], "a", Priority.INTERACTIVE)
+    _wait_queued(scheduler, 1)
+    positions = []
+    scheduler.acquire("b", on_position=positions.append)
+    blocker.join(5)
+    assert positions[0] == 1 and positions[-1] == 0
+
+
+def test_waiting_past_the_timeout_fails_and_leaves_the_queue():
+    scheduler = _scheduler()
+    scheduler.requests.debit(10)
+    with pytest.raises(TimeoutError):
+        scheduler.acquire("u", timeout=0.05)
+    assert scheduler.queued()["interactive"] == 0
+    assert scheduler.stats()["timed_out"] == 1
+
+
+def test_cancel_event_removes_a_queued_request():
+    scheduler = _scheduler()
+    scheduler.requests.debit(10)
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    with pytest.raises(RequestCancelled):
+        scheduler.acquire("u", cancel_event=cancel)
+    assert scheduler.queued()["interactive"] == 0
+    assert scheduler.stats()["cancelled"] == 1
+
+
+def test_settle_corrects_the_token_reservation():
+    scheduler = RequestScheduler(tpm=60_000)      # 1000 tokens of burst
+    ticket = scheduler.acquire("u", tokens=800)
+    assert scheduler.tokens.available == pytest.approx(200, abs=5)
+    scheduler.settle(ticket, 100)
+    assert scheduler.tokens.available == pytest.approx(900, abs=5)
+    ticket = scheduler.acquire("u", tokens=100)
+    scheduler.settle(ticket, 1000)
+    assert scheduler.tokens.available < 0
+
+
+def test_async_acquire_respects_priority():
+    scheduler = _scheduler()
+    scheduler.requests.debit(3)
+
+    async def run():
+        order = []
+
+        async def take(user_id, priority):
+            await scheduler.acquire_async(user_id, priority)
+            order.append(user_id)
+
+        batch = asyncio.ensure_future(take("batch", Priority.BATCH))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(take("student", Priority.INTERACTIVE), batch)
+        return order
+
+    assert asyncio.run(run()) == ["student", "batch"]
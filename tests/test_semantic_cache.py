@@ -0,0 +1,97 @@
+# tests/test_semantic_cache.py
+
+import json
+
+import pytest
+
+from backend.config import SEMANTIC_CACHE_THRESHOLD
+from backend.policy import classify_intent
+from backend import semantic_cache
+from backend.semantic_cache import SemanticCache, evaluate_pairs, make_scope
+
+# (a, b, one answer serves both)
+PAIRS = [
+    ("explain recursion simply", "can you explain recursion simply?", True),
+    ("what is recursion?", "what's recursion", True),
+    ("explain how recursion works", "explain how recursion works please", True),
+    ("how does binary search work?", "how does a binary search work", True),
+    ("What is a linked list?", "what's a linked list", True),
+    ("explain big O notation", "explain big-O notation simply", True),
+    ("what is photosynthesis?", "what is photosynthesis, simply?", True),
+    ("how do I write a thesis statement?", "how do you write a thesis statement", True),
+    ("what is recursion?", "what is iteration?", False),
+    ("explain recursion", "explain tail recursion", False),
+    ("how does binary search work?", "how does bubble sort work?", False),
+    ("what is a linked list?", "what is a hash map?", False),
+    ("explain big O notation", "explain big O notation for recursion", False),
+    ("what is photosynthesis?", "what is cellular respiration?", False),
+    ("explain the causes of world war 1", "explain the causes of world war 2", False),
+    ("how do I write a thesis statement?", "how do I write a conclusion?", False),
+]
+
+
+def _scope(message, level=2, history=()):
+    return make_scope("gemini", level, classify_intent(message).intent.value, list(history))
+
+
+def _cached(cache, first, second, level=2, second_level=None, history=()):
+    cache.add(cache.query(_scope(first, level), first), "key")
+    return cache.lookup(cache.query(_scope(second, second_level or level, history), second))
+
+
+def test_labelled_pairs_at_the_default_threshold(tmp_path):
+    path = tmp_path / "pairs.jsonl"
+    path.write_text("".join(
+        json.dumps({"a": a, "b": b, "same": same}) + "\n" for a, b, same in PAIRS
+    ), encoding="utf-8")
+
+    [row] = evaluate_pairs(str(path), [SEMANTIC_CACHE_THRESHOLD])
+    assert row["hit_rate"] == 1.0
+    assert row["false_hit_rate"] == 0.0
+
+
+def test_idf_is_fitted_on_both_sides_of_every_pair(tmp_path, monkeypatch):
+    fitted = []
+    refit = SemanticCache._refit
+
+    def spy(cache):
+        fitted.append(cache.stats()["entries"])
+        refit(cache)
+
+    monkeypatch.setattr(semantic_cache.SemanticCache, "_refit", spy)
+    path = tmp_path / "pairs.jsonl"
+    path.write_text(json.dumps({"a": "what is recursion?", "b": "what is iteration?", "same": False}),
+                    encoding="utf-8")
+    evaluate_pairs(str(path), [0.9])
+    assert fitted[-1] == 2
+
+
+@pytest.mark.parametrize("first,second", [(a, b) for a, b, same in PAIRS if same])
+def test_paraphrases_hit(first, second):
+    assert _cached(SemanticCache(), first, second) == "key"
+
+
+@pytest.mark.parametrize("first,second", [(a, b) for a, b, same in PAIRS if not same])
+def test_different_questions_miss(first, second):
+    assert _cached(SemanticCache(), first, second) is None
+
+
+def test_different_intents_never_match():
+    # Same topic, but an explanation request vs a plain question
+    assert classify_intent("explain recursion simply").intent != \
+        classify_intent("what is recursion, conceptually").intent
+    assert _cached(SemanticCache(), "explain recursion simply", "what is recursion, conceptually") is None
+
+
+def test_level_and_history_are_part_of_the_scope():
+    question = "what is recursion?"
+    assert _cached(SemanticCache(), question, question, level=2, second_level=3) is None
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    assert _cached(SemanticCache(), question, question, history=history) is None
+
+
+def test_long_or_multiline_messages_are_not_indexed():
+    cache = SemanticCache(max_chars=50)
+    assert cache.query("s", "fix this:\nprint(x)") is None
+    assert cache.query("s", "x" * 51) is None
+    assert cache.query("s", "what is it?") is None     # nothing but stopwords
@@ -0,0 +1,256 @@
+# tests/test_singleflight.py
+
+import queue
+import threading
+import time
+
+import pytest
+
+from backend.singleflight import FollowerCancelled, LeaderAbandoned, SingleFlight
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+class Upstream:
+    """A streaming call whose chunks are released one by one by the test."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.release = queue.Queue()
+        self.calls = 0
+        self.closed = False
+        self.finished = False
+
+    def __call__(self):
+        self.calls += 1
+        try:
+            for chunk in self.chunks:
+                self.release.get(timeout=5)
+                yield chunk
+        except GeneratorExit:
+            self.closed = True
+            raise
+        self.finished = True
+        return {"reply": "".join(self.chunks)}
+
+    def send(self, count=1):
+        for _ in range(count):
+            self.release.put(None)
+
+
+def _follower(flight, key, upstream, out):
+    def run():
+        gen = flight.stream(key, upstream)
+        try:
+            while True:
+                out["chunks"].append(next(gen))
+        except StopIteration as stop:
+            out["result"] = stop.value
+        except BaseException as e:
+            out["error"] = e
+
+    out.setdefault("chunks", [])
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+# PLAIN CALLS
+
+def test_concurrent_calls_share_one_result_copy():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"answer": 42}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", fn))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    _wait_for(lambda: flight.stats()["coalesced"] == 3)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    values = [value for value, _ in results]
+    assert all(v == {"answer": 42} for v in values)
+    assert len({id(v) for v in values}) == 4      # everyone got their own copy
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    _wait_for(lambda: flight.stats()["coalesced"] == 1)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(errors) == 2
+
+
+def test_callers_past_max_waiters_make_their_own_call():
+    flight = SingleFlight(max_waiters=0)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 1
+
+    leader = threading.Thread(target=flight.do, args=("k", fn))
+    leader.start()
+    started.wait(5)
+    release.set()
+    assert flight.do("k", fn) == (1, False)
+    leader.join(5)
+    assert len(calls) == 2
+    assert flight.stats()["overflow"] == 1
+
+
+def test_a_follower_takes_over_from_an_abandoned_leader():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        raise LeaderAbandoned("cancelled while queued")
+
+    leader = threading.Thread(target=lambda: pytest.raises(LeaderAbandoned, flight.do, "k", leader_fn))
+    leader.start()
+    started.wait(5)
+    results = []
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", lambda: "own")))
+    follower.start()
+    _wait_for(lambda: flight.stats()["coalesced"] == 1)
+    release.set()
+    for t in (leader, follower):
+        t.join(5)
+    assert results == [("own", False)]
+    assert flight.stats()["takeovers"] == 1
+
+
+# STREAMS
+
+def test_followers_replay_and_follow_the_stream():
+    flight = SingleFlight()
+    upstream = Upstream(["a", "b", "c"])
+    leader, follower = {}, {}
+    lead = _follower(flight, "k", upstream, leader)
+    upstream.send()
+    _wait_for(lambda: leader["chunks"] == ["a"])
+    follow = _follower(flight, "k", upstream, follower)
+    _wait_for(lambda: follower["chunks"] == ["a"])
+    upstream.send(2)
+    for t in (lead, follow):
+        t.join(5)
+
+    assert upstream.calls == 1
+    assert follower["chunks"] == ["a", "b", "c"]
+    assert leader["result"] == ({"reply": "abc"}, False)
+    assert follower["result"] == ({"reply": "abc"}, True)
+
+
+def test_closing_the_leader_mid_stream_keeps_it_going_for_followers():
+    flight = SingleFlight()
+    upstream = Upstream(["a", "b", "c"])
+    lead = flight.stream("k", upstream)
+    upstream.send()
+    assert next(lead) == "a"
+
+    follower = {}
+    follow = _follower(flight, "k", upstream, follower)
+    _wait_for(lambda: follower["chunks"] == ["a"])
+
+    lead.close()                                  # the leader's reader went away
+    upstream.send(2)
+    follow.join(5)
+
+    assert "error" not in follower
+    assert follower["chunks"] == ["a", "b", "c"]
+    assert follower["result"] == ({"reply": "abc"}, True)
+    assert upstream.finished and not upstream.closed
+    assert flight.stats()["handoffs"] == 1
+
+
+def test_closing_the_leader_without_followers_abandons_upstream():
+    flight = SingleFlight()
+    upstream = Upstream(["a", "b"])
+    lead = flight.stream("k", upstream)
+    upstream.send()
+    next(lead)
+    lead.close()
+    assert upstream.closed
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_upstream_is_abandoned_once_the_last_follower_leaves():
+    flight = SingleFlight()
+    upstream = Upstream(["a", "b", "c"])
+    lead = flight.stream("k", upstream)
+    upstream.send()
+    next(lead)
+    follow = flight.stream("k", upstream)
+    assert next(follow) == "a"
+
+    lead.close()
+    follow.close()
+    upstream.send()                               # the drain notices at its next chunk
+    _wait_for(lambda: upstream.closed)
+    assert not upstream.finished
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_follower_stops_waiting_for_the_next_chunk():
+    flight = SingleFlight()
+    upstream = Upstream(["a", "b"])
+    lead = flight.stream("k", upstream)
+    upstream.send()
+    next(lead)
+
+    cancel = threading.Event()
+    follow = flight.stream("k", upstream, cancel_event=cancel)
+    assert next(follow) == "a"
+    threading.Timer(0.05, cancel.set).start()
+    started = time.monotonic()
+    with pytest.raises(FollowerCancelled):
+        next(follow)                              # upstream never sends "b"
+    assert time.monotonic() - started < 1
+
+    lead.close()                                  # the follower detached: nobody is left
+    assert upstream.closed
@@ -0,0 +1,175 @@
+# tests/test_worker.py
+
+import threading
+
+import pytest
+
+from backend.scheduler import RequestCancelled, RequestScheduler
+from backend.singleflight import FollowerCancelled, SingleFlight
+from backend.worker import GenerationHandle, GenerationPool
+
+
+@pytest.fixture
+def pool():
+    pool = GenerationPool(max_workers=2)
+    yield pool
+    pool.shutdown()
+
+
+class GatedJob:
+    """Yields ``chunks`` one at a time as the test opens the gate."""
+
+    def __init__(self, chunks=("a", "b", "c"), result="done"):
+        self.chunks = chunks
+        self.result = result
+        self.gate = threading.Semaphore(0)
+        self.started = threading.Event()
+        self.closed = threading.Event()
+
+    def __call__(self, handle):
+        self.started.set()
+        try:
+            for chunk in self.chunks:
+                self.gate.acquire(timeout=5)
+                yield chunk
+        except GeneratorExit:
+            self.closed.set()
+            raise
+        return self.result
+
+    def release(self, count=1):
+        for _ in range(count):
+            self.gate.release()
+
+
+def test_a_finished_reply_is_claimed_exactly_once(pool):
+    job = GatedJob()
+    handle = pool.submit("chat", job)
+    job.release(3)
+    assert handle.wait(5)
+    assert handle.state == GenerationHandle.DONE
+    assert handle.text == "abc" and handle.result == "done"
+    assert handle.claim()
+    assert not handle.claim()
+    assert pool.get("chat") is None
+    assert pool.stats()["completed"] == 1
+
+
+def test_cancelling_mid_stream_closes_the_job(pool):
+    job = GatedJob()
+    handle = pool.submit("chat", job)
+    job.release()
+    job.started.wait(5)
+    assert pool.cancel("chat")
+    job.release()                                 # the worker sees the cancel at its next chunk
+
+    assert handle.wait(5)
+    assert job.closed.wait(5)
+    assert handle.state == GenerationHandle.CANCELLED
+    assert not handle.claim()
+    assert pool.get("chat") is None
+    assert pool.stats()["cancelled"] == 1
+
+
+def test_a_new_submission_supersedes_the_running_one(pool):
+    first, second = GatedJob(), GatedJob(chunks=("x",))
+    old = pool.submit("chat", first)
+    first.started.wait(5)
+    new = pool.submit("chat", second)
+    first.release()
+    second.release()
+
+    assert old.wait(5) and new.wait(5)
+    assert old.state == GenerationHandle.CANCELLED and not old.claim()
+    assert pool.get("chat") is new
+    assert new.claim() and new.text == "x"
+
+
+def test_a_job_cancelled_before_it_starts_never_runs():
+    pool = GenerationPool(max_workers=1)
+    try:
+        blocker = GatedJob(chunks=("a",))
+        pool.submit("other", blocker)
+        blocker.started.wait(5)
+
+        queued = GatedJob()
+        handle = pool.submit("chat", queued)
+        pool.cancel("chat")
+        blocker.release()
+
+        assert handle.wait(5)
+        assert handle.state == GenerationHandle.CANCELLED
+        assert not queued.started.is_set()
+    finally:
+        pool.shutdown()
+
+
+def test_errors_are_handed_to_the_claimer(pool):
+    def failing(handle):
+        yield "partial"
+        raise ValueError("upstream failed")
+
+    handle = pool.submit("chat", failing)
+    assert handle.wait(5)
+    assert handle.state == GenerationHandle.FAILED
+    assert handle.claim() and isinstance(handle.error, ValueError)
+    assert handle.text == "partial"
+
+
+def test_cancel_event_aborts_the_wait_for_a_quota_slot(pool):
+    scheduler = RequestScheduler(rpm=60)
+    scheduler.requests.debit(10)                  # next slot is seconds away
+    waiting = threading.Event()
+
+    def job(handle):
+        waiting.set()
+        scheduler.acquire("u", cancel_event=handle.cancel_event)
+        yield "never"
+
+    handle = pool.submit("chat", job)
+    waiting.wait(5)
+    pool.cancel("chat")
+    assert handle.wait(2)
+    assert handle.state == GenerationHandle.CANCELLED
+    assert isinstance(handle.error, RequestCancelled)
+
+
+def test_finished_but_unclaimed_replies_are_dropped_on_cancel(pool):
+    job = GatedJob(chunks=())
+    handle = pool.submit("chat", job)
+    assert handle.wait(5)
+    assert not pool.cancel("chat")                # already finished
+    assert not handle.claim()
+    assert pool.stats()["discarded"] == 1
+
+
+def test_unclaimed_handles_expire(pool):
+    pool.keep_seconds = 0
+    handle = pool.submit("chat", GatedJob(chunks=()))
+    assert handle.wait(5)
+    pool.submit("other", GatedJob(chunks=())).wait(5)   # submitting purges
+    assert pool.get("chat") is None
+
+
+def test_cancel_frees_a_worker_following_a_stalled_shared_call(pool):
+    flight = SingleFlight()
+    stalled = threading.Event()
+
+    def upstream():
+        stalled.wait(5)
+        yield "late"
+        return "done"
+
+    leader = flight.stream("same question", upstream)
+    threading.Thread(target=lambda: next(leader, None)).start()
+
+    def job(handle):
+        return (yield from flight.stream("same question", upstream, cancel_event=handle.cancel_event))
+
+    handle = pool.submit("chat", job)
+    assert not handle.wait(0.2)                   # waiting on the leader's first chunk
+    pool.cancel("chat")
+    assert handle.wait(1)
+    assert handle.state == GenerationHandle.CANCELLED
+    assert isinstance(handle.error, FollowerCancelled)
+    stalled.set()